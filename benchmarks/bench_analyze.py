@@ -0,0 +1,101 @@
+"""Speed and accuracy of `mouse_executor.py analyze` (mouse_app/fidelity.py).
+
+For every size a synthetic recording is paired with a fake capture of its
+replay: the capture clock starts --offset seconds earlier, runs --drift
+faster, stalls --stall-ms halfway through, jitters by up to 0.5 ms, drops 2%
+of the moves (as the OS coalesces them), drops one press and gains one extra
+click. analyze() must find the one missing and one extra click; its drift
+estimate is a linear fit, so on short recordings the stall inflates it.
+
+Usage:
+    python benchmarks/bench_analyze.py
+    python benchmarks/bench_analyze.py --sizes 10000 1000000 --json analyze.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mouse_app'))
+import fidelity
+import mrec
+from synth import synthetic_track
+
+DEFAULT_SIZES = (10000, 100000, 1000000)
+
+
+def fake_capture(track, total_duration, offset, drift, stall, seed=1):
+    """EventTrack of a distorted replay of `track` (see the module docstring)."""
+    rng = random.Random(seed)
+    capture = track.empty_like()
+    dropped_press = False
+    halfway = total_duration / 2
+    for i in range(len(track)):
+        t, action = track.times[i], track.actions[i]
+        if action == mrec.ACTION_MOVE and rng.random() < 0.02:
+            continue
+        if action == mrec.ACTION_PRESS and not dropped_press and t > total_duration / 4:
+            dropped_press = True
+            continue
+        t = offset + t * (1 + drift) + rng.uniform(0, 0.0005) + (stall if t > halfway else 0.0)
+        capture.append(t, action, track.buttons[i], track.xs[i], track.ys[i], track.dxs[i], track.dys[i])
+    capture.append(offset + total_duration / 3, mrec.ACTION_PRESS, track.button_code('Button.right'), 5, 5)
+    return capture.sorted()
+
+
+def bench(size, folder, offset, drift, stall):
+    track, total_duration = synthetic_track(size)
+    original = os.path.join(folder, f'original_{size}.mrec')
+    capture = os.path.join(folder, f'capture_{size}.mrec')
+    with open(original, 'wb') as f:
+        f.write(mrec.encode_track(track, total_duration))
+    with open(capture, 'wb') as f:
+        f.write(mrec.encode_track(fake_capture(track, total_duration, offset, drift, stall), total_duration + offset))
+
+    t0 = time.perf_counter()
+    report = fidelity.analyze(original, capture)
+    wall = time.perf_counter() - t0
+    clicks = report['clicks']
+    return {
+        'events': size,
+        'wall_s': wall,
+        'elapsed_s': report['elapsed_s'],
+        'clicks_ok': clicks['missing'] == 1 and clicks['extra'] == 1,
+        'drift_ms_per_min': report['timing']['drift_ms_per_min'],
+        'expected_drift_ms_per_min': drift * 60e3,
+        'exact_fraction': report['spatial']['exact_fraction'],
+        'error_p99_px': report['spatial']['error_px']['p99'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay fidelity analyzer benchmark")
+    parser.add_argument("--sizes", type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help="Recording sizes in events (default: 10k, 100k, 1M).")
+    parser.add_argument("--offset", type=float, default=3.2, help="Capture clock lead in seconds (default: 3.2).")
+    parser.add_argument("--drift", type=float, default=0.001, help="Relative clock drift (default: 0.001).")
+    parser.add_argument("--stall-ms", type=float, default=30.0, help="Stall injected halfway (default: 30).")
+    parser.add_argument("--json", type=str, help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'events':>10} {'total s':>8} {'load s':>7} {'warp s':>7} {'match s':>8} {'clicks':>7} "
+          f"{'drift':>16} {'exact %':>8}")
+    with tempfile.TemporaryDirectory() as folder:
+        for size in args.sizes:
+            r = bench(size, folder, args.offset, args.drift, args.stall_ms / 1e3)
+            results.append(r)
+            e = r['elapsed_s']
+            drift = f"{r['drift_ms_per_min']:.1f}/{r['expected_drift_ms_per_min']:.1f}"
+            print(f"{r['events']:>10} {r['wall_s']:>8.2f} {e['load']:>7.2f} {e['warp']:>7.2f} {e['match']:>8.2f} "
+                  f"{'ok' if r['clicks_ok'] else 'WRONG':>7} {drift:>16} {r['exact_fraction'] * 100:>8.2f}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Scaling benchmark for `mouse_executor.py batch`.
+
+Writes --files synthetic JSON recordings of --events events each to a
+temporary folder and runs one batch operation over them with an increasing
+number of workers, reporting files per second and the speedup over one
+worker (which runs in-process, without a pool).
+
+Usage:
+    python benchmarks/bench_batch.py
+    python benchmarks/bench_batch.py --files 2000 --jobs 1 2 4 8 --json batch.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mouse_app'))
+import batch
+import mrec
+from synth import synthetic_track
+
+
+def write_recordings(folder, files, events):
+    track, total_duration = synthetic_track(events)
+    events = track.to_events()
+    for i in range(files):
+        with open(os.path.join(folder, f'recording_{i:05d}.json'), 'w') as f:
+            mrec.dump_json_stream(f, total_duration, events)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch command scaling benchmark")
+    parser.add_argument("--files", type=int, default=400, help="Recordings to process (default: 400).")
+    parser.add_argument("--events", type=int, default=5000, help="Events per recording (default: 5000).")
+    parser.add_argument("--operation", choices=('validate', 'stats', 'convert'), default='stats')
+    parser.add_argument("--jobs", type=int, nargs='+', default=None,
+                        help="Worker counts to try (default: 1, 2, 4, ... up to the CPU count).")
+    parser.add_argument("--chunk-size", type=int, default=batch.DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--json", type=str, help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    jobs = args.jobs
+    if not jobs:
+        cpus = os.cpu_count() or 1
+        jobs = [1]
+        while jobs[-1] * 2 <= cpus:
+            jobs.append(jobs[-1] * 2)
+        if jobs[-1] != cpus:
+            jobs.append(cpus)
+
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        write_recordings(folder, args.files, args.events)
+        paths = batch.find_recordings([folder])
+        out_dir = os.path.join(folder, 'out')
+        for n in jobs:
+            options = {'to': 'mrec', 'out_dir': out_dir}
+            t0 = time.perf_counter()
+            batch.run_batch(args.operation, paths, n, args.chunk_size, options)
+            elapsed = time.perf_counter() - t0
+            results.append({'jobs': n, 'seconds': elapsed, 'files_per_second': len(paths) / elapsed})
+
+    base = results[0]['seconds']
+    print(f"{args.operation}: {args.files} files x {args.events} events, {os.cpu_count()} CPU(s)")
+    print(f"{'jobs':>5} {'seconds':>9} {'files/s':>9} {'speedup':>8}")
+    for r in results:
+        r['speedup'] = base / r['seconds']
+        print(f"{r['jobs']:>5} {r['seconds']:>9.2f} {r['files_per_second']:>9.1f} {r['speedup']:>7.2f}x")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Micro-benchmark for the recorder's capture callbacks.
+
+Drives a capture callback from a simulated listener thread at a fixed rate,
+while another thread imitates the Tk polling loop and the segment writer
+drains the ring buffer to a temporary file. Reports callback latency
+percentiles and dropped events for:
+
+    dict   the original path: time.time(), a dict per event, list.append
+    ring   the current path: perf_counter_ns() into the preallocated EventRing
+
+Usage:
+    python benchmarks/bench_capture.py --rate 1000 --seconds 5
+    python benchmarks/bench_capture.py --rate 8000 --ring-size 1024 --json out.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from array import array
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mouse_app'))
+import journal
+from mrec import ACTION_MOVE
+from ring_buffer import EventRing, DEFAULT_CAPACITY
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0
+    k = min(len(sorted_values) - 1, int(round(p / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def contend(stop):
+    """Imitates the old timer thread: a bit of Python work, then sleep(0.01)."""
+    while not stop.is_set():
+        sum(range(2000))
+        time.sleep(0.01)
+
+
+def drive(callback, rate, seconds):
+    """Call callback(x, y) at `rate` Hz; returns the per-call latencies in ns."""
+    total = int(rate * seconds)
+    latencies = array('q', bytes(8 * total))
+    now_ns = time.perf_counter_ns
+    period = 1.0 / rate
+    start = time.perf_counter()
+    for i in range(total):
+        deadline = start + i * period
+        while time.perf_counter() < deadline:
+            pass
+        t0 = now_ns()
+        callback(i % 1920, i % 1080)
+        latencies[i] = now_ns() - t0
+    return latencies
+
+
+def run_mode(mode, rate, seconds, ring_size):
+    stop = threading.Event()
+    contender = threading.Thread(target=contend, args=(stop,), daemon=True)
+    contender.start()
+    dropped = 0
+    tmp_dir = tempfile.mkdtemp(prefix='bench_capture_')
+    try:
+        if mode == 'dict':
+            events = []
+            start = time.time()
+
+            def callback(x, y):
+                events.append({'type': 'mouse', 'action': 'move', 'x': x, 'y': y, 'time_offset': time.time() - start})
+
+            latencies = drive(callback, rate, seconds)
+            captured = len(events)
+        else:
+            ring = EventRing(ring_size, time.perf_counter_ns())
+            writer = journal.JournalWriter(os.path.join(tmp_dir, 'bench.json.part'), ring)
+            now_ns = time.perf_counter_ns
+
+            def callback(x, y):
+                ring.push(now_ns(), ACTION_MOVE, None, x, y)
+
+            latencies = drive(callback, rate, seconds)
+            writer.close(seconds)
+            captured = writer.count
+            dropped = ring.dropped
+    finally:
+        stop.set()
+        contender.join()
+        for name in os.listdir(tmp_dir):
+            os.remove(os.path.join(tmp_dir, name))
+        os.rmdir(tmp_dir)
+
+    ordered = sorted(latencies)
+    return {
+        'mode': mode,
+        'rate_hz': rate,
+        'events': len(latencies),
+        'captured': captured,
+        'dropped': dropped,
+        'latency_ns': {
+            'p50': percentile(ordered, 50),
+            'p90': percentile(ordered, 90),
+            'p99': percentile(ordered, 99),
+            'p99.9': percentile(ordered, 99.9),
+            'max': ordered[-1] if ordered else 0,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Capture callback latency micro-benchmark")
+    parser.add_argument("--rate", type=int, default=1000, help="Simulated mouse polling rate in Hz (default: 1000).")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Duration per mode (default: 5).")
+    parser.add_argument("--ring-size", type=int, default=DEFAULT_CAPACITY, help="EventRing capacity (power of 2).")
+    parser.add_argument("--modes", nargs='+', choices=('dict', 'ring'), default=['dict', 'ring'])
+    parser.add_argument("--json", type=str, help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    results = [run_mode(mode, args.rate, args.seconds, args.ring_size) for mode in args.modes]
+    print(f"{'mode':<6} {'events':>8} {'captured':>9} {'dropped':>8} {'p50':>8} {'p90':>8} {'p99':>8} {'p99.9':>8} {'max':>9}  (ns)")
+    for r in results:
+        lat = r['latency_ns']
+        print(f"{r['mode']:<6} {r['events']:>8} {r['captured']:>9} {r['dropped']:>8} {lat['p50']:>8} {lat['p90']:>8} "
+              f"{lat['p99']:>8} {lat['p99.9']:>8} {lat['max']:>9}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
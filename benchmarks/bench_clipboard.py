@@ -0,0 +1,91 @@
+"""Per-copy latency of dot_copy's clipboard backends (dot/dot_clipboard.py).
+
+Creates a QApplication and copies --copies distinct strings through each
+backend, timing every copy() call:
+
+    qt         QClipboard.setText in-process
+    pyperclip  pyperclip.copy, i.e. an xclip/xsel/wl-copy process per copy
+
+After each backend the clipboard is read back once to check that the last
+copy arrived. Needs PyQt5 and a display (or QT_QPA_PLATFORM=offscreen, which
+only times Qt's in-process clipboard); pyperclip is skipped when it is not
+installed or has no copy mechanism.
+
+Usage:
+    python benchmarks/bench_clipboard.py
+    python benchmarks/bench_clipboard.py --copies 500 --json clipboard.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dot'))
+import dot_clipboard
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, int(round(p / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def bench(clipboard, copies, read_back):
+    samples = []
+    clock = time.perf_counter
+    for i in range(copies):
+        text = f"variável {i}: https://exemplo.com/item/{i}"
+        t0 = clock()
+        clipboard.copy(text)
+        samples.append((clock() - t0) * 1e6)
+    samples.sort()
+    return {
+        'backend': clipboard.name,
+        'copies': copies,
+        'p50_us': percentile(samples, 50),
+        'p99_us': percentile(samples, 99),
+        'max_us': samples[-1] if samples else 0.0,
+        'verified': read_back() == text if copies else True,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="dot_copy clipboard latency benchmark")
+    parser.add_argument("--copies", type=int, default=200, help="Copies per backend (default: 200).")
+    parser.add_argument("--backends", nargs='+', choices=('qt', 'pyperclip'), default=['qt', 'pyperclip'])
+    parser.add_argument("--json", type=str, help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication(sys.argv)
+    qt_clipboard = app.clipboard()
+
+    results = []
+    for name in args.backends:
+        try:
+            clipboard = dot_clipboard.create_clipboard(name)
+        except ImportError as e:
+            print(f"{name}: skipped ({e})")
+            continue
+        if name == 'pyperclip':
+            import pyperclip
+            read_back = pyperclip.paste
+        else:
+            read_back = qt_clipboard.text
+        try:
+            results.append(bench(clipboard, args.copies, read_back))
+        except Exception as e:  # pyperclip.PyperclipException: no xclip/xsel/wl-copy
+            print(f"{name}: skipped ({e})")
+
+    print(f"{'backend':<10} {'copies':>7} {'p50 us':>10} {'p99 us':>10} {'max us':>10}  verified")
+    for r in results:
+        print(f"{r['backend']:<10} {r['copies']:>7} {r['p50_us']:>10.1f} {r['p99_us']:>10.1f} {r['max_us']:>10.1f}  {r['verified']}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
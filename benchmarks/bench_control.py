@@ -0,0 +1,129 @@
+"""Control-channel benchmark for the playback daemon (mouse_executor.py serve).
+
+Starts a daemon with the fake backend on a temporary socket, plays a long
+synthetic recording and measures, from the client side:
+
+    round-trip  `status` requests over one persistent connection
+    stop        play -> stop round-trips, i.e. until the player thread exited
+    cli         a cold `mouse_executor.py status` process, for reference
+
+Usage:
+    python benchmarks/bench_control.py
+    python benchmarks/bench_control.py --requests 20000 --json control.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'mouse_app'))
+import mrec
+from control import ControlClient
+from synth import synthetic_track
+
+EXECUTOR = os.path.join(ROOT, 'mouse_executor.py')
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, int(round(p / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def summary_us(samples):
+    samples = sorted(samples)
+    return {
+        'p50': percentile(samples, 50),
+        'p99': percentile(samples, 99),
+        'max': samples[-1] if samples else 0.0,
+    }
+
+
+def start_daemon(workdir, socket_path):
+    process = subprocess.Popen([sys.executable, EXECUTOR, '--socket', socket_path, 'serve', '--backend', 'fake'],
+                               cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10.0
+    while time.monotonic() < deadline:
+        try:
+            return process, ControlClient(socket_path)
+        except OSError:
+            time.sleep(0.01)
+    process.kill()
+    raise RuntimeError("the daemon did not start")
+
+
+def bench_round_trip(client, requests):
+    samples = []
+    clock = time.perf_counter
+    for _ in range(requests):
+        t0 = clock()
+        client.request('status')
+        samples.append((clock() - t0) * 1e6)
+    return summary_us(samples)
+
+
+def bench_stop(client, recording, runs):
+    samples = []
+    for _ in range(runs):
+        reply = client.request('play', file=recording, backend='fake')
+        if not reply['ok']:
+            raise RuntimeError(reply['error'])
+        time.sleep(0.02)
+        t0 = time.perf_counter()
+        client.request('stop')
+        samples.append((time.perf_counter() - t0) * 1e6)
+    return summary_us(samples)
+
+
+def bench_cli(workdir, socket_path, runs):
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, EXECUTOR, '--socket', socket_path, 'status'],
+                       cwd=workdir, stdout=subprocess.DEVNULL, check=True)
+        samples.append((time.perf_counter() - t0) * 1e6)
+    return summary_us(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Playback daemon control-channel benchmark")
+    parser.add_argument("--requests", type=int, default=5000, help="status round-trips to time (default: 5000).")
+    parser.add_argument("--stops", type=int, default=50, help="play/stop cycles to time (default: 50).")
+    parser.add_argument("--cli-runs", type=int, default=5, help="cold CLI invocations to time (default: 5).")
+    parser.add_argument("--json", type=str, help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        recording = os.path.join(workdir, 'long.mrec')
+        track, total_duration = synthetic_track(60000, rate=100.0)   # 10 minutes at 100 Hz
+        with open(recording, 'wb') as f:
+            f.write(mrec.encode_track(track, total_duration))
+        socket_path = os.path.join(workdir, 'executor.sock')
+        process, client = start_daemon(workdir, socket_path)
+        try:
+            results = {
+                'round_trip_us': bench_round_trip(client, args.requests),
+                'stop_us': bench_stop(client, recording, args.stops),
+                'cli_us': bench_cli(workdir, socket_path, args.cli_runs),
+            }
+            client.request('shutdown')
+        finally:
+            client.close()
+            process.wait(timeout=10)
+
+    for name, label in (('round_trip_us', 'status round-trip'), ('stop_us', 'stop'), ('cli_us', 'cold CLI status')):
+        r = results[name]
+        print(f"{label:>18}: p50 {r['p50']:10.1f}us  p99 {r['p99']:10.1f}us  max {r['max']:10.1f}us")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""UI costs of dot_copy: the button image at startup and the toast per click.
+
+    icon   load_scaled_icon() with an empty cache (smooth scaling + mask, then
+           stored) and with the cache filled
+    toast  --clicks toasts shown through one pooled Toast, and with a new
+           Toast widget per click as dot_copy used to do; also reports how
+           many widgets are alive afterwards
+
+Needs PyQt5; runs offscreen unless QT_QPA_PLATFORM is set.
+
+Usage:
+    python benchmarks/bench_dot_ui.py
+    python benchmarks/bench_dot_ui.py --clicks 1000 --json dot_ui.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+DOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dot')
+sys.path.insert(0, DOT_DIR)
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, int(round(p / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def summary_us(samples):
+    samples = sorted(samples)
+    return {'p50_us': percentile(samples, 50), 'p99_us': percentile(samples, 99), 'max_us': samples[-1]}
+
+
+def bench_icon(image_path, runs):
+    import dot_gui
+    results = {}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cold = []
+        for _ in range(runs):
+            for name in os.listdir(cache_dir):
+                os.remove(os.path.join(cache_dir, name))
+            t0 = time.perf_counter()
+            dot_gui.load_scaled_icon(image_path, cache_dir=cache_dir)
+            cold.append((time.perf_counter() - t0) * 1e6)
+        warm = []
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            dot_gui.load_scaled_icon(image_path, cache_dir=cache_dir)
+            warm.append((time.perf_counter() - t0) * 1e6)
+    results['icon_uncached'] = summary_us(cold)
+    results['icon_cached'] = summary_us(warm)
+    return results
+
+
+def bench_toast(app, clicks):
+    import dot_gui
+    from PyQt5.QtWidgets import QWidget
+    parent = QWidget()
+    parent.setGeometry(100, 100, 80, 80)
+    parent.show()
+    results = {}
+
+    pooled = dot_gui.Toast(parent)
+    samples = []
+    before = len(app.allWidgets())
+    for i in range(clicks):
+        t0 = time.perf_counter()
+        pooled.show_text(f"variável {i}", parent)
+        app.processEvents()
+        samples.append((time.perf_counter() - t0) * 1e6)
+    results['toast_pooled'] = dict(summary_us(samples), widgets_added=len(app.allWidgets()) - before)
+
+    samples = []
+    before = len(app.allWidgets())
+    for i in range(clicks):
+        t0 = time.perf_counter()
+        toast = dot_gui.Toast(parent)
+        toast.show_text(f"variável {i}", parent)
+        app.processEvents()
+        samples.append((time.perf_counter() - t0) * 1e6)
+    results['toast_per_click'] = dict(summary_us(samples), widgets_added=len(app.allWidgets()) - before)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="dot_copy icon and toast benchmark")
+    parser.add_argument("--image", type=str, default=os.path.join(DOT_DIR, 'icons', 'botao_2.png'))
+    parser.add_argument("--runs", type=int, default=20, help="Icon loads per case (default: 20).")
+    parser.add_argument("--clicks", type=int, default=300, help="Toasts per case (default: 300).")
+    parser.add_argument("--json", type=str, help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication(sys.argv)
+    results = bench_icon(args.image, args.runs)
+    results.update(bench_toast(app, args.clicks))
+
+    print(f"{'case':<16} {'p50 us':>10} {'p99 us':>10} {'max us':>10} {'widgets':>8}")
+    for name, r in results.items():
+        print(f"{name:<16} {r['p50_us']:>10.1f} {r['p99_us']:>10.1f} {r['max_us']:>10.1f} {r.get('widgets_added', ''):>8}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
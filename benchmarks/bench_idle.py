@@ -0,0 +1,125 @@
+"""Idle cost of a running recorder (mouse_rec.py start) with no mouse input.
+
+Starts a recorder, lets it settle and then samples /proc over --seconds:
+
+    cpu      user + system CPU time of the whole process, as % of one core
+    wakeups  context switches of all its threads per second
+
+Modes:
+
+    headless   mouse_rec.py start --headless: one select() until the deadline
+    window     mouse_rec.py start with the Tk timer (needs a display)
+    polling    reference: the waits of the previous recorder, a 10 ms sleep
+               loop in a thread and a 250 ms Event.wait in the main thread,
+               without Tk's own work in the loop
+
+Linux only (reads /proc). Recordings are written to mouse_app/mouse_files
+under a temporary name and removed afterwards.
+
+Usage:
+    python benchmarks/bench_idle.py
+    python benchmarks/bench_idle.py --seconds 60 --modes headless polling --json idle.json
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+RECORDER = os.path.join(ROOT, 'mouse_app', 'mouse_rec.py')
+MOUSE_FILES = os.path.join(ROOT, 'mouse_app', 'mouse_files')
+SETTLE_SECONDS = 1.0
+
+POLLING_SCRIPT = """
+import threading, time
+stop = threading.Event()
+def timer():
+    while not stop.is_set():
+        time.sleep(0.01)
+threading.Thread(target=timer, daemon=True).start()
+while not stop.is_set():
+    stop.wait(timeout=0.25)
+"""
+
+
+def sample(pid):
+    """(cpu seconds, context switches) of process `pid` and all its threads."""
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    cpu = (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    switches = 0
+    for tid in os.listdir(f'/proc/{pid}/task'):
+        try:
+            with open(f'/proc/{pid}/task/{tid}/status') as f:
+                for line in f:
+                    if line.startswith(('voluntary_ctxt_switches', 'nonvoluntary_ctxt_switches')):
+                        switches += int(line.split()[1])
+        except FileNotFoundError:
+            pass  # thread ended between listdir and open
+    return cpu, switches
+
+
+def run_mode(mode, seconds, workdir):
+    output = f'bench_idle_{os.getpid()}_{mode}.mrec'
+    if mode == 'polling':
+        argv = [sys.executable, '-c', POLLING_SCRIPT]
+    else:
+        argv = [sys.executable, RECORDER, 'start', '-o', output, '-d', str(int(seconds + SETTLE_SECONDS + 30))]
+        if mode == 'headless':
+            argv.append('--headless')
+    process = subprocess.Popen(argv, cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        time.sleep(SETTLE_SECONDS)
+        if process.poll() is not None:
+            raise RuntimeError(f"{mode}: the process exited with status {process.returncode}")
+        cpu0, switches0 = sample(process.pid)
+        t0 = time.perf_counter()
+        time.sleep(seconds)
+        cpu1, switches1 = sample(process.pid)
+        elapsed = time.perf_counter() - t0
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        for name in (output, output + '.part'):
+            path = os.path.join(MOUSE_FILES, name)
+            if os.path.exists(path):
+                os.remove(path)
+    return {
+        'mode': mode,
+        'seconds': elapsed,
+        'cpu_percent': 100.0 * (cpu1 - cpu0) / elapsed,
+        'wakeups_per_second': (switches1 - switches0) / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Idle CPU of a running recorder")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Measured idle time per mode (default: 10).")
+    parser.add_argument("--modes", nargs='+', choices=('headless', 'window', 'polling'),
+                        default=['headless', 'polling'])
+    parser.add_argument("--json", type=str, help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    if not os.path.isdir('/proc/self/task'):
+        sys.exit("Error: this benchmark reads /proc and only runs on Linux.")
+    with tempfile.TemporaryDirectory() as workdir:
+        results = [run_mode(mode, args.seconds, workdir) for mode in args.modes]
+
+    print(f"{'mode':<9} {'seconds':>8} {'cpu %':>8} {'wakeups/s':>10}")
+    for r in results:
+        print(f"{r['mode']:<9} {r['seconds']:>8.1f} {r['cpu_percent']:>8.3f} {r['wakeups_per_second']:>10.1f}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
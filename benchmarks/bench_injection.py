@@ -0,0 +1,150 @@
+"""Injection benchmark: sustained events/s of the pynput and xtest backends on X.
+
+Needs an X server: $DISPLAY, or a private Xvfb started for the run (always
+with --xvfb, otherwise only when $DISPLAY is unset). For each backend:
+
+    burst     --events moves injected back to back, then one round trip to
+              the server (pynput already waits after every call), so events/s
+              counts events the server has processed. xtest is measured
+              flushing after every event and after every --batch events
+    playback  a synthetic recording at each --rates Hz (--seconds long)
+              played through MouseExecutor: events/s actually sustained
+              against the recorded rate, and the max lateness
+
+Backends that cannot be created here (pynput not installed, no libXtst)
+are reported and skipped.
+
+Usage:
+    python benchmarks/bench_injection.py
+    python benchmarks/bench_injection.py --xvfb --rates 1000 8000 32000 --json injection.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mouse_app'))
+from backends import create_backend
+from player import MouseExecutor
+from synth import synthetic_track
+
+DEFAULT_RATES = (1000, 4000, 16000)
+XVFB_TIMEOUT = 5.0
+
+
+@contextlib.contextmanager
+def xvfb():
+    """Run a private Xvfb for the duration of the block and point $DISPLAY at it."""
+    number = 99
+    while os.path.exists(f'/tmp/.X11-unix/X{number}') or os.path.exists(f'/tmp/.X{number}-lock'):
+        number += 1
+    server = subprocess.Popen(['Xvfb', f':{number}', '-screen', '0', '1920x1080x24', '-nolisten', 'tcp'],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + XVFB_TIMEOUT
+    while not os.path.exists(f'/tmp/.X11-unix/X{number}'):
+        if server.poll() is not None or time.monotonic() > deadline:
+            server.kill()
+            raise OSError(f"Xvfb :{number} did not start.")
+        time.sleep(0.05)
+    previous = os.environ.get('DISPLAY')
+    os.environ['DISPLAY'] = f':{number}'
+    try:
+        yield os.environ['DISPLAY']
+    finally:
+        server.terminate()
+        server.wait()
+        if previous is None:
+            del os.environ['DISPLAY']
+        else:
+            os.environ['DISPLAY'] = previous
+
+
+def burst(backend, events, batch):
+    """Events/s for `events` moves, flushing every `batch` (None: never, for unbatched backends)."""
+    move, flush = backend.move, backend.flush
+    t0 = time.perf_counter()
+    for i in range(events):
+        move(100 + i % 800, 100 + i % 600)
+        if batch and (i + 1) % batch == 0:
+            flush()
+    if hasattr(backend, 'sync'):
+        backend.sync()
+    return events / (time.perf_counter() - t0)
+
+
+def playback(backend, rate, seconds):
+    track, total_duration = synthetic_track(int(rate * seconds), rate=rate, click_every=0, scroll_every=0)
+    executor = MouseExecutor(None, backend=backend)
+    executor.prepare_track(track, total_duration)
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        executor._execute_events()
+    if hasattr(backend, 'sync'):
+        backend.sync()
+    wall = time.perf_counter() - t0
+    return {'rate': rate, 'events': len(track), 'events_per_s': len(track) / wall, 'wall_s': wall,
+            'scheduled_s': total_duration, 'max_lateness_ms': executor.scheduler.max_lateness * 1e3}
+
+
+def bench(name, events, batch, rates, seconds):
+    try:
+        backend = create_backend(name)
+    except (ImportError, OSError) as e:
+        print(f"{name:>8}: skipped ({e})")
+        return None
+    try:
+        result = {'backend': name}
+        if backend.batched:
+            result['burst_unbatched_per_s'] = burst(backend, events, 1)
+            result['burst_per_s'] = burst(backend, events, batch)
+        else:
+            result['burst_per_s'] = burst(backend, events, None)
+        result['playback'] = [playback(backend, rate, seconds) for rate in rates]
+    finally:
+        backend.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Output backend injection benchmark (X11)")
+    parser.add_argument("--backends", nargs='+', default=['pynput', 'xtest'], help="Backends to compare.")
+    parser.add_argument("--events", type=int, default=20000, help="Moves per burst (default: 20000).")
+    parser.add_argument("--batch", type=int, default=64, help="Moves per flush in the batched burst (default: 64).")
+    parser.add_argument("--rates", type=int, nargs='+', default=list(DEFAULT_RATES),
+                        help="Recording rates in Hz for the playback runs (default: 1000 4000 16000).")
+    parser.add_argument("--seconds", type=float, default=2.0, help="Length of each playback run (default: 2).")
+    parser.add_argument("--xvfb", action="store_true", help="Always run on a private Xvfb server.")
+    parser.add_argument("--json", type=str, help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    server = contextlib.nullcontext(os.environ.get('DISPLAY'))
+    if args.xvfb or not os.environ.get('DISPLAY'):
+        if shutil.which('Xvfb') is None:
+            print("Error: No X display ($DISPLAY is unset) and Xvfb is not installed.")
+            sys.exit(1)
+        server = xvfb()
+    results = []
+    with server as display:
+        print(f"display {display}")
+        for name in args.backends:
+            r = bench(name, args.events, args.batch, args.rates, args.seconds)
+            if r is None:
+                continue
+            results.append(r)
+            unbatched = r.get('burst_unbatched_per_s')
+            print(f"{name:>8}: burst {r['burst_per_s']:>10.0f} events/s"
+                  + (f" ({unbatched:.0f} flushing every event)" if unbatched else ""))
+            for p in r['playback']:
+                print(f"{'':>10}{p['rate']:>6} Hz: {p['events_per_s']:>9.0f} events/s sustained, "
+                      f"{p['wall_s']:.2f}s for {p['scheduled_s']:.2f}s, max lateness {p['max_lateness_ms']:.2f}ms")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""Scalability of recording I/O: save and load from 1k to 10M events.
+
+For every size a realistic session (synth.realistic_track: idle pauses,
+strokes, clicks, double clicks, drags, scroll bursts) is written to a
+capture segment (.part) through the recorder's own EventRing and
+JournalWriter, then each step below runs in a fresh interpreter so its peak
+RSS (VmHWM) is its own:
+
+    save        journal.finalize(): the segment becomes the final .json, .mrec
+                or .mref (chunks into a scratch store), which is what the
+                recorder does when it stops
+    load        loader.load_track(): parsing into an EventTrack
+    plan cold   plan.load_plan() with an empty plan cache: parse, compile
+                and store the plan, which is what the first `play` costs
+    plan warm   plan.load_plan() again: decoding the cached plan
+
+`baseline` is the peak RSS of a probe that only imports the modules, so
+per-step memory can be read as the difference. File sizes are those of the
+segment, the recording (for .mref: manifest plus the chunks it added to
+the store) and the cached plan.
+
+Results are written to --json (default: benchmarks/results/io-<timestamp>.json)
+together with the machine and commit they were measured on; --compare
+prints the change against an earlier results file.
+
+Usage:
+    python benchmarks/bench_io.py
+    python benchmarks/bench_io.py --sizes 1000 100000 --formats mrec
+    python benchmarks/bench_io.py --compare benchmarks/results/io-20261018-120000.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+MOUSE_APP = os.path.join(ROOT, 'mouse_app')
+sys.path.insert(0, MOUSE_APP)
+import journal
+from ring_buffer import EventRing
+from synth import event_mix, realistic_track
+
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000, 10000000)
+FORMATS = ('json', 'mrec', 'mref')
+STEPS = ('save', 'load', 'plan_cold', 'plan_warm')
+RING_CAPACITY = 1 << 16
+RESULTS_VERSION = 1
+
+PROBE = """
+import json, resource, shutil, sys, time
+sys.path.insert(0, sys.argv[1])
+step, template, recording, cache_dir = sys.argv[2:6]
+import journal, loader, plan
+if step == 'save':
+    part = recording + journal.PART_SUFFIX
+    shutil.copyfile(template, part)
+t0 = time.perf_counter()
+count = None
+if step == 'save':
+    count = journal.finalize(part, recording)[0]
+elif step == 'load':
+    count = len(loader.load_track(recording)[0])
+elif step in ('plan_cold', 'plan_warm'):
+    count = len(plan.load_plan(recording, cache_dir).track)
+elapsed = time.perf_counter() - t0
+try:
+    # ru_maxrss survives exec, so it would include the parent's peak
+    with open('/proc/self/status') as f:
+        rss_kb = next(int(line.split()[1]) for line in f if line.startswith('VmHWM:'))
+except OSError:
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({'s': elapsed, 'rss_mb': rss_kb / 1024, 'count': count}))
+"""
+
+
+def probe(step, template, recording, cache_dir, store_dir):
+    env = dict(os.environ, MOUSE_STORE=store_dir)
+    out = subprocess.run([sys.executable, '-c', PROBE, MOUSE_APP, step, template, recording, cache_dir],
+                         capture_output=True, text=True, check=True, env=env)
+    return json.loads(out.stdout)
+
+
+def write_segment(track, total_duration, path):
+    """Feed `track` through an EventRing into a JournalWriter, as the recorder does."""
+    ring = EventRing(RING_CAPACITY)
+    writer = journal.JournalWriter(path, ring)
+    names = track.button_names
+    rows = zip(track.times, track.actions, track.buttons, track.xs, track.ys, track.dxs, track.dys)
+    push = ring.push
+    batch = ring.high_water
+    for _ in range(0, len(track), batch):
+        for _, (t, action, code, x, y, dx, dy) in zip(range(batch), rows):
+            push(int(t * 1e9), action, names[code], x, y, dx, dy)
+        while len(ring):   # the writer wakes at high water; never let the ring fill up
+            time.sleep(0.001)
+    writer.close(total_duration)
+    if ring.dropped:
+        raise RuntimeError(f"EventRing dropped {ring.dropped} events while writing the segment.")
+
+
+def git_commit():
+    try:
+        out = subprocess.run(['git', '-C', ROOT, 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True)
+    except OSError:
+        return None
+    return out.stdout.strip() or None
+
+
+def bench(size, formats, folder):
+    track, total_duration = realistic_track(size)
+    mix = event_mix(track)
+    template = os.path.join(folder, f'segment_{size}.part')
+    write_segment(track, total_duration, template)
+    del track
+    results = []
+    for fmt in formats:
+        recording = os.path.join(folder, f'rec_{size}.{fmt}')
+        cache_dir = os.path.join(folder, f'plans_{size}_{fmt}')
+        store_dir = os.path.join(folder, f'store_{size}')
+        os.makedirs(cache_dir)
+        r = {'events': size, 'format': fmt, 'duration_s': total_duration, 'mix': mix,
+             'segment_bytes': os.path.getsize(template)}
+        for step in STEPS:
+            m = probe(step, template, recording, cache_dir, store_dir)
+            if m['count'] != size:
+                raise RuntimeError(f"{step} of {recording} returned {m['count']} events, expected {size}.")
+            r[f'{step}_s'] = m['s']
+            r[f'{step}_rss_mb'] = m['rss_mb']
+        r['file_bytes'] = os.path.getsize(recording) + sum(
+            os.path.getsize(os.path.join(top, name)) for top, _, names in os.walk(store_dir) for name in names)
+        r['plan_bytes'] = sum(os.path.getsize(os.path.join(cache_dir, name)) for name in os.listdir(cache_dir))
+        results.append(r)
+        os.remove(recording)
+        shutil.rmtree(cache_dir)
+        shutil.rmtree(store_dir, ignore_errors=True)
+    os.remove(template)
+    return results
+
+
+def compare(results, previous):
+    """Print the relative change of every timing, RSS and size against `previous`."""
+    before = {(r['events'], r['format']): r for r in previous['results']}
+    keys = [f'{step}_s' for step in STEPS] + [f'{step}_rss_mb' for step in STEPS] + ['file_bytes']
+    print(f"\nChange against {previous.get('commit') or '?'} ({previous.get('timestamp', '?')}):")
+    print(f"{'events':>10} {'fmt':>5} " + ' '.join(f"{key:>16}" for key in keys))
+    for r in results:
+        old = before.get((r['events'], r['format']))
+        if old is None:
+            continue
+        changes = []
+        for key in keys:
+            if old.get(key):
+                changes.append(f"{(r[key] / old[key] - 1) * 100:>+15.1f}%")
+            else:
+                changes.append(f"{'-':>16}")
+        print(f"{r['events']:>10} {r['format']:>5} " + ' '.join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recording save/load scalability benchmark")
+    parser.add_argument("--sizes", type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help="Recording sizes in events (default: 1k, 10k, 100k, 1M, 10M).")
+    parser.add_argument("--formats", nargs='+', choices=FORMATS, default=list(FORMATS),
+                        help="Recording formats to save and load (default: json mrec mref).")
+    parser.add_argument("--json", type=str,
+                        help="Results file (default: benchmarks/results/io-<timestamp>.json).")
+    parser.add_argument("--compare", type=str, help="Earlier results file to compare against.")
+    args = parser.parse_args()
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    timestamp = time.strftime('%Y%m%d-%H%M%S')
+    output = args.json or os.path.join(ROOT, 'benchmarks', 'results', f'io-{timestamp}.json')
+
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        baseline = probe('baseline', '', '', folder, folder)['rss_mb']
+        print(f"baseline RSS {baseline:.1f} MB")
+        print(f"{'events':>10} {'fmt':>5} {'file MB':>8} {'B/event':>8} {'save s':>8} {'load s':>8} "
+              f"{'cold s':>8} {'warm s':>8} {'save MB':>8} {'load MB':>8} {'cold MB':>8} {'warm MB':>8}")
+        for size in args.sizes:
+            for r in bench(size, args.formats, folder):
+                results.append(r)
+                print(f"{r['events']:>10} {r['format']:>5} {r['file_bytes'] / 1e6:>8.2f} "
+                      f"{r['file_bytes'] / r['events']:>8.1f} {r['save_s']:>8.3f} {r['load_s']:>8.3f} "
+                      f"{r['plan_cold_s']:>8.3f} {r['plan_warm_s']:>8.3f} {r['save_rss_mb']:>8.1f} "
+                      f"{r['load_rss_mb']:>8.1f} {r['plan_cold_rss_mb']:>8.1f} {r['plan_warm_rss_mb']:>8.1f}")
+
+    report = {
+        'version': RESULTS_VERSION,
+        'timestamp': timestamp,
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'baseline_rss_mb': baseline,
+        'results': results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=4)
+    print(f"\nResults written to {output}")
+    if previous is not None:
+        compare(results, previous)
+
+
+if __name__ == "__main__":
+    main()
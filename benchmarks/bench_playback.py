@@ -0,0 +1,155 @@
+"""Playback benchmark for MouseExecutor._execute_events on a headless box.
+
+Synthetic recordings are replayed through the real playback loop with the
+in-process fake backend, so no display is needed. Two measurements:
+
+    throughput  every size replayed with all idle gaps removed (--max-gap 0),
+                reporting events/s, per-event overhead and CPU usage
+    jitter      a paced replay at --jitter-rate Hz, reporting how late each
+                event was dispatched relative to its deadline
+    tracing     the throughput run of each --trace-sizes size with and without
+                a PlaybackTrace, i.e. the cost of per-event instrumentation,
+                plus the time to export the trace
+
+Usage:
+    python benchmarks/bench_playback.py
+    python benchmarks/bench_playback.py --sizes 1000 100000 --json playback.json
+    python benchmarks/bench_playback.py --sizes 1000000 --jitter-events 0 --trace-sizes 1000000
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mouse_app'))
+from backends import OP_MOVE, OP_POSITION, FakeBackend
+from playback_trace import PlaybackTrace
+from player import MouseExecutor
+from synth import synthetic_track
+
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000, 10000000)
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, int(round(p / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def replay(track, total_duration, backend, lag_policy='catchup', max_gap=None, trace=None):
+    executor = MouseExecutor(None, lag_policy, max_gap=max_gap, backend=backend)
+    executor.prepare_track(track, total_duration)
+    executor.trace = trace
+    wall0, cpu0 = time.perf_counter(), time.process_time()
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        executor._execute_events()
+    wall, cpu = time.perf_counter() - wall0, time.process_time() - cpu0
+    return executor, wall, cpu
+
+
+def bench_throughput(size):
+    track, total_duration = synthetic_track(size)
+    backend = FakeBackend(record=False)
+    _, wall, cpu = replay(track, total_duration, backend, max_gap=0.0)
+    return {
+        'events': size,
+        'backend_calls': backend.calls,
+        'wall_s': wall,
+        'events_per_s': size / wall if wall else 0.0,
+        'overhead_us_per_event': wall / size * 1e6,
+        'cpu_percent': cpu / wall * 100 if wall else 0.0,
+    }
+
+
+def bench_tracing(size, runs=3):
+    """Best of `runs` replays without and with a trace, then the trace export."""
+    track, total_duration = synthetic_track(size)
+    plain = min(replay(track, total_duration, FakeBackend(record=False), max_gap=0.0)[1] for _ in range(runs))
+    traced = None
+    for _ in range(runs):
+        trace = PlaybackTrace(size)
+        wall = replay(track, total_duration, FakeBackend(record=False), max_gap=0.0, trace=trace)[1]
+        traced = wall if traced is None else min(traced, wall)
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        trace.export(os.path.join(tmp, 'bench'))
+        export = time.perf_counter() - t0
+    return {
+        'events': size,
+        'traced_events': trace.count,
+        'plain_us_per_event': plain / size * 1e6,
+        'traced_us_per_event': traced / size * 1e6,
+        'overhead_percent': (traced - plain) / plain * 100 if plain else 0.0,
+        'export_s': export,
+    }
+
+
+def bench_jitter(rate, events):
+    track, total_duration = synthetic_track(events, rate=rate)
+    backend = FakeBackend()
+    executor, wall, cpu = replay(track, total_duration, backend)
+    origin_ns = executor.scheduler.origin * 1e9
+    dispatched = backend.move_times()
+    # One move call per move event, plus one before clicks/scrolls away from the pointer
+    moving = (d for d, op in zip(executor.deadlines, executor.ops) if op == OP_MOVE or op & OP_POSITION)
+    lateness_us = sorted((t - origin_ns - d * 1e9) / 1e3 for t, d in zip(dispatched, moving))
+    return {
+        'rate_hz': rate,
+        'events': events,
+        'wall_s': wall,
+        'scheduled_s': executor.total_duration,
+        'drift_ms': (wall - executor.total_duration) * 1e3,
+        'cpu_percent': cpu / wall * 100 if wall else 0.0,
+        'lateness_us': {
+            'p50': percentile(lateness_us, 50),
+            'p99': percentile(lateness_us, 99),
+            'max': lateness_us[-1] if lateness_us else 0.0,
+            'mean': sum(lateness_us) / len(lateness_us) if lateness_us else 0.0,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless playback benchmark")
+    parser.add_argument("--sizes", type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help="Recording sizes (events) for the throughput runs.")
+    parser.add_argument("--jitter-rate", type=float, default=1000.0, help="Event rate of the paced run in Hz (default: 1000).")
+    parser.add_argument("--jitter-events", type=int, default=5000, help="Events in the paced run (default: 5000).")
+    parser.add_argument("--trace-sizes", type=int, nargs='*', default=[100000],
+                        help="Recording sizes for the traced vs untraced comparison (default: 100000).")
+    parser.add_argument("--json", type=str, help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    results = {'throughput': [], 'jitter': None, 'tracing': []}
+    print(f"{'events':>10} {'events/s':>12} {'us/event':>9} {'cpu %':>6} {'wall s':>8}")
+    for size in args.sizes:
+        r = bench_throughput(size)
+        results['throughput'].append(r)
+        print(f"{r['events']:>10} {r['events_per_s']:>12.0f} {r['overhead_us_per_event']:>9.2f} "
+              f"{r['cpu_percent']:>6.1f} {r['wall_s']:>8.3f}")
+
+    if args.jitter_events:
+        j = results['jitter'] = bench_jitter(args.jitter_rate, args.jitter_events)
+        lat = j['lateness_us']
+        print(f"\njitter @ {j['rate_hz']:.0f} Hz, {j['events']} events: p50 {lat['p50']:.1f}us, p99 {lat['p99']:.1f}us, "
+              f"max {lat['max']:.1f}us, drift {j['drift_ms']:.2f}ms, cpu {j['cpu_percent']:.1f}%")
+
+    if args.trace_sizes:
+        print(f"\n{'events':>10} {'plain us':>9} {'traced us':>10} {'overhead':>9} {'export s':>9}")
+        for size in args.trace_sizes:
+            r = bench_tracing(size)
+            results['tracing'].append(r)
+            print(f"{r['events']:>10} {r['plain_us_per_event']:>9.3f} {r['traced_us_per_event']:>10.3f} "
+                  f"{r['overhead_percent']:>8.1f}% {r['export_s']:>9.3f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Seek benchmark: cost of starting playback in the middle of a recording.
+
+For every size a synthetic recording is compiled into a plan and --seeks
+random --start/--end pairs are resolved:
+
+    segment  segment.resolve_segment(): bisection over the plan's event
+             times and button-state table
+    walk     scanning the plan from the first event up to the seek point to
+             rebuild the pointer position and held buttons, which is what
+             reaching a mid-recording start costs without the index
+
+Also reports the size of the button-state table and the time to decode the
+plan from its cache file bytes (what the daemon does before a seek on a
+recording it has not preloaded).
+
+Usage:
+    python benchmarks/bench_seek.py
+    python benchmarks/bench_seek.py --sizes 100000 10000000 --json seek.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mouse_app'))
+import mrec
+from plan import compile_plan, decode_plan, encode_plan
+from scheduler import retime
+from segment import resolve_segment
+from synth import synthetic_track
+
+DEFAULT_SIZES = (10000, 100000, 1000000)
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, int(round(p / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def walk(plan, offset):
+    """Pointer position and held buttons at `offset`, by scanning from the start."""
+    track = plan.track
+    times, xs, ys, actions, codes = track.times, track.xs, track.ys, track.actions, track.buttons
+    position = None
+    held = set()
+    for i in range(len(times)):
+        if times[i] >= offset:
+            break
+        position = xs[i], ys[i]
+        if actions[i] == mrec.ACTION_PRESS:
+            held.add(codes[i])
+        elif actions[i] == mrec.ACTION_RELEASE:
+            held.discard(codes[i])
+    return position, held
+
+
+class FakeStat:
+    st_mtime_ns = 0
+    st_size = 0
+
+
+def bench(size, seeks, walks):
+    track, total_duration = synthetic_track(size)
+    plan = compile_plan(track, total_duration, presorted=True)
+    deadlines, _ = retime(plan.track.times, plan.total_duration)
+    rng = random.Random(0)
+    points = [sorted((rng.uniform(0, total_duration), rng.uniform(0, total_duration))) for _ in range(seeks)]
+
+    clock = time.perf_counter
+    resolve_us = []
+    for start, end in points:
+        t0 = clock()
+        resolve_segment(None, plan, deadlines, start, end)
+        resolve_us.append((clock() - t0) * 1e6)
+    walk_ms = []
+    for start, _ in points[:walks]:
+        t0 = clock()
+        walk(plan, start)
+        walk_ms.append((clock() - t0) * 1e3)
+
+    blob = encode_plan(plan, FakeStat)
+    t0 = clock()
+    decode_plan(blob, FakeStat)
+    decode_ms = (clock() - t0) * 1e3
+
+    resolve_us.sort()
+    walk_ms.sort()
+    return {
+        'events': size,
+        'button_states': len(plan.state_indexes),
+        'segment_p50_us': percentile(resolve_us, 50),
+        'segment_max_us': resolve_us[-1],
+        'walk_p50_ms': percentile(walk_ms, 50),
+        'walk_max_ms': walk_ms[-1],
+        'plan_decode_ms': decode_ms,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Segment seek benchmark")
+    parser.add_argument("--sizes", type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help="Recording sizes in events (default: 10k, 100k, 1M).")
+    parser.add_argument("--seeks", type=int, default=1000, help="Segments resolved per size (default: 1000).")
+    parser.add_argument("--walks", type=int, default=5, help="Linear walks per size (default: 5).")
+    parser.add_argument("--json", type=str, help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'events':>10} {'states':>7} {'seek p50 us':>12} {'seek max us':>12} {'walk p50 ms':>12} {'decode ms':>10}")
+    for size in args.sizes:
+        r = bench(size, args.seeks, args.walks)
+        results.append(r)
+        print(f"{r['events']:>10} {r['button_states']:>7} {r['segment_p50_us']:>12.1f} {r['segment_max_us']:>12.1f} "
+              f"{r['walk_p50_ms']:>12.2f} {r['plan_decode_ms']:>10.2f}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
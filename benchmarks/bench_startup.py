@@ -0,0 +1,154 @@
+"""Startup benchmark for the command-line entry points.
+
+Each case runs a real subcommand in a fresh interpreter and checks two things:
+
+    budget     median wall time of --runs invocations, in milliseconds
+    forbidden  modules the command must not import (read from one extra run
+               under `python -X importtime`), e.g. pynput for `stop`
+
+The slowest imports of every case are listed so a regression points at its
+cause. Exits with status 1 when any case is over budget or imports a
+forbidden module.
+
+Usage:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 20 --json startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(ROOT, 'mouse_app'))
+import mrec
+from control import ControlClient
+from synth import synthetic_track
+
+EXECUTOR = os.path.join(ROOT, 'mouse_executor.py')
+RECORDER = os.path.join(ROOT, 'mouse_app', 'mouse_rec.py')
+DOT_COPY = os.path.join(ROOT, 'dot', 'dot_copy.py')
+
+# name, argv after the interpreter, budget in ms, forbidden modules
+CASES = (
+    ('interpreter', ['-c', 'pass'], 40, ()),
+    ('executor stop', [EXECUTOR, '--socket', '{socket}', 'stop'], 75,
+     ('pynput', 'multiprocessing', 'subprocess', 'socketserver', 'player', 'loader', 'plan', 'mrec')),
+    ('executor status', [EXECUTOR, '--socket', '{socket}', 'status'], 75,
+     ('pynput', 'multiprocessing', 'subprocess', 'socketserver', 'player', 'loader', 'plan', 'mrec')),
+    ('executor play', [EXECUTOR, '--socket', '{socket}', 'play', '-f', '{recording}', '--backend', 'fake'], 75,
+     ('pynput', 'multiprocessing', 'subprocess', 'socketserver', 'player', 'loader', 'plan', 'mrec')),
+    ('recorder stop', [RECORDER, 'stop'], 60, ('pynput', 'tkinter')),
+    ('dot_copy bad --variables', [DOT_COPY, '--variables', '{missing}'], 50, ('PyQt5', 'pyperclip')),
+)
+
+
+def parse_importtime(stderr):
+    """[(module, self_us, cumulative_us)] from `python -X importtime` output."""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        imports.append((name.strip(), int(self_us), int(cumulative_us)))
+    return imports
+
+
+def is_forbidden(module, forbidden):
+    return any(module == f or module.startswith(f + '.') for f in forbidden)
+
+
+def run_case(argv, runs, workdir, after=None):
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable] + argv, cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        samples.append((time.perf_counter() - t0) * 1000)
+        if after:
+            after()
+    traced = subprocess.run([sys.executable, '-X', 'importtime'] + argv, cwd=workdir,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if after:
+        after()
+    return samples, parse_importtime(traced.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Command-line startup benchmark")
+    parser.add_argument("--runs", type=int, default=10, help="Timed invocations per case (default: 10).")
+    parser.add_argument("--top", type=int, default=5, help="Slowest imports listed per case (default: 5).")
+    parser.add_argument("--json", type=str, help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    results = []
+    failed = False
+    with tempfile.TemporaryDirectory() as workdir:
+        recording = os.path.join(workdir, 'short.mrec')
+        track, total_duration = synthetic_track(100)
+        with open(recording, 'wb') as f:
+            f.write(mrec.encode_track(track, total_duration))
+        socket_path = os.path.join(workdir, 'executor.sock')
+        values = {'socket': socket_path, 'recording': recording, 'missing': os.path.join(workdir, 'missing.json')}
+
+        # A running daemon, so `play`, `stop` and `status` measure only the client side.
+        daemon = subprocess.Popen([sys.executable, EXECUTOR, '--socket', socket_path, 'serve', '--backend', 'fake'],
+                                  cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        client = None
+        for _ in range(500):
+            try:
+                client = ControlClient(socket_path)
+                break
+            except OSError:
+                time.sleep(0.01)
+        if client is None:
+            daemon.kill()
+            sys.exit("Error: the playback daemon did not start.")
+
+        def stop_playback():
+            client.request('stop')
+
+        try:
+            for name, argv, budget_ms, forbidden in CASES:
+                argv = [arg.format(**values) for arg in argv]
+                after = stop_playback if 'play' in argv else None
+                samples, imports = run_case(argv, args.runs, workdir, after)
+                median = statistics.median(samples)
+                bad = sorted({module for module, _, _ in imports if is_forbidden(module, forbidden)})
+                slowest = sorted(imports, key=lambda item: item[1], reverse=True)[:args.top]
+                ok = median <= budget_ms and not bad
+                failed |= not ok
+                results.append({
+                    'case': name,
+                    'median_ms': median,
+                    'min_ms': min(samples),
+                    'budget_ms': budget_ms,
+                    'modules': len(imports),
+                    'forbidden_imported': bad,
+                    'slowest_imports_us': [[module, self_us] for module, self_us, _ in slowest],
+                    'ok': ok,
+                })
+            client.request('shutdown')
+        finally:
+            client.close()
+            daemon.wait(timeout=10)
+
+    print(f"{'case':<26} {'median ms':>10} {'min ms':>8} {'budget':>7} {'modules':>8}  result")
+    for r in results:
+        status = 'ok' if r['ok'] else 'FAIL'
+        if r['forbidden_imported']:
+            status += f" (imports {', '.join(r['forbidden_imported'])})"
+        print(f"{r['case']:<26} {r['median_ms']:>10.1f} {r['min_ms']:>8.1f} {r['budget_ms']:>7} {r['modules']:>8}  {status}")
+        print(f"{'':<26} slowest: " + ', '.join(f"{m} {us / 1000:.1f}ms" for m, us in r['slowest_imports_us']))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=4)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
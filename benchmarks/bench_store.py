@@ -0,0 +1,172 @@
+"""Deduplicated store benchmark: disk usage and speed of a macro library.
+
+Builds a library of --takes recordings of about --size events each, the way
+macro libraries grow: most takes are a contiguous stretch of one base
+session with a few fresh strokes spliced in (re-recorded, trimmed or
+extended copies), and every --fresh-every-th take is an unrelated session.
+Times are whole nanoseconds, as the recorder writes them.
+
+Every take is added with store.save_track() and reported against:
+
+    mrec     the take as a standalone .mrec (the smallest non-deduplicated
+             format; JSON is about 9x larger)
+    store    chunk bytes the take added to the store, plus its manifest
+
+Then every take is loaded twice: with the in-process chunk cache emptied
+before each load (cold), and in a row so that chunks shared with earlier
+takes come from the cache (shared).
+
+Last, `mouse_executor.py store gc --dry-run LIBRARY` is run on the library
+with one more recording saved outside it and every chunk older than the gc
+grace period: it must keep the outside recording's chunks (they are in the
+store's registry) and report exactly them once that recording is deleted.
+Exits with status 1 when it does not.
+
+Usage:
+    python benchmarks/bench_store.py
+    python benchmarks/bench_store.py --takes 50 --size 200000 --json store.json
+"""
+import argparse
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(ROOT, 'mouse_app'))
+import mrec
+import store
+from synth import realistic_track
+
+EXECUTOR = os.path.join(ROOT, 'mouse_executor.py')
+
+
+def nanoseconds(track):
+    """Round the times of `track` to whole nanoseconds (recorder output), in place."""
+    times = track.times
+    for i in range(len(times)):
+        times[i] = round(times[i] * 1e9) / 1e9
+    return track
+
+
+def splice(base, fresh, rng):
+    """A take: a stretch of `base` with a run of `fresh` inserted somewhere inside it."""
+    n = len(base)
+    start = rng.randrange(0, n // 4)
+    stop = rng.randrange(n - n // 4, n)
+    cut = rng.randrange(start, stop)
+    insert = rng.randrange(len(fresh) // 10, len(fresh) // 4)
+    take = base.empty_like()
+    end_ns = None
+    for track, first, last in ((base, start, cut), (fresh, 0, insert), (base, cut, stop)):
+        # Each piece starts 1 ms after the previous one ends
+        shift = (0 if end_ns is None else end_ns + 1000000) - round(track.times[first] * 1e9)
+        for i in range(first, last):
+            end_ns = round(track.times[i] * 1e9) + shift
+            code = take.button_code(track.button_names[track.buttons[i]])
+            take.append(end_ns / 1e9, track.actions[i], code, track.xs[i], track.ys[i], track.dxs[i], track.dys[i])
+    return take, take.times[-1] + 0.5
+
+
+def dry_run_gc(chunk_store, library):
+    """Chunks `store gc --dry-run LIBRARY` would remove, run as a command."""
+    out = subprocess.run([sys.executable, EXECUTOR, 'store', 'gc', '--dry-run', library], capture_output=True,
+                         text=True, env=dict(os.environ, MOUSE_STORE=chunk_store.root))
+    found = re.match(r'Would remove (\d+) ', out.stdout)
+    if out.returncode or not found:
+        raise RuntimeError(f"store gc --dry-run failed: {out.stdout}{out.stderr}")
+    return int(found.group(1))
+
+
+def check_gc(chunk_store, folder, library, size):
+    """Failures of `store gc --dry-run` on `library` with a recording saved elsewhere."""
+    outside = os.path.join(folder, 'elsewhere', f'outside{store.EXTENSION}')
+    os.makedirs(os.path.dirname(outside))
+    track = nanoseconds(realistic_track(size, seed=1000)[0])
+    writer = store.save_track(outside, track, track.times[-1] + 0.5, chunk_store)
+    past = time.time() - 2 * store.GC_GRACE_SECONDS
+    for _, chunk_path in chunk_store.chunks():
+        os.utime(chunk_path, (past, past))
+    failures = []
+    kept = dry_run_gc(chunk_store, library)
+    if kept:
+        failures.append(f"with {outside} registered, gc would remove {kept} chunk(s), expected 0")
+    os.remove(outside)
+    removed = dry_run_gc(chunk_store, library)
+    if removed != writer.new_chunks:
+        failures.append(f"with {outside} deleted, gc would remove {removed} chunk(s), expected {writer.new_chunks}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deduplicated recording store benchmark")
+    parser.add_argument("--takes", type=int, default=20, help="Recordings in the library (default: 20).")
+    parser.add_argument("--size", type=int, default=100000, help="Events of the base session (default: 100000).")
+    parser.add_argument("--fresh-every", type=int, default=5,
+                        help="Every Nth take is an unrelated session (default: 5).")
+    parser.add_argument("--json", type=str, help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    base = nanoseconds(realistic_track(args.size, seed=0)[0])
+    rng = random.Random(1)
+    takes = []
+    for i in range(args.takes):
+        fresh = nanoseconds(realistic_track(args.size // 4 if i % args.fresh_every else args.size, seed=i + 1)[0])
+        if i % args.fresh_every:
+            takes.append(splice(base, fresh, rng))
+        else:
+            takes.append((fresh, fresh.times[-1] + 0.5))
+
+    clock = time.perf_counter
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        chunk_store = store.ChunkStore(os.path.join(folder, 'store'))
+        library = os.path.join(folder, 'library')
+        os.makedirs(library)
+        print(f"{'take':>5} {'events':>8} {'chunks':>7} {'new':>5} {'mrec KB':>8} {'store KB':>9} {'save s':>7}")
+        for i, (track, total_duration) in enumerate(takes):
+            path = os.path.join(library, f'take_{i}{store.EXTENSION}')
+            t0 = clock()
+            writer = store.save_track(path, track, total_duration, chunk_store)
+            save = clock() - t0
+            r = {'take': i, 'events': len(track), 'chunks': len(writer.entries), 'new_chunks': writer.new_chunks,
+                 'mrec_bytes': len(mrec.encode_track(track, total_duration)),
+                 'store_bytes': writer.new_bytes + os.path.getsize(path), 'save_s': save}
+            results.append(r)
+            print(f"{i:>5} {r['events']:>8} {r['chunks']:>7} {r['new_chunks']:>5} {r['mrec_bytes'] / 1024:>8.0f} "
+                  f"{r['store_bytes'] / 1024:>9.0f} {save:>7.3f}")
+
+        loads = {}
+        for mode in ('cold', 'shared'):
+            store.clear_cache()
+            t0 = clock()
+            for i in range(len(takes)):
+                if mode == 'cold':
+                    store.clear_cache()
+                store.load_track(os.path.join(library, f'take_{i}{store.EXTENSION}'), chunk_store)
+            loads[mode] = clock() - t0
+
+        failures = check_gc(chunk_store, folder, library, args.size // 4)
+
+    mrec_total = sum(r['mrec_bytes'] for r in results)
+    store_total = sum(r['store_bytes'] for r in results)
+    events = sum(r['events'] for r in results)
+    print(f"\nlibrary: {events} events, .mrec {mrec_total / 1e6:.2f} MB, store {store_total / 1e6:.2f} MB "
+          f"({mrec_total / store_total:.1f}x smaller)")
+    print(f"load all: cold {loads['cold']:.2f}s, shared chunks cached {loads['shared']:.2f}s")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'takes': results, 'mrec_bytes': mrec_total, 'store_bytes': store_total,
+                       'load_cold_s': loads['cold'], 'load_shared_s': loads['shared'], 'failures': failures}, f, indent=4)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
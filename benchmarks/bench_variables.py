@@ -0,0 +1,76 @@
+"""Startup cost of dot_copy's variable sources by list size.
+
+For each size, writes the same variables as a JSON list and as .ndjson and
+measures in a fresh interpreter what dot_copy does before the window opens:
+open the source, read the first variable and the saved position. Reports wall
+time and peak RSS of that process. The .ndjson source is measured cold (its
+offset index is built) and warm (the index already exists).
+
+Usage:
+    python benchmarks/bench_variables.py
+    python benchmarks/bench_variables.py --sizes 1000 100000 1000000 --json variables.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+DOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dot')
+
+PROBE = """
+import json, resource, sys, time
+sys.path.insert(0, sys.argv[1])
+t0 = time.perf_counter()
+import dot_vars
+variables = dot_vars.open_variables(sys.argv[2])
+first = variables[0]
+start = dot_vars.SavedPosition(sys.argv[2]).load()
+elapsed = time.perf_counter() - t0
+try:
+    # ru_maxrss survives exec, so it would include the parent's peak
+    with open('/proc/self/status') as f:
+        rss_kb = next(int(line.split()[1]) for line in f if line.startswith('VmHWM:'))
+except OSError:
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({'ms': elapsed * 1000, 'rss_mb': rss_kb / 1024, 'count': len(variables)}))
+"""
+
+
+def probe(path):
+    out = subprocess.run([sys.executable, '-c', PROBE, DOT_DIR, path], capture_output=True, text=True, check=True)
+    return json.loads(out.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="dot_copy variable source startup benchmark")
+    parser.add_argument("--sizes", type=int, nargs='+', default=[1000, 100000, 1000000],
+                        help="Numbers of variables to try (default: 1000 100000 1000000).")
+    parser.add_argument("--json", type=str, help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        for size in args.sizes:
+            variables = [f"variável {i}: https://exemplo.com/item/{i}" for i in range(size)]
+            json_path = os.path.join(folder, f'vars_{size}.json')
+            ndjson_path = os.path.join(folder, f'vars_{size}.ndjson')
+            with open(json_path, 'w') as f:
+                json.dump(variables, f)
+            with open(ndjson_path, 'w') as f:
+                f.writelines(json.dumps(v) + '\n' for v in variables)
+            del variables
+            for source, path in (('json', json_path), ('ndjson cold', ndjson_path), ('ndjson warm', ndjson_path)):
+                results.append(dict(probe(path), source=source, size=size))
+
+    print(f"{'size':>9} {'source':<12} {'ms':>9} {'peak RSS MB':>12}")
+    for r in results:
+        print(f"{r['size']:>9} {r['source']:<12} {r['ms']:>9.1f} {r['rss_mb']:>12.1f}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
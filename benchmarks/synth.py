@@ -0,0 +1,144 @@
+"""Synthetic recordings for the benchmarks.
+
+`synthetic_track(n)` builds an EventTrack of `n` events sampled at `rate` Hz:
+a random-walk pointer path with a press/release pair every `click_every`
+events and a scroll every `scroll_every` events.
+
+`realistic_track(n)` builds `n` events shaped like a desktop session instead:
+idle pauses, then strokes of pointer motion at `rate` Hz that slow down into
+their target (minimum-jerk profile, Fitts-like durations, a little tremor),
+ending in a click, a double click, a drag or a burst of scroll ticks. Use it
+where the event mix and timing matter (file sizes, idle gaps, click counts).
+"""
+import math
+import os
+import random
+import sys
+from array import array
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mouse_app'))
+from event_track import EventTrack
+from mrec import ACTION_MOVE, ACTION_PRESS, ACTION_RELEASE, ACTION_SCROLL
+
+SCREEN = (1920, 1080)
+
+
+def synthetic_track(n, rate=1000.0, seed=0, click_every=500, scroll_every=2000):
+    """Returns (EventTrack, total_duration)."""
+    rng = random.Random(seed)
+    period = 1.0 / rate
+    times = array('d', (i * period for i in range(n)))
+    xs = array('i', bytes(4 * n))
+    ys = array('i', bytes(4 * n))
+    actions = array('B', bytes(n))
+    buttons = array('B', bytes(n))
+    dxs = array('i', bytes(4 * n))
+    dys = array('i', bytes(4 * n))
+    x, y = SCREEN[0] // 2, SCREEN[1] // 2
+    vx = vy = 0.0
+    for i in range(n):
+        vx = 0.9 * vx + rng.uniform(-2.0, 2.0)
+        vy = 0.9 * vy + rng.uniform(-2.0, 2.0)
+        x = min(max(int(x + vx), 0), SCREEN[0] - 1)
+        y = min(max(int(y + vy), 0), SCREEN[1] - 1)
+        xs[i] = x
+        ys[i] = y
+        if click_every and i % click_every == click_every - 2:
+            actions[i] = ACTION_PRESS
+            buttons[i] = 1
+        elif click_every and i % click_every == click_every - 1:
+            actions[i] = ACTION_RELEASE
+            buttons[i] = 1
+        elif scroll_every and i % scroll_every == scroll_every // 2:
+            actions[i] = ACTION_SCROLL
+            dys[i] = rng.choice((-1, 1))
+        else:
+            actions[i] = ACTION_MOVE
+    track = EventTrack.from_columns(times, xs, ys, actions, buttons, dxs, dys, [None, 'Button.left'])
+    return track, n * period
+
+
+# Share of strokes ending in each way, and how often each button is used
+ENDINGS = (('click', 0.50), ('double', 0.10), ('drag', 0.10), ('scroll', 0.15), ('none', 0.15))
+BUTTON_MIX = (('Button.left', 0.90), ('Button.right', 0.08), ('Button.middle', 0.02))
+
+
+def _pick(rng, weighted):
+    r = rng.random()
+    for value, weight in weighted:
+        r -= weight
+        if r < 0:
+            return value
+    return weighted[-1][0]
+
+
+def realistic_track(n, rate=1000.0, seed=0):
+    """Returns (EventTrack of exactly `n` events, total_duration); see the module docstring."""
+    rng = random.Random(seed)
+    track = EventTrack()
+    append = track.append
+    codes = {name: track.button_code(name) for name, _ in BUTTON_MIX}
+    period = 1.0 / rate
+    width, height = SCREEN
+    t = 0.0
+    x, y = width // 2, height // 2
+
+    def stroke(button=0):
+        nonlocal t, x, y
+        tx = min(max(int(rng.gauss(x, width / 4)), 0), width - 1)
+        ty = min(max(int(rng.gauss(y, height / 4)), 0), height - 1)
+        distance = math.hypot(tx - x, ty - y)
+        duration = (0.1 + 0.15 * math.log2(1 + distance / 20)) * rng.uniform(0.8, 1.2)
+        steps = max(2, int(duration * rate))
+        x0, y0 = x, y
+        for k in range(1, steps + 1):
+            s = k / steps
+            p = s * s * s * (10 - 15 * s + 6 * s * s)  # minimum jerk
+            t += period * rng.uniform(0.9, 1.1)
+            x = min(max(int(x0 + (tx - x0) * p + rng.gauss(0, 0.4)), 0), width - 1)
+            y = min(max(int(y0 + (ty - y0) * p + rng.gauss(0, 0.4)), 0), height - 1)
+            append(t, ACTION_MOVE, button, x, y)
+
+    def click(button):
+        nonlocal t
+        t += rng.uniform(0.05, 0.2)
+        append(t, ACTION_PRESS, button, x, y)
+        t += rng.uniform(0.06, 0.14)
+        append(t, ACTION_RELEASE, button, x, y)
+
+    while len(track) < n:
+        t += rng.expovariate(1 / 0.6)  # idle, 0.6 s on average
+        stroke()
+        ending = _pick(rng, ENDINGS)
+        button = codes[_pick(rng, BUTTON_MIX)]
+        if ending == 'click':
+            click(button)
+        elif ending == 'double':
+            click(button)
+            click(button)
+        elif ending == 'drag':
+            button = codes['Button.left']
+            t += rng.uniform(0.05, 0.2)
+            append(t, ACTION_PRESS, button, x, y)
+            stroke()
+            t += rng.uniform(0.05, 0.15)
+            append(t, ACTION_RELEASE, button, x, y)
+        elif ending == 'scroll':
+            direction = rng.choice((-1, 1))
+            for _ in range(rng.randint(3, 15)):
+                t += rng.uniform(0.02, 0.06)
+                append(t, ACTION_SCROLL, 0, x, y, 0, direction)
+    if len(track) > n:
+        track = EventTrack.from_columns(*(getattr(track, name)[:n] for name in
+                                          ('times', 'xs', 'ys', 'actions', 'buttons', 'dxs', 'dys')),
+                                        track.button_names)
+    return track, track.times[-1] + 0.5 if n else 0.0
+
+
+def event_mix(track):
+    """Fraction of moves, presses, releases and scrolls in `track`."""
+    counts = [0] * 4
+    for action in track.column('actions'):
+        counts[action] += 1
+    total = max(len(track), 1)
+    return {name: count / total for name, count in zip(('move', 'press', 'release', 'scroll'), counts)}
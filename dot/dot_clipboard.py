@@ -0,0 +1,63 @@
+"""Área de transferência do dot_copy.
+
+    qt         QClipboard do QApplication já aberto: a cópia é uma chamada em
+               processo, sem criar subprocessos
+    pyperclip  pyperclip.copy(), que no Linux executa xclip/xsel/wl-copy a
+               cada cópia; usado só quando o Qt não está disponível
+
+No X11 o texto copiado pelo Qt pertence ao processo: sem um gerenciador de
+área de transferência ele some quando o dot_copy fecha. Por isso a última
+cópia antes de fechar (persist=True) também passa pelo pyperclip, cujo xclip continua
+servindo o texto depois que o programa termina (só no modo 'auto').
+"""
+
+CLIPBOARDS = ('auto', 'qt', 'pyperclip')
+
+
+class PyperclipClipboard:
+    name = 'pyperclip'
+
+    def __init__(self):
+        import pyperclip
+        self._copy = pyperclip.copy
+
+    def copy(self, text, persist=False):
+        self._copy(text)
+
+
+class QtClipboard:
+    name = 'qt'
+
+    def __init__(self, fallback=None):
+        from PyQt5.QtGui import QGuiApplication
+        if QGuiApplication.instance() is None:
+            raise RuntimeError("O QClipboard precisa de um QApplication já criado.")
+        self._clipboard = QGuiApplication.clipboard()
+        self._fallback = fallback
+
+    def copy(self, text, persist=False):
+        self._clipboard.setText(text)
+        if persist and self._fallback is not None:
+            try:
+                self._fallback.copy(text)
+            except RuntimeError:  # pyperclip sem xclip/xsel/wl-copy: fica só a cópia do Qt
+                pass
+
+
+def _pyperclip_or_none():
+    try:
+        return PyperclipClipboard()
+    except ImportError:
+        return None
+
+
+def create_clipboard(kind='auto'):
+    """Área de transferência `kind`; 'auto' prefere o Qt e cai para o pyperclip."""
+    if kind == 'pyperclip':
+        return PyperclipClipboard()
+    if kind == 'qt':
+        return QtClipboard()
+    try:
+        return QtClipboard(_pyperclip_or_none())
+    except (ImportError, RuntimeError):
+        return PyperclipClipboard()
@@ -1,12 +1,10 @@
 import sys
-import json
-import pyperclip
-from PyQt5.QtWidgets import QApplication, QWidget, QLabel
-from PyQt5.QtGui import QPixmap, QColor, QPainter, QFont
-from PyQt5.QtCore import Qt, QTimer
 import argparse
 import os
 
+from dot_clipboard import CLIPBOARDS, create_clipboard
+from dot_vars import SavedPosition, open_variables
+
 # Obter o diretório do script para caminhos relativos
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 DEFAULT_IMAGE = os.path.join(SCRIPT_DIR, 'icons', 'botao_2.png')
@@ -21,120 +19,45 @@ SMOOTH_TRANSFORMATION = 1
 LEFT_BUTTON = 1
 RIGHT_BUTTON = 2
 
-class Toast(QWidget):
-    def __init__(self, text, parent=None):
-        super().__init__(parent)
-        self.setWindowFlags(
-            Qt.FramelessWindowHint | Qt.Tool | Qt.WindowStaysOnTopHint  # pyright: ignore[reportAttributeAccessIssue,reportArgumentType]
-        )
-        self.setAttribute(Qt.WA_TranslucentBackground)  # pyright: ignore[reportAttributeAccessIssue,reportArgumentType]
-        self.label = QLabel(text, self)
-        self.label.setStyleSheet('''
-            QLabel {
-                color: #222;
-                background: rgba(255,255,255,0.85);
-                border-radius: 12px;
-                border: 1.5px solid #e0e0e0;
-                padding: 9px 18px;
-                font-size: 12px;
-                font-family: "San Francisco", "Arial", sans-serif;
-            }
-        ''')
-        self.label.adjustSize()
-        self.resize(self.label.size())
-        self.setFixedSize(self.label.size())
-        self.setStyleSheet('QWidget { border-radius: 12px; background: transparent; }')
-        QTimer.singleShot(1200, lambda: (self.close(), None)[-1])
-
-    def show_centered(self, parent):
-        parent_geom = parent.geometry()
-        x = parent_geom.x() + (parent_geom.width() - self.width()) // 2
-        y = parent_geom.y() + parent_geom.height() + 12
-        self.move(x, y)
-        self.show()
-
-class CircularButton(QWidget):
-    def __init__(self, variables, image_path):
-        super().__init__()
-        self.variables = variables
-        self.current_index = 0
-
-        # Carregar imagem PNG e redimensionar para 25% do tamanho original
-        pixmap = QPixmap(image_path)
-        if pixmap.isNull():
-            raise FileNotFoundError(f"Imagem não encontrada: {image_path}")
-        size = pixmap.size()
-        new_width = int(size.width() * 0.25)
-        new_height = int(size.height() * 0.25)
-        self.pixmap = pixmap.scaled(
-            new_width, new_height, 
-            Qt.KeepAspectRatio, Qt.SmoothTransformation  # pyright: ignore[reportAttributeAccessIssue,reportArgumentType]
-        )
-        self.setFixedSize(self.pixmap.size())
-
-        # Tornar a janela do formato da imagem (transparente nas áreas do PNG)
-        mask = self.pixmap.createMaskFromColor(QColor(0, 0, 0, 0))
-        self.setMask(mask)
-
-        # Sem borda, sem barra de título, sempre no topo
-        self.setWindowFlags(
-            Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint | Qt.Tool  # pyright: ignore[reportAttributeAccessIssue,reportArgumentType]
-        )
-        self.setAttribute(Qt.WA_TranslucentBackground)  # pyright: ignore[reportAttributeAccessIssue,reportArgumentType]
-
-        # Exibir imagem
-        self.label = QLabel(self)
-        self.label.setPixmap(self.pixmap)
-        self.label.setGeometry(0, 0, self.pixmap.width(), self.pixmap.height())
-
-        # Permitir arrastar
-        self._drag_pos = None
-
-    def mousePressEvent(self, event):
-        if event.button() == Qt.LeftButton:  # pyright: ignore[reportAttributeAccessIssue]
-            if self.current_index < len(self.variables):
-                pyperclip.copy(self.variables[self.current_index])
-                self.show_toast(self.variables[self.current_index])
-                self.current_index += 1
-                if self.current_index >= len(self.variables):
-                    self.close()
-            else:
-                self.close()
-        elif event.button() == Qt.RightButton:  # pyright: ignore[reportAttributeAccessIssue]
-            self._drag_pos = event.globalPos() - self.frameGeometry().topLeft()
-            event.accept()
-
-    def mouseMoveEvent(self, event):
-        if event.buttons() and self._drag_pos:
-            self.move(event.globalPos() - self._drag_pos)
-            event.accept()
-
-    def show_toast(self, text):
-        toast = Toast(text, self)
-        toast.show_centered(self)
-
-def load_variables(json_path):
-    if not os.path.exists(json_path):
-        raise FileNotFoundError(f"Arquivo de variáveis não encontrado: {json_path}")
-    with open(json_path, 'r') as f:
-        data = json.load(f)
-        if isinstance(data, list):
-            return data
-        elif isinstance(data, dict):
-            return data.get("variables", [])
-        else:
-            return []
-
 def main():
     parser = argparse.ArgumentParser(description="Botão Circular Flutuante PyQt Minimalista")
-    parser.add_argument("--variables", "-v", type=str, required=True, help="Arquivo JSON com variáveis")
+    parser.add_argument("--variables", "-v", type=str, required=True,
+                        help="Arquivo de variáveis: JSON (lista de strings) ou .ndjson/.jsonl (uma string JSON por linha)")
+    parser.add_argument("--clipboard", choices=CLIPBOARDS, default="auto",
+                        help="Área de transferência: qt (QClipboard, sem subprocessos), pyperclip, ou auto "
+                             "(qt, com pyperclip como alternativa; padrão)")
+    parser.add_argument("--restart", action="store_true",
+                        help="Ignora a posição salva e começa da primeira variável")
     args = parser.parse_args()
 
-    variables = load_variables(args.variables)
+    # Valida as variáveis antes de importar o PyQt5 (que é lento para carregar)
+    try:
+        variables = open_variables(args.variables)
+    except (OSError, ValueError) as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        sys.exit(1)
+    if not len(variables):
+        print(f"Erro: nenhuma variável encontrada em {args.variables}", file=sys.stderr)
+        sys.exit(1)
     image_path = DEFAULT_IMAGE
 
+    # Continua de onde a execução anterior parou
+    position = SavedPosition(args.variables)
+    start_index = 0 if args.restart else position.load()
+    if start_index >= len(variables):
+        start_index = 0
+    if start_index:
+        print(f"Continuando da variável {start_index + 1} de {len(variables)} (use --restart para recomeçar).")
+
+    from PyQt5.QtWidgets import QApplication
+    from dot_gui import CircularButton
     app = QApplication(sys.argv)
-    btn = CircularButton(variables, image_path)
+    try:
+        clipboard = create_clipboard(args.clipboard)
+    except ImportError as e:
+        print(f"Erro: área de transferência '{args.clipboard}' indisponível: {e}", file=sys.stderr)
+        sys.exit(1)
+    btn = CircularButton(variables, image_path, clipboard, position, start_index)
     btn.show()
     sys.exit(app.exec_())
 
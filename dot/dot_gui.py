@@ -0,0 +1,166 @@
+"""Widgets do dot_copy: o botão circular flutuante e o aviso (toast).
+
+Separado de dot_copy.py para que o PyQt5 só seja importado depois que
+--variables foi validado.
+
+A imagem reduzida do botão e a máscara da janela ficam em cache em disco
+(ICON_CACHE_DIR), com chave pela imagem de origem (caminho, mtime, tamanho)
+e pelo fator de escala, para não refazer a redução suave a cada execução.
+"""
+import hashlib
+import os
+import sys
+
+from PyQt5.QtWidgets import QWidget, QLabel
+from PyQt5.QtGui import QBitmap, QPixmap, QColor
+from PyQt5.QtCore import Qt, QTimer
+
+ICON_SCALE = 0.25          # fração do tamanho original da imagem do botão
+ICON_CACHE_DIR = os.environ.get('DOT_COPY_CACHE') or os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'dot_copy', 'icons')
+TOAST_DURATION_MS = 1200
+
+# --- Cache da imagem ---
+def _icon_cache_paths(image_path, scale, cache_dir):
+    stat = os.stat(image_path)
+    key = f"{os.path.abspath(image_path)}|{stat.st_mtime_ns}|{stat.st_size}|{scale}"
+    name = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, name + '.png'), os.path.join(cache_dir, name + '.mask.png')
+
+def _save_png(image, path):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    if image.save(tmp_path, 'PNG'):
+        os.replace(tmp_path, path)
+
+def load_scaled_icon(image_path, scale=ICON_SCALE, cache_dir=None):
+    """(QPixmap reduzido por `scale`, máscara da janela), do cache quando possível."""
+    cache_dir = cache_dir or ICON_CACHE_DIR
+    try:
+        pixmap_path, mask_path = _icon_cache_paths(image_path, scale, cache_dir)
+    except OSError:
+        raise FileNotFoundError(f"Imagem não encontrada: {image_path}") from None
+    if os.path.exists(pixmap_path) and os.path.exists(mask_path):
+        pixmap, mask = QPixmap(pixmap_path), QBitmap(mask_path)
+        if not pixmap.isNull() and not mask.isNull():
+            return pixmap, mask
+
+    source = QPixmap(image_path)
+    if source.isNull():
+        raise FileNotFoundError(f"Imagem não encontrada: {image_path}")
+    size = source.size()
+    pixmap = source.scaled(
+        int(size.width() * scale), int(size.height() * scale),
+        Qt.KeepAspectRatio, Qt.SmoothTransformation  # pyright: ignore[reportAttributeAccessIssue,reportArgumentType]
+    )
+    # Tornar a janela do formato da imagem (transparente nas áreas do PNG)
+    mask = pixmap.createMaskFromColor(QColor(0, 0, 0, 0))
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        _save_png(pixmap, pixmap_path)
+        _save_png(mask, mask_path)
+    except OSError:
+        pass  # sem cache a imagem só é reduzida de novo na próxima execução
+    return pixmap, mask
+
+# --- Widgets ---
+class Toast(QWidget):
+    """Aviso abaixo do botão. Um único widget é reutilizado: cada cópia só troca
+    o texto e reinicia o timer que o esconde."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowFlags(
+            Qt.FramelessWindowHint | Qt.Tool | Qt.WindowStaysOnTopHint  # pyright: ignore[reportAttributeAccessIssue,reportArgumentType]
+        )
+        self.setAttribute(Qt.WA_TranslucentBackground)  # pyright: ignore[reportAttributeAccessIssue,reportArgumentType]
+        self.label = QLabel(self)
+        self.label.setStyleSheet('''
+            QLabel {
+                color: #222;
+                background: rgba(255,255,255,0.85);
+                border-radius: 12px;
+                border: 1.5px solid #e0e0e0;
+                padding: 9px 18px;
+                font-size: 12px;
+                font-family: "San Francisco", "Arial", sans-serif;
+            }
+        ''')
+        self.setStyleSheet('QWidget { border-radius: 12px; background: transparent; }')
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.hide)
+
+    def show_text(self, text, parent):
+        """Mostra `text` centralizado abaixo de `parent` por TOAST_DURATION_MS."""
+        self.label.setText(text)
+        self.label.adjustSize()
+        self.setFixedSize(self.label.size())
+        parent_geom = parent.geometry()
+        x = parent_geom.x() + (parent_geom.width() - self.width()) // 2
+        y = parent_geom.y() + parent_geom.height() + 12
+        self.move(x, y)
+        self.show()
+        self._timer.start(TOAST_DURATION_MS)
+
+class CircularButton(QWidget):
+    def __init__(self, variables, image_path, clipboard, position=None, start_index=0):
+        super().__init__()
+        self.variables = variables
+        self.clipboard = clipboard  # dot_clipboard.QtClipboard ou PyperclipClipboard
+        self.position = position  # dot_vars.SavedPosition, ou None para não lembrar a posição
+        self.current_index = start_index
+
+        # Imagem PNG reduzida a 25% do tamanho original e máscara no formato da imagem
+        self.pixmap, mask = load_scaled_icon(image_path)
+        self.setFixedSize(self.pixmap.size())
+        self.setMask(mask)
+
+        # Sem borda, sem barra de título, sempre no topo
+        self.setWindowFlags(
+            Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint | Qt.Tool  # pyright: ignore[reportAttributeAccessIssue,reportArgumentType]
+        )
+        self.setAttribute(Qt.WA_TranslucentBackground)  # pyright: ignore[reportAttributeAccessIssue,reportArgumentType]
+
+        # Exibir imagem
+        self.label = QLabel(self)
+        self.label.setPixmap(self.pixmap)
+        self.label.setGeometry(0, 0, self.pixmap.width(), self.pixmap.height())
+
+        # Permitir arrastar
+        self._drag_pos = None
+        self._toast = None  # criado no primeiro clique e reutilizado
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:  # pyright: ignore[reportAttributeAccessIssue]
+            if self.current_index < len(self.variables):
+                try:
+                    text = self.variables[self.current_index]
+                except ValueError as e:  # linha inválida num .ndjson: pula para a próxima
+                    print(f"Erro: {e}", file=sys.stderr)
+                    text = None
+                self.current_index += 1
+                if text is not None:
+                    # A janela fecha depois da última cópia, que precisa sobreviver ao processo
+                    self.clipboard.copy(text, persist=self.current_index >= len(self.variables))
+                    self.show_toast(text)
+                if self.current_index >= len(self.variables):
+                    if self.position:
+                        self.position.clear()
+                    self.close()
+                elif self.position:
+                    self.position.save(self.current_index)
+            else:
+                self.close()
+        elif event.button() == Qt.RightButton:  # pyright: ignore[reportAttributeAccessIssue]
+            self._drag_pos = event.globalPos() - self.frameGeometry().topLeft()
+            event.accept()
+
+    def mouseMoveEvent(self, event):
+        if event.buttons() and self._drag_pos:
+            self.move(event.globalPos() - self._drag_pos)
+            event.accept()
+
+    def show_toast(self, text):
+        if self._toast is None:
+            self._toast = Toast(self)
+        self._toast.show_text(text, self)
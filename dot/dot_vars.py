@@ -0,0 +1,195 @@
+"""Fontes de variáveis do dot_copy e a posição salva entre execuções.
+
+Dois formatos de arquivo de variáveis:
+
+    .json            lista de strings (ou {"variables": [...]}), lida inteira
+    .ndjson/.jsonl   uma string JSON por linha, lida sob demanda
+
+No formato por linha nada é carregado na memória: o arquivo é mapeado com
+mmap e um índice de deslocamentos (um u64 por variável) fica no arquivo
+`<variáveis>.idx`, também mapeado. O índice é criado na primeira abertura e
+refeito quando o tamanho ou o mtime do arquivo mudam, então a abertura custa
+o mesmo com mil ou com um milhão de variáveis. Linhas em branco são ignoradas.
+
+A posição atual fica em `<variáveis>.pos` e é gravada a cada cópia, para que
+uma nova execução continue de onde a anterior parou.
+"""
+import json
+import mmap
+import os
+import struct
+from array import array
+
+NDJSON_EXTENSIONS = ('.ndjson', '.jsonl')
+INDEX_SUFFIX = '.idx'
+POSITION_SUFFIX = '.pos'
+INDEX_MAGIC = b'DVIX'
+INDEX_VERSION = 1
+INDEX_BATCH = 65536  # deslocamentos gravados por vez ao criar o índice
+
+_INDEX_HEADER = struct.Struct('<4sHqqQ')  # magic, versão, mtime_ns, tamanho, n_variáveis
+_OFFSET = struct.Struct('<Q')
+
+
+def is_ndjson(path):
+    return path.lower().endswith(NDJSON_EXTENSIONS)
+
+
+def load_variables(json_path):
+    """Lista de variáveis de um arquivo JSON (formato original)."""
+    if not os.path.exists(json_path):
+        raise FileNotFoundError(f"Arquivo de variáveis não encontrado: {json_path}")
+    with open(json_path, 'r') as f:
+        data = json.load(f)
+        if isinstance(data, list):
+            variables = data
+        elif isinstance(data, dict):
+            variables = data.get("variables", [])
+        else:
+            variables = []
+    if not isinstance(variables, list) or not all(isinstance(v, str) for v in variables):
+        raise ValueError(f"As variáveis devem ser strings: {json_path}")
+    return variables
+
+
+def _map(f):
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _write_index(data, index_path, stat):
+    """Grava o índice de `data` (mmap do arquivo) em blocos, sem guardar todos os deslocamentos."""
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    count = 0
+    with open(tmp_path, 'wb') as f:
+        f.write(_INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, stat.st_mtime_ns, stat.st_size, 0))
+        offsets = array('Q')
+        pos, size = 0, len(data)
+        while pos < size:
+            end = data.find(b'\n', pos)
+            if end < 0:
+                end = size
+            if data[pos:end].strip():
+                offsets.append(pos)
+                if len(offsets) == INDEX_BATCH:
+                    f.write(offsets.tobytes())
+                    count += len(offsets)
+                    offsets = array('Q')
+            pos = end + 1
+        f.write(offsets.tobytes())
+        count += len(offsets)
+        f.seek(0)
+        f.write(_INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, stat.st_mtime_ns, stat.st_size, count))
+    os.replace(tmp_path, index_path)
+
+
+def _valid_index(index, stat):
+    if len(index) < _INDEX_HEADER.size:
+        return False
+    magic, version, mtime_ns, size, count = _INDEX_HEADER.unpack_from(index, 0)
+    return ((magic, version, mtime_ns, size) == (INDEX_MAGIC, INDEX_VERSION, stat.st_mtime_ns, stat.st_size)
+            and len(index) == _INDEX_HEADER.size + count * _OFFSET.size)
+
+
+class NdjsonVariables:
+    """Sequência somente leitura das variáveis de um arquivo .ndjson, decodificadas sob demanda."""
+
+    def __init__(self, path, index_path=None):
+        self.path = path
+        self.index_path = index_path or path + INDEX_SUFFIX
+        stat = os.stat(path)
+        self._data = self._index = None
+        if stat.st_size:
+            with open(path, 'rb') as f:
+                self._data = _map(f)
+            self._index = self._open_index(stat)
+        self._count = _INDEX_HEADER.unpack_from(self._index, 0)[4] if self._index is not None else 0
+
+    def _open_index(self, stat):
+        for attempt in range(2):
+            try:
+                with open(self.index_path, 'rb') as f:
+                    index = _map(f)
+            except (OSError, ValueError):
+                index = None  # ausente ou vazio
+            if index is not None:
+                if _valid_index(index, stat):
+                    return index
+                index.close()
+            if attempt == 0:
+                _write_index(self._data, self.index_path, stat)
+        raise ValueError(f"Não foi possível criar o índice {self.index_path}")
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        if not 0 <= i < self._count:
+            raise IndexError("Índice de variável fora do arquivo.")
+        start = _OFFSET.unpack_from(self._index, _INDEX_HEADER.size + i * _OFFSET.size)[0]
+        end = self._data.find(b'\n', start)
+        line = self._data[start:end if end >= 0 else len(self._data)]
+        try:
+            value = json.loads(line)
+        except ValueError:
+            raise ValueError(f"Linha inválida em {self.path} (variável {i + 1}): {line[:60]!r}") from None
+        if not isinstance(value, str):
+            raise ValueError(f"As variáveis devem ser strings: {self.path} (variável {i + 1})")
+        return value
+
+    def close(self):
+        for m in (self._data, self._index):
+            if m is not None:
+                m.close()
+
+
+def open_variables(path):
+    """Variáveis de `path` como sequência (lista ou NdjsonVariables), conforme a extensão."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Arquivo de variáveis não encontrado: {path}")
+    if is_ndjson(path):
+        variables = NdjsonVariables(path)
+        if len(variables):
+            variables[0]  # valida o formato antes de abrir a janela
+        return variables
+    return load_variables(path)
+
+
+class SavedPosition:
+    """Índice da próxima variável, guardado em `<variáveis>.pos`.
+
+    A posição só vale para a versão do arquivo de variáveis em que foi salva
+    (mesmo tamanho e mtime); um arquivo alterado recomeça do início.
+    """
+
+    def __init__(self, variables_path):
+        self.variables_path = variables_path
+        self.path = variables_path + POSITION_SUFFIX
+
+    def _stamp(self):
+        stat = os.stat(self.variables_path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                saved = json.load(f)
+            if saved.get('file') == self._stamp() and isinstance(saved.get('index'), int):
+                return max(0, saved['index'])
+        except (OSError, ValueError, AttributeError):
+            pass  # sem posição salva (ou ilegível): começa do início
+        return 0
+
+    def save(self, index):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({'index': index, 'file': self._stamp()}, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass  # pasta sem permissão de escrita: a posição só não é lembrada
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
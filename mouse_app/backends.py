@@ -0,0 +1,219 @@
+"""Output backends used by MouseExecutor to inject events.
+
+A backend resolves button names (as recorded, e.g. 'Button.left') to its own
+handles once per recording and then receives plain move/press/release/scroll
+calls from the playback loop. `PynputBackend` is the default; `XTestBackend`
+talks to the X server's XTEST extension directly and sends events in batches;
+`FakeBackend` keeps everything in-process so playback can run and be measured
+without a display.
+
+A backend with `batched = True` may hold events until flush(). The player
+waits only for the first event of each `tick` (the rest of the tick is
+dispatched right after it, up to `tick` seconds early), and flushes when the
+scheduler is about to wait again and at the end of every batch it plays.
+"""
+import os
+import time
+from array import array
+
+OP_MOVE, OP_PRESS, OP_RELEASE, OP_SCROLL = range(4)
+OP_POSITION = 0x80  # flag on a press/release/scroll opcode: move the pointer there first
+
+
+class OutputBackend:
+    name = None
+    batched = False
+    tick = 0.0   # batched backends: events due within this many seconds go out together
+
+    def resolve_button(self, name):
+        """Backend handle for a recorded button name, or None if unsupported."""
+        raise NotImplementedError
+
+    def move(self, x, y):
+        raise NotImplementedError
+
+    def press(self, button):
+        raise NotImplementedError
+
+    def release(self, button):
+        raise NotImplementedError
+
+    def scroll(self, dx, dy):
+        raise NotImplementedError
+
+    def flush(self):
+        """Send the events held so far (batched backends only)."""
+
+    def close(self):
+        pass
+
+
+class PynputBackend(OutputBackend):
+    name = 'pynput'
+
+    def __init__(self):
+        from pynput.mouse import Button, Controller
+        self._button_type = Button
+        self.controller = Controller()
+
+    def resolve_button(self, name):
+        return getattr(self._button_type, name.split('.', 1)[-1], None)
+
+    def move(self, x, y):
+        self.controller.position = (x, y)
+
+    def press(self, button):
+        self.controller.press(button)
+
+    def release(self, button):
+        self.controller.release(button)
+
+    def scroll(self, dx, dy):
+        self.controller.scroll(dx, dy)
+
+
+class XTestBackend(OutputBackend):
+    """Injects through XTEST with ctypes (libX11 + libXtst), X11 only.
+
+    pynput waits for the X server to answer after every call; here the fake
+    input requests only go into Xlib's output buffer, and flush() sends the
+    buffer in one write without waiting for a reply. Xlib also sends the
+    buffer by itself when it fills up (a few hundred events). With a
+    PlaybackTrace, an event's return time is when it was queued.
+    """
+    name = 'xtest'
+    batched = True
+    tick = 0.001
+
+    BUTTONS = {'left': 1, 'middle': 2, 'right': 3, 'x1': 8, 'x2': 9}
+    SCROLL_UP, SCROLL_DOWN, SCROLL_LEFT, SCROLL_RIGHT = 4, 5, 6, 7
+
+    def __init__(self, display_name=None):
+        import ctypes
+        import ctypes.util
+        libraries = []
+        for library in ('X11', 'Xtst'):
+            path = ctypes.util.find_library(library)
+            if path is None:
+                raise OSError(f"The xtest backend needs lib{library} (libx11-6 and libxtst6 on Debian/Ubuntu).")
+            libraries.append(ctypes.CDLL(path))
+        x11, xtst = libraries
+        display_p, c_int = ctypes.c_void_p, ctypes.c_int
+        x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        x11.XOpenDisplay.restype = display_p
+        x11.XFlush.argtypes = x11.XCloseDisplay.argtypes = [display_p]
+        x11.XSync.argtypes = [display_p, c_int]
+        xtst.XTestQueryExtension.argtypes = [display_p] + [ctypes.POINTER(c_int)] * 4
+        xtst.XTestFakeMotionEvent.argtypes = [display_p, c_int, c_int, c_int, ctypes.c_ulong]
+        xtst.XTestFakeButtonEvent.argtypes = [display_p, ctypes.c_uint, c_int, ctypes.c_ulong]
+
+        display_name = display_name or os.environ.get('DISPLAY')
+        display = x11.XOpenDisplay(display_name.encode() if display_name else None)
+        if not display:
+            raise OSError(f"Could not open X display {display_name!r}.")
+        unused = c_int()
+        if not xtst.XTestQueryExtension(display, *([ctypes.byref(unused)] * 4)):
+            x11.XCloseDisplay(display)
+            raise OSError(f"X display {display_name!r} does not support the XTEST extension.")
+        self.display = display
+        self._x11 = x11
+        self._motion = xtst.XTestFakeMotionEvent
+        self._button = xtst.XTestFakeButtonEvent
+
+    def resolve_button(self, name):
+        name = name.split('.', 1)[-1]
+        if name.startswith('button') and name[6:].isdigit():
+            return int(name[6:])  # pynput on X: Button.button8 ... Button.button30
+        return self.BUTTONS.get(name)
+
+    def move(self, x, y):
+        self._motion(self.display, -1, x, y, 0)  # -1: the screen the pointer is on
+
+    def press(self, button):
+        self._button(self.display, button, 1, 0)
+
+    def release(self, button):
+        self._button(self.display, button, 0, 0)
+
+    def scroll(self, dx, dy):
+        # One click of the wheel buttons per unit, as pynput does on X
+        for count, positive, negative in ((dy, self.SCROLL_UP, self.SCROLL_DOWN),
+                                          (dx, self.SCROLL_RIGHT, self.SCROLL_LEFT)):
+            button = positive if count > 0 else negative
+            for _ in range(abs(count)):
+                self._button(self.display, button, 1, 0)
+                self._button(self.display, button, 0, 0)
+
+    def flush(self):
+        self._x11.XFlush(self.display)
+
+    def sync(self):
+        """Flush and wait until the server has processed everything sent."""
+        self._x11.XSync(self.display, 0)
+
+    def close(self):
+        if self.display:
+            self._x11.XSync(self.display, 0)
+            self._x11.XCloseDisplay(self.display)
+            self.display = None
+
+
+class FakeBackend(OutputBackend):
+    """Records every call in typed arrays instead of touching the real pointer.
+
+    With record=False only the call count is kept, for very long runs.
+    """
+    name = 'fake'
+
+    def __init__(self, record=True):
+        self.record = record
+        self.calls = 0
+        self.times = array('q')   # perf_counter_ns() of each call
+        self.ops = array('B')
+        self.args = array('i')    # two ints per call: x/y, button code/0 or dx/dy
+        self.position = (0, 0)
+        self._now_ns = time.perf_counter_ns
+
+    def resolve_button(self, name):
+        return name.split('.', 1)[-1]
+
+    def _log(self, op, a, b):
+        self.calls += 1
+        if self.record:
+            self.times.append(self._now_ns())
+            self.ops.append(op)
+            self.args.append(a)
+            self.args.append(b)
+
+    def move(self, x, y):
+        self.position = (x, y)
+        self._log(OP_MOVE, x, y)
+
+    def press(self, button):
+        self._log(OP_PRESS, hash(button) & 0x7fffffff, 0)
+
+    def release(self, button):
+        self._log(OP_RELEASE, hash(button) & 0x7fffffff, 0)
+
+    def scroll(self, dx, dy):
+        self._log(OP_SCROLL, dx, dy)
+
+    def move_times(self):
+        """Dispatch times of the move calls (one per played event)."""
+        return array('q', (t for t, op in zip(self.times, self.ops) if op == OP_MOVE))
+
+
+BACKENDS = {
+    'pynput': PynputBackend,
+    'xtest': XTestBackend,
+    'fake': FakeBackend,
+}
+DEFAULT_BACKEND = 'pynput'
+
+
+def create_backend(name=DEFAULT_BACKEND):
+    try:
+        backend_class = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown output backend '{name}' (expected one of: {', '.join(BACKENDS)}).") from None
+    return backend_class()
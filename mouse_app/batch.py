@@ -0,0 +1,233 @@
+"""Bulk operations over many recordings, spread over a process pool.
+
+    validate  parse every file; flag unreadable, empty and unbalanced ones
+    migrate   rewrite JSON recordings in an older schema (no "version" field
+              or the old executor layout) as current version-2 JSON
+    convert   write every recording as .mrec, as a .mref manifest (store.py)
+              or as JSON
+    stats     per-file metadata (catalog.describe), merged into totals
+
+Files go to the workers in chunks of `chunk_size` paths, so the pool pays one
+round-trip per chunk instead of one per file. Workers return a small dict per
+file and the parent merges them as chunks complete, so throughput grows with
+the number of workers until the disk is the limit.
+"""
+import os
+import struct
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import catalog
+import loader
+import mrec
+import store
+
+OPERATIONS = ('validate', 'migrate', 'convert', 'stats')
+DEFAULT_CHUNK_SIZE = 16
+COUNT_FIELDS = ('events', 'moves', 'presses', 'releases', 'scrolls')
+EXTENSIONS = {'mrec': mrec.EXTENSION, 'mref': store.EXTENSION, 'json': '.json'}
+
+
+def find_recordings(paths):
+    """Recording files among `paths`; folders are searched recursively."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for folder, _, names in os.walk(path):
+                found.extend(os.path.join(folder, name) for name in names if catalog.is_recording(name))
+        else:
+            found.append(path)
+    return sorted(set(os.path.abspath(path) for path in found))
+
+
+def destination(path, operation, out_dir=None, to=None):
+    """Output file of `migrate` or `convert` for `path` (None for the others)."""
+    if operation not in ('migrate', 'convert'):
+        return None
+    name = os.path.basename(path)
+    if operation == 'convert':
+        name = os.path.splitext(name)[0] + EXTENSIONS[to]
+    return os.path.join(out_dir or os.path.dirname(path), name)
+
+
+def _write_atomic(path, write, binary):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb' if binary else 'w') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+# --- Operations (run in the workers) ---
+def _describe(path, dest, options):
+    row = catalog.describe(path)
+    if row['error']:
+        return {'status': 'error', 'message': row['error']}
+    result = {name: row[name] for name in COUNT_FIELDS + ('total_duration', 'min_x', 'min_y', 'max_x', 'max_y')}
+    problems = []
+    if not row['events']:
+        problems.append("no events")
+    if row['presses'] != row['releases']:
+        problems.append(f"{row['presses']} presses but {row['releases']} releases")
+    result['status'] = 'warning' if problems else 'ok'
+    if problems:
+        result['message'] = '; '.join(problems)
+    return result
+
+
+def _migrate(path, dest, options):
+    fmt = loader.recording_format(path)
+    if fmt != 'json':
+        return {'status': 'skipped', 'message': f"binary .{fmt}"}
+    stream = loader.RecordingStream(path)
+    events = list(stream)
+    if stream.header.get('version') == mrec.SCHEMA_VERSION and dest == path:
+        return {'status': 'skipped', 'message': "already version %d" % mrec.SCHEMA_VERSION}
+    last_offset = max((event['time_offset'] for event in events), default=0.0)
+    total_duration = stream.header.get('total_duration', last_offset)
+    _write_atomic(dest, lambda f: mrec.dump_json_stream(f, total_duration, events), binary=False)
+    return {'status': 'changed', 'output': dest, 'events': len(events)}
+
+
+def _convert(path, dest, options):
+    to = options['to']
+    if dest == path and loader.recording_format(path) == to:
+        return {'status': 'skipped', 'message': "already in the target format"}
+    track, total_duration = loader.load_track(path)
+    if to == 'mrec':
+        _write_atomic(dest, lambda f: f.write(mrec.encode_track(track, total_duration)), binary=True)
+    elif to == 'mref':
+        os.makedirs(os.path.dirname(dest) or '.', exist_ok=True)
+        store.save_track(dest, track, total_duration)  # chunks to the store, manifest written atomically
+    else:
+        _write_atomic(dest, lambda f: mrec.dump_json_stream(f, total_duration, track.to_events()), binary=False)
+    return {'status': 'changed', 'output': dest, 'events': len(track)}
+
+
+HANDLERS = {'validate': _describe, 'migrate': _migrate, 'convert': _convert, 'stats': _describe}
+
+
+def run_chunk(operation, items, options):
+    """Run `operation` on [(path, destination)]; one result dict per file."""
+    handler = HANDLERS[operation]
+    results = []
+    for path, dest in items:
+        try:
+            result = handler(path, dest, options)
+        except (OSError, ValueError, struct.error) as e:
+            result = {'status': 'error', 'message': str(e)}
+        result['path'] = path
+        results.append(result)
+    return results
+
+
+# --- Parent side ---
+class ProgressBar:
+    """One-line progress bar on a terminal; silent when `stream` is not a tty."""
+
+    def __init__(self, total, stream=sys.stderr, width=30):
+        self.total = total
+        self.done = 0
+        self.problems = 0
+        self.stream = stream
+        self.width = width
+        self.enabled = stream.isatty() and total > 0
+        self._drawn = -1
+
+    def update(self, results):
+        self.done += len(results)
+        self.problems += sum(result['status'] in ('warning', 'error') for result in results)
+        filled = self.width * self.done // self.total if self.total else self.width
+        if self.enabled and (filled != self._drawn or self.done == self.total):
+            self._drawn = filled
+            bar = '#' * filled + '.' * (self.width - filled)
+            self.stream.write(f"\r[{bar}] {self.done}/{self.total} files, {self.problems} problem(s)")
+            self.stream.flush()
+
+    def close(self):
+        if self.enabled:
+            self.stream.write('\n')
+            self.stream.flush()
+
+
+def run_batch(operation, paths, jobs=None, chunk_size=DEFAULT_CHUNK_SIZE, options=None, progress=None):
+    """Run `operation` on every file in `paths` (already expanded).
+
+    jobs=1 runs in this process; otherwise a pool of `jobs` workers (default:
+    one per CPU). Returns the per-file results in the order of `paths`.
+    Raises ValueError if two inputs would be written to the same output.
+    """
+    options = options or {}
+    items = [(path, destination(path, operation, options.get('out_dir'), options.get('to'))) for path in paths]
+    # A file that is its own destination (e.g. the x.mrec an earlier convert
+    # wrote from x.json) is skipped or rewritten in place, not a clash
+    outputs = Counter(dest for path, dest in items if dest is not None and dest != path)
+    clashes = sorted(dest for dest, count in outputs.items() if count > 1)
+    if clashes:
+        raise ValueError(f"Several inputs would be written to {clashes[0]}.")
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    results = []
+    if jobs == 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            done = run_chunk(operation, chunk, options)
+            results.extend(done)
+            if progress:
+                progress.update(done)
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(run_chunk, operation, chunk, options) for chunk in chunks]
+            for future in as_completed(futures):
+                done = future.result()
+                results.extend(done)
+                if progress:
+                    progress.update(done)
+    order = {path: i for i, path in enumerate(paths)}
+    results.sort(key=lambda result: order[result['path']])
+    return results
+
+
+def summarize(operation, results, elapsed=None):
+    """Merged report: counts per status, totals of the readable files and the problem files."""
+    summary = {
+        'operation': operation,
+        'files': len(results),
+        'status': dict(Counter(result['status'] for result in results)),
+        'problems': [{'path': r['path'], 'status': r['status'], 'message': r.get('message', '')}
+                     for r in results if r['status'] in ('warning', 'error')],
+    }
+    if elapsed is not None:
+        summary['seconds'] = elapsed
+    if operation in ('validate', 'stats'):
+        readable = [r for r in results if r['status'] != 'error']
+        totals = {name: sum(r[name] for r in readable) for name in COUNT_FIELDS}
+        durations = [r['total_duration'] for r in readable]
+        totals['total_duration'] = sum(durations)
+        totals['longest'] = max(durations, default=0.0)
+        totals['shortest'] = min(durations, default=0.0)
+        boxes = [r for r in readable if r['events']]
+        if boxes:
+            totals['bounds'] = [min(r['min_x'] for r in boxes), min(r['min_y'] for r in boxes),
+                                max(r['max_x'] for r in boxes), max(r['max_y'] for r in boxes)]
+        summary['totals'] = totals
+    elif operation in ('migrate', 'convert'):
+        summary['written'] = sum(r['status'] == 'changed' for r in results)
+    return summary
+
+
+def timed_batch(operation, paths, jobs=None, chunk_size=DEFAULT_CHUNK_SIZE, options=None, show_progress=True):
+    """run_batch with a progress bar; returns (results, summary)."""
+    progress = ProgressBar(len(paths)) if show_progress else None
+    started = time.perf_counter()
+    try:
+        results = run_batch(operation, paths, jobs, chunk_size, options, progress)
+    finally:
+        if progress:
+            progress.close()
+    return results, summarize(operation, results, time.perf_counter() - started)
@@ -0,0 +1,214 @@
+"""SQLite catalog of recording metadata.
+
+`mouse_executor.py list` and `info` answer from here instead of parsing the
+recordings. Each row holds a recording's duration, event counts per action,
+screen bounding box and buttons, plus the mtime and size they were computed
+from. refresh() walks the recording folders and re-reads only files whose
+mtime or size changed, so listing a folder that did not change costs one
+stat per file. The recorder also indexes every recording it saves.
+
+A file that cannot be parsed gets a row with `error` set, so it is not
+parsed again until it changes.
+"""
+import os
+import sqlite3
+import struct
+import time
+
+import loader
+import mrec
+import store
+
+CATALOG_PATH = os.environ.get('MOUSE_CATALOG') or os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'mouse_app', 'catalog.sqlite3')
+CATALOG_VERSION = 1
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# Where the tools read and write recordings: the recorder saves to mouse_files.
+DEFAULT_ROOTS = (
+    os.path.join(os.path.dirname(_APP_DIR), 'eventos.json'),
+    os.path.join(os.path.dirname(_APP_DIR), 'json_files'),
+    os.path.join(_APP_DIR, 'mouse_files'),
+)
+RECORDING_EXTENSIONS = ('.json', mrec.EXTENSION, store.EXTENSION)
+# JSON files written next to recordings that are not recordings themselves:
+# markers (segment.py) and playback traces (playback_trace.py)
+SIDECAR_SUFFIXES = ('.markers.json', '.metrics.json', '.trace.json')
+
+FIELDS = ('path', 'name', 'mtime_ns', 'size', 'format', 'events', 'moves', 'presses', 'releases', 'scrolls',
+          'total_duration', 'first_offset', 'last_offset', 'min_x', 'min_y', 'max_x', 'max_y', 'buttons',
+          'error', 'indexed_at')
+SORT_KEYS = {'name': 'name, path', 'duration': 'total_duration DESC', 'events': 'events DESC', 'mtime': 'mtime_ns DESC'}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    path TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    format TEXT NOT NULL,
+    events INTEGER,
+    moves INTEGER,
+    presses INTEGER,
+    releases INTEGER,
+    scrolls INTEGER,
+    total_duration REAL,
+    first_offset REAL,
+    last_offset REAL,
+    min_x INTEGER,
+    min_y INTEGER,
+    max_x INTEGER,
+    max_y INTEGER,
+    buttons TEXT,
+    error TEXT,
+    indexed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS recordings_name ON recordings (name);
+CREATE INDEX IF NOT EXISTS recordings_duration ON recordings (total_duration);
+"""
+
+
+def is_recording(path):
+    path = path.lower()
+    return path.endswith(RECORDING_EXTENSIONS) and not path.endswith(SIDECAR_SUFFIXES)
+
+
+def describe(path, stat=None):
+    """Catalog row (a dict with FIELDS) for the recording at `path`."""
+    path = os.path.abspath(path)
+    stat = stat or os.stat(path)
+    row = dict.fromkeys(FIELDS)
+    row.update(path=path, name=os.path.basename(path), mtime_ns=stat.st_mtime_ns, size=stat.st_size,
+               format=loader.recording_format(path), indexed_at=time.time())
+    try:
+        track, total_duration = loader.load_track(path)
+    except (OSError, ValueError, struct.error) as e:
+        row['error'] = str(e)
+        return row
+    actions, xs, ys, times = track.actions, track.xs, track.ys, track.times
+    row.update(
+        events=len(track),
+        moves=actions.count(mrec.ACTION_MOVE),
+        presses=actions.count(mrec.ACTION_PRESS),
+        releases=actions.count(mrec.ACTION_RELEASE),
+        scrolls=actions.count(mrec.ACTION_SCROLL),
+        total_duration=max(total_duration, times[-1] if times else 0.0),
+        buttons=','.join(track.button_names[1:]),
+    )
+    if times:
+        row.update(first_offset=times[0], last_offset=times[-1],
+                   min_x=min(xs), min_y=min(ys), max_x=max(xs), max_y=max(ys))
+    return row
+
+
+class Catalog:
+    """Connection to the catalog database (created on first use)."""
+
+    def __init__(self, path=None):
+        self.path = path or CATALOG_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.row_factory = sqlite3.Row
+        if self.db.execute('PRAGMA user_version').fetchone()[0] != CATALOG_VERSION:
+            # Only derived data is stored, so an old layout is simply rebuilt.
+            with self.db:
+                self.db.execute('DROP TABLE IF EXISTS recordings')
+                self.db.executescript(_SCHEMA)
+                self.db.execute(f'PRAGMA user_version = {CATALOG_VERSION}')
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _store(self, row):
+        self.db.execute(f"INSERT OR REPLACE INTO recordings ({', '.join(FIELDS)}) "
+                        f"VALUES ({', '.join('?' * len(FIELDS))})", [row[name] for name in FIELDS])
+
+    def _stamps(self):
+        return {path: (mtime_ns, size) for path, mtime_ns, size in
+                self.db.execute('SELECT path, mtime_ns, size FROM recordings')}
+
+    def update(self, path):
+        """Index one recording (again, if it changed); returns its row."""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        row = self.get(path)
+        if row is None or (row['mtime_ns'], row['size']) != (stat.st_mtime_ns, stat.st_size):
+            row = describe(path, stat)
+            with self.db:
+                self._store(row)
+        return row
+
+    def refresh(self, roots=DEFAULT_ROOTS):
+        """Bring the rows of the recordings under `roots` (files or folders) up
+        to date. Returns (rows indexed again, rows removed)."""
+        stamps = self._stamps()
+        seen = set()
+        changed = []
+        for root in roots:
+            root = os.path.abspath(root)
+            if os.path.isdir(root):
+                candidates = (os.path.join(folder, name) for folder, _, names in os.walk(root)
+                              for name in names if is_recording(name))
+            else:
+                candidates = (root,)
+            for path in candidates:
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                seen.add(path)
+                if stamps.get(path) != (stat.st_mtime_ns, stat.st_size):
+                    changed.append(describe(path, stat))
+        prefixes = tuple(os.path.join(os.path.abspath(root), '') for root in roots)
+        exact = {os.path.abspath(root) for root in roots}
+        gone = [path for path in stamps
+                if path not in seen and (path in exact or path.startswith(prefixes))]
+        with self.db:
+            for row in changed:
+                self._store(row)
+            self.db.executemany('DELETE FROM recordings WHERE path = ?', [(path,) for path in gone])
+        return len(changed), len(gone)
+
+    def get(self, path):
+        cursor = self.db.execute('SELECT * FROM recordings WHERE path = ?', (os.path.abspath(path),))
+        row = cursor.fetchone()
+        return dict(row) if row is not None else None
+
+    def query(self, roots=None, match=None, min_duration=None, max_duration=None, min_events=None, sort='name'):
+        """Rows (dicts) filtered in SQL; `match` is a glob on the file name."""
+        clauses, params = [], []
+        if roots:
+            alternatives = []
+            for root in roots:
+                root = os.path.abspath(root)
+                alternatives.append('path = ? OR substr(path, 1, ?) = ?')
+                prefix = os.path.join(root, '')
+                params += [root, len(prefix), prefix]
+            clauses.append('(' + ' OR '.join(alternatives) + ')')
+        if match:
+            clauses.append('name GLOB ?')
+            params.append(match)
+        if min_duration is not None:
+            clauses.append('total_duration >= ?')
+            params.append(min_duration)
+        if max_duration is not None:
+            clauses.append('total_duration <= ?')
+            params.append(max_duration)
+        if min_events is not None:
+            clauses.append('events >= ?')
+            params.append(min_events)
+        where = ' WHERE ' + ' AND '.join(clauses) if clauses else ''
+        cursor = self.db.execute(f'SELECT * FROM recordings{where} ORDER BY {SORT_KEYS[sort]}', params)
+        return [dict(row) for row in cursor]
+
+
+def index_recording(path, catalog_path=None):
+    """Index a recording that was just saved."""
+    with Catalog(catalog_path) as catalog:
+        return catalog.update(path)
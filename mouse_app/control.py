@@ -0,0 +1,125 @@
+"""Run state and the Unix-socket control channel of the playback daemon.
+
+The daemon (mouse_executor.py serve) keeps one process alive with the output
+backend already created and recordings already decoded. Clients talk to it
+over a local Unix socket, one JSON object per line in each direction:
+
+    -> {"cmd": "play", "file": "recording.mrec", "speed": 2}
+    <- {"ok": true, "state": "playing", ...}
+    <- {"ok": false, "error": "..."}
+
+A connection may carry any number of requests, so a client that keeps it
+open pays only the round-trip per command. The server side lives in
+control_server.py, so clients do not import socketserver.
+"""
+import json
+import socket
+import threading
+import time
+
+PLAYING, PAUSED, STOPPED = 'playing', 'paused', 'stopped'
+
+
+class PlaybackControl:
+    """Run state shared by a player thread and the thread that controls it.
+
+    `wakeup`, which the player's scheduler sleeps on, is set exactly while the
+    state is not PLAYING, so a stop or pause takes effect immediately instead
+    of at the next poll, and a resume clears it even if the player never saw
+    the pause.
+    """
+
+    def __init__(self):
+        self.state = PLAYING
+        self.paused_at = None   # perf_counter() when the current pause began
+        self.paused_total = 0.0  # seconds spent in earlier pauses
+        self.wakeup = threading.Event()
+        self._cond = threading.Condition()
+
+    def _change(self, expected, state):
+        with self._cond:
+            if self.state not in expected:
+                return False
+            now = time.perf_counter()
+            if self.paused_at is not None:
+                self.paused_total += now - self.paused_at
+            self.state = state
+            self.paused_at = now if state == PAUSED else None
+            # Under the lock, so the event always matches the state
+            if state == PLAYING:
+                self.wakeup.clear()
+            else:
+                self.wakeup.set()
+            self._cond.notify_all()
+        return True
+
+    def stop(self):
+        return self._change((PLAYING, PAUSED), STOPPED)
+
+    def pause(self):
+        return self._change((PLAYING,), PAUSED)
+
+    def resume(self):
+        return self._change((PAUSED,), PLAYING)
+
+    def paused_time(self):
+        """Total seconds spent paused, including the current pause."""
+        paused_at = self.paused_at
+        current = time.perf_counter() - paused_at if paused_at is not None else 0.0
+        return self.paused_total + current
+
+    def interrupted(self):
+        return self.state != PLAYING
+
+    def wait_while_paused(self):
+        """Block the player while paused; returns the seconds spent waiting."""
+        started = time.perf_counter()
+        with self._cond:
+            while self.state == PAUSED:
+                self._cond.wait()
+        return time.perf_counter() - started
+
+
+class ControlClient:
+    """Persistent connection to the daemon. Raises OSError if none is listening."""
+
+    def __init__(self, path, timeout=None):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        try:
+            self.sock.connect(path)
+        except OSError:
+            self.sock.close()
+            raise
+        self.rfile = self.sock.makefile('rb')
+
+    def request(self, cmd, **args):
+        args['cmd'] = cmd
+        self.sock.sendall(json.dumps(args).encode('utf-8') + b'\n')
+        line = self.rfile.readline()
+        if not line:
+            raise ConnectionError("The playback daemon closed the connection.")
+        return json.loads(line)
+
+    def close(self):
+        self.rfile.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def send_command(path, cmd, **args):
+    with ControlClient(path) as client:
+        return client.request(cmd, **args)
+
+
+def is_alive(path):
+    try:
+        ControlClient(path, timeout=1.0).close()
+        return True
+    except OSError:
+        return False
@@ -0,0 +1,42 @@
+"""Server side of the playback daemon's control channel (protocol: see control.py)."""
+import json
+import os
+import socketserver
+
+from control import is_alive
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("request must be a JSON object")
+                reply = self.server.dispatch(request)
+            except Exception as e:  # reported to the client, the daemon keeps serving
+                reply = {'ok': False, 'error': str(e)}
+            self.wfile.write(json.dumps(reply).encode('utf-8') + b'\n')
+            self.wfile.flush()
+            if reply.get('shutdown'):
+                self.server.shutdown()
+                return
+
+
+class ControlServer(socketserver.ThreadingUnixStreamServer):
+    """Serves requests on a Unix socket; `dispatch(request)` returns the reply dict."""
+    daemon_threads = True
+
+    def __init__(self, path, dispatch):
+        if os.path.exists(path):
+            if is_alive(path):
+                raise OSError(f"A playback daemon is already listening on {path}.")
+            os.remove(path)  # left behind by a daemon that did not exit cleanly
+        self.path = path
+        self.dispatch = dispatch
+        super().__init__(path, _Handler)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,204 @@
+"""EventTrack: sequência de eventos do mouse em colunas de arrays tipados.
+
+Substitui a lista de dicionários usada pelo gravador e pelo executor. Cada
+evento ocupa 26 bytes (time_offset f64, x/y/dx/dy i32, ação e botão u8), a
+anexação é O(1) amortizado e fatias compartilham as colunas sem copiar.
+
+Ações usam os códigos de mrec (ACTION_MOVE, ...). Botões são códigos u8 que
+indexam `button_names`; o código 0 significa "sem botão".
+"""
+from array import array
+from itertools import islice
+
+import mrec
+
+BUTTON_NONE = 0
+
+COLUMNS = ('times', 'xs', 'ys', 'actions', 'buttons', 'dxs', 'dys')
+COLUMN_TYPES = ('d', 'i', 'i', 'B', 'B', 'i', 'i')
+
+
+class EventView:
+    """Visão de um evento da trilha (não copia os dados)."""
+    __slots__ = ('track', 'index')
+
+    def __init__(self, track, index):
+        self.track = track
+        self.index = index
+
+    @property
+    def time_offset(self):
+        return self.track.times[self.index]
+
+    @property
+    def action(self):
+        return self.track.actions[self.index]
+
+    @property
+    def button(self):
+        return self.track.buttons[self.index]
+
+    @property
+    def x(self):
+        return self.track.xs[self.index]
+
+    @property
+    def y(self):
+        return self.track.ys[self.index]
+
+    @property
+    def dx(self):
+        return self.track.dxs[self.index]
+
+    @property
+    def dy(self):
+        return self.track.dys[self.index]
+
+    def to_dict(self):
+        """Evento no layout de dicionário gravado por mouse_rec.py."""
+        return self.track.event_dict(self.index)
+
+    def __repr__(self):
+        return f"EventView({self.to_dict()!r})"
+
+
+class EventTrack:
+    __slots__ = COLUMNS + ('button_names', '_button_codes', 'start', 'stop')
+
+    def __init__(self, button_names=None):
+        for name, typecode in zip(COLUMNS, COLUMN_TYPES):
+            setattr(self, name, array(typecode))
+        self.button_names = [None] if button_names is None else list(button_names)
+        self._button_codes = {name: code for code, name in enumerate(self.button_names)}
+        self.start = 0
+        self.stop = None   # None: a trilha é dona das colunas e vai até o fim
+
+    # --- Construção ---
+    @classmethod
+    def from_columns(cls, times, xs, ys, actions, buttons, dxs, dys, button_names):
+        track = cls.__new__(cls)
+        track.times, track.xs, track.ys = times, xs, ys
+        track.actions, track.buttons, track.dxs, track.dys = actions, buttons, dxs, dys
+        track.button_names = list(button_names)
+        track._button_codes = {name: code for code, name in enumerate(track.button_names)}
+        track.start = 0
+        track.stop = None
+        return track
+
+    @classmethod
+    def from_events(cls, events):
+        track = cls()
+        for event in events:
+            track.append_event(event)
+        return track
+
+    def empty_like(self):
+        """Trilha vazia que compartilha a tabela de botões (os códigos continuam válidos)."""
+        track = EventTrack()
+        track.button_names = self.button_names
+        track._button_codes = self._button_codes
+        return track
+
+    def button_code(self, name):
+        """Código do botão `name`, registrando-o se ainda não existir."""
+        if name is None:
+            return BUTTON_NONE
+        code = self._button_codes.get(name)
+        if code is None:
+            if len(self.button_names) >= 256:
+                raise ValueError("Mais de 255 botões distintos na gravação.")
+            code = len(self.button_names)
+            self.button_names.append(name)
+            self._button_codes[name] = code
+        return code
+
+    def append(self, time_offset, action, button, x, y, dx=0, dy=0):
+        """Anexa um evento já codificado (`button` é um código)."""
+        if self.stop is not None:
+            raise ValueError("Não é possível anexar a uma fatia de EventTrack.")
+        self.times.append(time_offset)
+        self.xs.append(x)
+        self.ys.append(y)
+        self.actions.append(action)
+        self.buttons.append(button)
+        self.dxs.append(dx)
+        self.dys.append(dy)
+
+    def append_event(self, event):
+        """Anexa um evento no layout de dicionário do gravador."""
+        action = mrec.ACTION_CODES.get(event.get('action'))
+        if action is None:
+            raise ValueError(f"Ação desconhecida no evento: {event!r}")
+        try:
+            self.append(event['time_offset'], action, self.button_code(event.get('button')),
+                        event['x'], event['y'], event.get('dx', 0), event.get('dy', 0))
+        except KeyError as e:
+            raise ValueError(f"Evento sem o campo {e}: {event!r}") from None
+        except (TypeError, OverflowError):
+            raise ValueError(f"Valores não inteiros ou fora do intervalo no evento: {event!r}") from None
+
+    # --- Acesso ---
+    def __len__(self):
+        stop = len(self.times) if self.stop is None else self.stop
+        return stop - self.start
+
+    def bounds(self):
+        """Intervalo (início, fim) desta trilha nas colunas compartilhadas."""
+        return self.start, len(self.times) if self.stop is None else self.stop
+
+    def __getitem__(self, key):
+        start, stop = self.bounds()
+        if isinstance(key, slice):
+            first, last, step = key.indices(stop - start)
+            if step != 1:
+                raise ValueError("EventTrack só aceita fatias contíguas.")
+            view = self.empty_like()
+            for name in COLUMNS:
+                setattr(view, name, getattr(self, name))
+            view.start = start + first
+            view.stop = start + max(first, last)
+            return view
+        if key < 0:
+            key += stop - start
+        if not 0 <= key < stop - start:
+            raise IndexError("Índice de evento fora da trilha.")
+        return EventView(self, start + key)
+
+    def __iter__(self):
+        start, stop = self.bounds()
+        for i in range(start, stop):
+            yield EventView(self, i)
+
+    def column(self, name):
+        """Iterador sobre uma coluna, restrito aos limites da trilha."""
+        start, stop = self.bounds()
+        return islice(getattr(self, name), start, stop)
+
+    def event_dict(self, i):
+        """Evento na posição absoluta `i` no layout de dicionário do gravador."""
+        return mrec.event_dict(self.actions[i], self.button_names[self.buttons[i]], self.xs[i], self.ys[i],
+                               self.dxs[i], self.dys[i], self.times[i])
+
+    def to_events(self):
+        event_dict, names = mrec.event_dict, self.button_names
+        rows = zip(*(self.column(name) for name in COLUMNS))
+        return [event_dict(action, names[button], x, y, dx, dy, t) for t, x, y, action, button, dx, dy in rows]
+
+    def is_sorted(self):
+        start, stop = self.bounds()
+        times = self.times
+        return all(times[i] <= times[i + 1] for i in range(start, stop - 1))
+
+    def sorted(self):
+        """Cópia ordenada por time_offset (ordenação estável)."""
+        start, stop = self.bounds()
+        times = self.times
+        order = sorted(range(start, stop), key=times.__getitem__)
+        track = EventTrack(self.button_names)
+        for name in COLUMNS:
+            src = getattr(self, name)
+            getattr(track, name).extend(src[i] for i in order)
+        return track
+
+    def nbytes(self):
+        return sum(col.itemsize for col in (getattr(self, name) for name in COLUMNS)) * len(self)
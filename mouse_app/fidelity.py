@@ -0,0 +1,343 @@
+"""Replay fidelity: compare a recording with a capture of its playback (requires NumPy).
+
+The capture is what mouse_rec.py recorded while mouse_executor.py played the
+original. Its clock starts at some moment before playback, and the replay may
+drift or stall, so the two are aligned in three vectorized steps:
+
+    1. offset  both pointer paths are resampled on a `resolution` grid; the
+               lag that maximizes the cross-correlation of their velocities
+               (computed with an FFT) is where playback starts in the capture
+    2. warp    a banded DTW between the two resampled paths gives the timing
+               skew at every grid step: first at COARSE_RESOLUTION within
+               COARSE_BAND seconds of that offset, then at `resolution`
+               within `band` seconds of the coarse path, so the band follows
+               drift and stalls. Rows are computed one at a time; the
+               horizontal steps within a row reduce to a cumulative minimum,
+               so each row is a handful of array operations
+    3. match   every original event is mapped into the capture through the
+               warp and matched to the closest captured position among its
+               neighbours (spatial error, per-event skew); presses and
+               releases are matched one to one per button within
+               `click_tolerance` (missing and extra clicks)
+
+analyze() returns the report as a dict; failures() checks it against
+regression thresholds.
+"""
+import time
+
+import numpy as np
+
+import loader
+import mrec
+
+DEFAULT_RESOLUTION = 0.01       # seconds per step of the resampled paths
+DEFAULT_BAND = 0.5              # skew (seconds) the fine warp may add to the coarse one
+COARSE_RESOLUTION = 0.1         # seconds per step of the first, coarse warp
+COARSE_BAND = 10.0              # largest skew (seconds) the coarse warp may follow
+STEP_PENALTY = 1.0              # pixels charged for each non-diagonal DTW step
+DEFAULT_CLICK_TOLERANCE = 0.1   # seconds between a click and its replay
+MATCH_NEIGHBOURS = 8            # captured events on each side tried for every original event
+MATCH_CHUNK = 1 << 18           # original events matched at a time
+DTW_CHUNK = 4096                # DTW rows whose costs are computed at once
+MAX_LISTED_CLICKS = 20          # missing/extra clicks listed in the report
+ANCHOR_EVENTS = 100             # first exactly matched events that define skew 0
+
+_DIAG, _UP, _LEFT, _START = range(4)
+
+
+class Events:
+    """Columns of a loaded recording as NumPy arrays (times sorted)."""
+
+    def __init__(self, path, button_ids):
+        track, self.total_duration = loader.load_track(path)
+        start, stop = track.bounds()
+        self.path = path
+        self.t = np.frombuffer(track.times, dtype=np.float64)[start:stop]
+        self.x = np.frombuffer(track.xs, dtype=np.int32)[start:stop].astype(np.float64)
+        self.y = np.frombuffer(track.ys, dtype=np.int32)[start:stop].astype(np.float64)
+        self.actions = np.frombuffer(track.actions, dtype=np.uint8)[start:stop]
+        # Button codes are per file; map them to ids shared by both recordings
+        ids = np.array([button_ids.setdefault(name, len(button_ids)) for name in track.button_names], dtype=np.int64)
+        self.buttons = ids[np.frombuffer(track.buttons, dtype=np.uint8)[start:stop]]
+
+    def __len__(self):
+        return len(self.t)
+
+
+def _distribution(values, scale=1.0):
+    if not len(values):
+        return {'p50': 0.0, 'p90': 0.0, 'p99': 0.0, 'max': 0.0, 'mean': 0.0}
+    p50, p90, p99 = np.percentile(values, (50, 90, 99)) * scale
+    return {'p50': float(p50), 'p90': float(p90), 'p99': float(p99),
+            'max': float(values.max() * scale), 'mean': float(values.mean() * scale)}
+
+
+def resample(events, grid):
+    """(len(grid), 2) pointer positions at the grid times (last position at or before each)."""
+    idx = np.clip(np.searchsorted(events.t, grid, side='right') - 1, 0, len(events) - 1)
+    return np.column_stack((events.x[idx], events.y[idx]))
+
+
+# --- 1. Offset ---
+def estimate_offset(original, capture, resolution):
+    """Seconds to add to original times to get capture times."""
+    a = np.diff(resample(original, np.arange(original.t[0], original.t[-1] + resolution, resolution)), axis=0)
+    b = np.diff(resample(capture, np.arange(capture.t[0], capture.t[-1] + resolution, resolution)), axis=0)
+    fallback = capture.t[0] - original.t[0]
+    if not len(a) or not len(b) or not a.any() or not b.any():
+        return fallback  # no movement to correlate: line up the first events
+    size = 1 << (len(a) + len(b) - 2).bit_length()
+    corr = np.fft.irfft(np.fft.rfft(b, size, axis=0) * np.conj(np.fft.rfft(a, size, axis=0)), size, axis=0).sum(axis=1)
+    # corr[k] = sum_i b[i + k] . a[i]; negative lags wrap around to the end
+    lags = np.concatenate((np.arange(len(b)), np.arange(-(len(a) - 1), 0)))
+    values = np.concatenate((corr[:len(b)], corr[size - (len(a) - 1):] if len(a) > 1 else corr[:0]))
+    lag = lags[int(np.argmax(values))]
+    return capture.t[0] - original.t[0] + lag * resolution
+
+
+# --- 2. Warp ---
+def banded_dtw(a, b, base, w, penalty=STEP_PENALTY):
+    """DTW of path `a` (n x 2) against path `b`, where row i may only use
+    b[base[i]:base[i] + 2w + 1] (a band that can follow a moving centre) and
+    the path may start and end anywhere in the first and last rows' bands.
+    Every non-diagonal step costs `penalty` pixels, so stretches where the
+    pointer stands still keep the timing instead of warping for free.
+
+    Returns (index into `b` matched to each row, averaged over the path's
+    cells in that row; mean cost in pixels along the path).
+    """
+    n = len(a)
+    width = 2 * w + 1
+    ks = np.arange(width)
+    ramp = penalty * ks
+    # How far each row's band moved beyond the diagonal step; cell k of row i
+    # and cell k + 1 + d[i] of row i - 1 are the same column of `b`
+    d = np.zeros(n, dtype=np.int64)
+    d[1:] = np.diff(base) - 1
+    codes = np.empty((n, width), dtype=np.int8)
+    buf = np.full(3 * width + 1, np.inf)  # previous row at buf[width:2 * width], inf around it
+    for i0 in range(0, n, DTW_CHUNK):
+        i1 = min(i0 + DTW_CHUNK, n)
+        cells = b[base[i0:i1, None] + ks]
+        costs = np.hypot(cells[..., 0] - a[i0:i1, 0, None], cells[..., 1] - a[i0:i1, 1, None])
+        for i in range(i0, i1):
+            c = costs[i - i0]
+            if i == 0:
+                buf[width:2 * width] = c
+                codes[0] = _START
+                continue
+            shift = width + int(d[i])
+            diag, up = buf[shift:shift + width], buf[shift + 1:shift + 1 + width]
+            up = up + penalty
+            from_up = up < diag
+            best = np.where(from_up, up, diag)
+            # D[k] = c[k] + min(best[k], D[k - 1] + p)
+            #      = S[k] + p k + min over l <= k of (best[l] - S[l - 1] - p l)
+            s = np.cumsum(c)
+            e = best - (s - c) - ramp
+            m = np.minimum.accumulate(e)
+            buf[width:2 * width] = s + ramp + m
+            codes[i] = np.where(m < e, _LEFT, np.where(from_up, _UP, _DIAG))
+    k = int(np.argmin(buf[width:2 * width]))
+    total = buf[width + k]
+
+    # Backtrack; the path visits every row
+    matched_sum = np.zeros(n)
+    cells_in_row = np.zeros(n)
+    i = n - 1
+    steps = 0
+    while True:
+        matched_sum[i] += base[i] + k
+        cells_in_row[i] += 1
+        steps += 1
+        code = codes[i, k]
+        if code == _START:
+            break
+        if code == _LEFT:
+            k -= 1
+        else:
+            k += int(d[i]) + (code == _UP)
+            i -= 1
+    return matched_sum / cells_in_row, float(total / steps)
+
+
+def warp(original, capture, offset, resolution, band, guide=None):
+    """Timing skew (seconds) of the capture at every step of the original's
+    resampled path (returned as (grid, skew)), from a banded DTW centred on
+    `offset` or, when given, on a coarser (grid, skew) `guide`."""
+    grid = np.arange(original.t[0], original.t[-1] + resolution, resolution)
+    n = len(grid)
+    w = max(1, int(round(band / resolution)))
+    centre = np.zeros(n, dtype=np.int64)
+    if guide is not None:
+        centre = np.round(np.interp(grid, *guide) / resolution).astype(np.int64)
+        # The band may move at most w steps per row, so consecutive bands overlap
+        centre = np.cumsum(np.concatenate((centre[:1], np.clip(np.diff(centre), -w, w))))
+    first = int(centre.min()) - w
+    steps = np.arange(first, n + int(centre.max()) + w + 1)
+    b = resample(capture, grid[0] + offset + steps * resolution)
+    base = np.arange(n) + centre - w - first
+    matched, cost = banded_dtw(resample(original, grid), b, base, w)
+    return grid, (matched + first - np.arange(n)) * resolution, cost
+
+
+# --- 3. Matching ---
+def match_events(original, capture, mapped):
+    """Index of the captured event matched to each original event (closest
+    position among the MATCH_NEIGHBOURS on each side of its mapped time,
+    then closest time) and the distance in pixels."""
+    n, m = len(original), len(capture)
+    offsets = np.arange(-MATCH_NEIGHBOURS, MATCH_NEIGHBOURS)
+    matched = np.empty(n, dtype=np.int64)
+    error = np.empty(n)
+    for i0 in range(0, n, MATCH_CHUNK):
+        i1 = min(i0 + MATCH_CHUNK, n)
+        cand = np.clip(np.searchsorted(capture.t, mapped[i0:i1])[:, None] + offsets, 0, m - 1)
+        dist = np.hypot(capture.x[cand] - original.x[i0:i1, None], capture.y[cand] - original.y[i0:i1, None])
+        # Position first; 1 px outweighs any time difference between neighbours
+        score = dist + np.minimum(np.abs(capture.t[cand] - mapped[i0:i1, None]), 0.999)
+        best = np.argmin(score, axis=1)
+        rows = np.arange(i1 - i0)
+        matched[i0:i1] = cand[rows, best]
+        error[i0:i1] = dist[rows, best]
+    return matched, error
+
+
+def match_clicks(original, capture, mapped, tolerance, window):
+    """One-to-one matching of presses and releases per (action, button) within
+    `tolerance` seconds. Returns (original indexes, capture indexes) of the
+    pairs, plus the unmatched original and captured clicks (capture clicks
+    outside `window` are ignored)."""
+    pairs_o, pairs_c, missing, extra = [], [], [], []
+    orig_clicks = np.flatnonzero((original.actions == mrec.ACTION_PRESS) | (original.actions == mrec.ACTION_RELEASE))
+    cap_clicks = np.flatnonzero(((capture.actions == mrec.ACTION_PRESS) | (capture.actions == mrec.ACTION_RELEASE))
+                                & (capture.t >= window[0]) & (capture.t <= window[1]))
+    kinds = set(zip(original.actions[orig_clicks].tolist(), original.buttons[orig_clicks].tolist()))
+    kinds.update(zip(capture.actions[cap_clicks].tolist(), capture.buttons[cap_clicks].tolist()))
+    for action, button in kinds:
+        o = orig_clicks[(original.actions[orig_clicks] == action) & (original.buttons[orig_clicks] == button)]
+        c = cap_clicks[(capture.actions[cap_clicks] == action) & (capture.buttons[cap_clicks] == button)]
+        if not len(c):
+            missing.append(o)
+            continue
+        ct = capture.t[c]
+        # Nearest captured click of this kind to each mapped original click
+        right = np.clip(np.searchsorted(ct, mapped[o]), 0, len(c) - 1)
+        left = np.clip(right - 1, 0, len(c) - 1)
+        use_left = np.abs(ct[left] - mapped[o]) < np.abs(ct[right] - mapped[o])
+        nearest = np.where(use_left, left, right)
+        gap = np.abs(ct[nearest] - mapped[o])
+        ok = gap <= tolerance
+        # A captured click claimed by several originals goes to the closest one
+        order = np.lexsort((gap[ok], nearest[ok]))
+        claimed = nearest[ok][order]
+        first = np.unique(claimed, return_index=True)[1]
+        winners = np.flatnonzero(ok)[order][first]
+        taken = np.zeros(len(o), dtype=bool)
+        taken[winners] = True
+        pairs_o.append(o[winners])
+        pairs_c.append(c[nearest[winners]])
+        missing.append(o[~taken])
+        used = np.zeros(len(c), dtype=bool)
+        used[nearest[winners]] = True
+        extra.append(c[~used])
+    join = lambda parts: np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+    pairs_o = np.concatenate(pairs_o) if pairs_o else np.empty(0, dtype=np.int64)
+    pairs_c = np.concatenate(pairs_c) if pairs_c else np.empty(0, dtype=np.int64)
+    return pairs_o, pairs_c, join(missing), join(extra)
+
+
+def _click_list(events, indexes, button_names, offset=0.0):
+    return [{'time_s': float(events.t[i] - offset), 'action': mrec.ACTIONS[events.actions[i]],
+             'button': button_names[events.buttons[i]], 'x': int(events.x[i]), 'y': int(events.y[i])}
+            for i in indexes[:MAX_LISTED_CLICKS]]
+
+
+# --- Report ---
+def analyze(original_path, capture_path, resolution=DEFAULT_RESOLUTION, band=DEFAULT_BAND,
+            click_tolerance=DEFAULT_CLICK_TOLERANCE):
+    """Fidelity report of a replay capture against its original recording.
+
+    Raises FileNotFoundError or ValueError (unreadable or empty recordings).
+    """
+    started = time.perf_counter()
+    button_ids = {}
+    original = Events(original_path, button_ids)
+    capture = Events(capture_path, button_ids)
+    for events in (original, capture):
+        if not len(events):
+            raise ValueError(f"No events in {events.path}")
+    loaded = time.perf_counter()
+
+    offset = estimate_offset(original, capture, resolution)
+    # Coarse to fine: a wide band at low resolution follows drift and stalls,
+    # then a narrow band around it at full resolution
+    guide = warp(original, capture, offset, max(COARSE_RESOLUTION, resolution), COARSE_BAND)[:2]
+    grid, skew_grid, dtw_cost = warp(original, capture, offset, resolution, band, guide)
+    warped = time.perf_counter()
+
+    # Original events mapped onto the capture clock
+    mapped = original.t + offset + np.interp(original.t, grid, skew_grid)
+    matched, error = match_events(original, capture, mapped)
+    exact = error == 0
+    skew = capture.t[matched] - offset - original.t
+    timed = skew[exact] if exact.any() else skew
+    timed_t = original.t[exact] if exact.any() else original.t
+    # Skew counts from playback start: the capture offset is re-anchored on the first events
+    anchor = float(np.median(timed[:ANCHOR_EVENTS]))
+    offset += anchor
+    timed = timed - anchor
+    drift = float(np.polyfit(timed_t, timed, 1)[0] * 60e3) if len(timed) > 1 and np.ptp(timed_t) > 0 else 0.0
+
+    window = (mapped[0] - band, mapped[-1] + band)  # playback span in the capture
+    pairs_o, pairs_c, missing, extra = match_clicks(original, capture, mapped, click_tolerance, window)
+    button_names = sorted(button_ids, key=button_ids.get)
+    click_skew = capture.t[pairs_c] - offset - original.t[pairs_o]
+    click_error = np.hypot(capture.x[pairs_c] - original.x[pairs_o], capture.y[pairs_c] - original.y[pairs_o])
+    finished = time.perf_counter()
+
+    return {
+        'original': original_path,
+        'capture': capture_path,
+        'events': {'original': len(original), 'capture': len(capture)},
+        'offset_s': float(offset),
+        'spatial': {
+            'error_px': _distribution(error),
+            'exact_fraction': float(exact.mean()),
+        },
+        'timing': {
+            'skew_ms': _distribution(timed, 1e3),
+            'abs_skew_ms': _distribution(np.abs(timed), 1e3),
+            'drift_ms_per_min': drift,
+            'warp_max_ms': float(np.abs(skew_grid).max() * 1e3),
+        },
+        'clicks': {
+            'original': int(np.isin(original.actions, (mrec.ACTION_PRESS, mrec.ACTION_RELEASE)).sum()),
+            'matched': len(pairs_o),
+            'missing': len(missing),
+            'extra': len(extra),
+            'skew_ms': _distribution(click_skew, 1e3),
+            'error_px': _distribution(click_error),
+            'missing_list': _click_list(original, missing, button_names),
+            'extra_list': _click_list(capture, extra, button_names, offset),
+        },
+        'dtw': {'resolution_ms': resolution * 1e3, 'band_ms': band * 1e3, 'coarse_band_ms': COARSE_BAND * 1e3,
+                'rows': len(grid), 'mean_cost_px': dtw_cost},
+        'elapsed_s': {'load': loaded - started, 'warp': warped - loaded, 'match': finished - warped,
+                      'total': finished - started},
+    }
+
+
+def failures(report, max_error_px=None, max_skew_ms=None, max_click_errors=None):
+    """Threshold violations (p99 spatial error, p99 |skew|, missing + extra clicks) as messages."""
+    found = []
+    error = report['spatial']['error_px']['p99']
+    if max_error_px is not None and error > max_error_px:
+        found.append(f"p99 spatial error {error:.2f}px > {max_error_px}px")
+    skew = report['timing']['abs_skew_ms']['p99']
+    if max_skew_ms is not None and skew > max_skew_ms:
+        found.append(f"p99 timing skew {skew:.2f}ms > {max_skew_ms}ms")
+    clicks = report['clicks']['missing'] + report['clicks']['extra']
+    if max_click_errors is not None and clicks > max_click_errors:
+        found.append(f"{clicks} missing/extra clicks > {max_click_errors}")
+    return found
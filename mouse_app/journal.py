@@ -0,0 +1,225 @@
+"""Captura em disco, incremental e resistente a falhas, das gravações do mouse.
+
+Os eventos capturados no buffer circular (ring_buffer.EventRing) vão para um
+arquivo de segmento (.part) apenas com anexação, em blocos com CRC32 gravados
+por um thread escritor. Se o processo morrer, o .part contém
+tudo até o último bloco completo e pode ser recuperado com `recover`.
+
+Layout do segmento: magic 'MRJL' + versão u16, seguido de blocos
+(tipo u8, tamanho u32, crc32 u32, dados). Tipos de bloco:
+
+    'E'  eventos: registros (time_offset f64, ação u8, botão u8, x, y, dx, dy i32)
+    'B'  nome de botão (utf-8); o primeiro recebe o id 1, o seguinte 2, ...
+    'D'  fim da gravação: total_duration f64
+"""
+import os
+import struct
+import threading
+from itertools import islice
+import zlib
+
+import mrec
+
+MAGIC = b'MRJL'
+VERSION = 1
+PART_SUFFIX = '.part'
+
+CHUNK_EVENTS = 4096     # máximo de eventos por bloco
+FLUSH_INTERVAL = 1.0    # segundos entre descargas para o disco
+
+_FILE_HEADER = struct.Struct('<4sH')
+_BLOCK_HEADER = struct.Struct('<cII')
+_RECORD = struct.Struct('<dBBiiii')
+_DURATION = struct.Struct('<d')
+
+
+class JournalWriter:
+    """Esvazia o buffer circular da captura e grava os eventos em blocos num thread separado."""
+
+    def __init__(self, path, ring):
+        self.path = path
+        self.ring = ring
+        self.count = 0
+        self._names_written = 1   # button_names[0] é "sem botão"
+        self._wake = threading.Event()
+        self._stopping = False
+        ring.on_high_water = self._wake.set
+        self._file = open(path, 'wb')
+        self._file.write(_FILE_HEADER.pack(MAGIC, VERSION))
+        self._sync()
+        self._thread = threading.Thread(target=self._run, name='journal-writer', daemon=True)
+        self._thread.start()
+
+    def close(self, total_duration):
+        """Grava o que falta e o bloco de fim; depois disso o segmento está completo."""
+        self._stopping = True
+        self._wake.set()
+        self._thread.join()
+        self._drain()
+        self._write_block(b'D', _DURATION.pack(total_duration))
+        self._sync()
+        self._file.close()
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(FLUSH_INTERVAL)
+            self._wake.clear()
+            if self._drain():
+                self._sync()
+
+    def _drain(self):
+        """Copia o buffer circular para uma EventTrack e grava-a em blocos de até CHUNK_EVENTS."""
+        if not len(self.ring):
+            return False
+        track = self.ring.drain()
+        names = track.button_names
+        while self._names_written < len(names):
+            self._write_block(b'B', names[self._names_written].encode('utf-8'))
+            self._names_written += 1
+        pack = _RECORD.pack
+        rows = zip(track.times, track.actions, track.buttons, track.xs, track.ys, track.dxs, track.dys)
+        for _ in range(0, len(track), CHUNK_EVENTS):
+            records = b''.join([pack(*row) for row in islice(rows, CHUNK_EVENTS)])
+            self._write_block(b'E', records)
+        self.count += len(track)
+        return True
+
+    def _write_block(self, kind, payload):
+        self._file.write(_BLOCK_HEADER.pack(kind, len(payload), zlib.crc32(payload)) + payload)
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+
+class JournalReader:
+    """Lê um segmento, parando no primeiro bloco truncado ou corrompido."""
+
+    def __init__(self, path):
+        self.path = path
+        self.button_names = [None]
+        self.total_duration = None   # None enquanto o bloco de fim não for lido
+        self.last_time = 0.0
+        self.truncated = False
+
+    def iter_blocks(self):
+        """Gera listas de registros, uma por bloco de eventos válido."""
+        self.button_names = [None]
+        self.total_duration = None
+        self.last_time = 0.0
+        self.truncated = False
+        with open(self.path, 'rb') as f:
+            header = f.read(_FILE_HEADER.size)
+            if len(header) < _FILE_HEADER.size:
+                raise ValueError(f"{self.path} está vazio ou truncado no cabeçalho.")
+            magic, version = _FILE_HEADER.unpack(header)
+            if magic != MAGIC:
+                raise ValueError(f"{self.path} não é um segmento de gravação.")
+            if version > VERSION:
+                raise ValueError(f"Versão de segmento {version} não suportada.")
+            while True:
+                header = f.read(_BLOCK_HEADER.size)
+                if not header:
+                    break
+                if len(header) < _BLOCK_HEADER.size:
+                    self.truncated = True
+                    break
+                kind, size, crc = _BLOCK_HEADER.unpack(header)
+                payload = f.read(size)
+                if len(payload) < size or zlib.crc32(payload) != crc:
+                    self.truncated = True
+                    break
+                if kind == b'E':
+                    if size % _RECORD.size:
+                        self.truncated = True
+                        break
+                    records = list(_RECORD.iter_unpack(payload))
+                    if records:
+                        self.last_time = records[-1][0]
+                    yield records
+                elif kind == b'B':
+                    self.button_names.append(payload.decode('utf-8'))
+                elif kind == b'D':
+                    (self.total_duration,) = _DURATION.unpack(payload)
+                    break
+
+    def iter_events(self):
+        """Gera os eventos no formato de dicionário do gravador (mrec.event_dict)."""
+        event_dict = mrec.event_dict
+        for records in self.iter_blocks():
+            names = self.button_names   # iter_blocks() recria a lista e a completa a cada bloco 'B'
+            for t, action, button, x, y, dx, dy in records:
+                yield event_dict(action, names[button], x, y, dx, dy, t)
+
+
+def _scan(reader):
+    """Primeira passada: contagens, ordenação e duração, sem guardar eventos."""
+    count = n_scroll = 0
+    flags = mrec.FLAG_SORTED
+    last = float('-inf')
+    for records in reader.iter_blocks():
+        for record in records:
+            if record[0] < last:
+                flags &= ~mrec.FLAG_SORTED
+            last = record[0]
+            if record[1] == mrec.ACTION_SCROLL:
+                n_scroll += 1
+        count += len(records)
+    return count, n_scroll, flags
+
+
+def _write_mrec(f, reader, scan, total_duration):
+    count, n_scroll, flags = scan
+    f.write(mrec.pack_header(flags, count, n_scroll, total_duration, reader.button_names[1:]))
+    # Uma passada por coluna mantém a memória limitada ao tamanho de um bloco.
+    # Campos do registro: time_offset, ação, botão, x, y, dx, dy.
+    for field, typecode in zip((0, 3, 4, 1, 2), mrec.COLUMN_TYPES):
+        for records in reader.iter_blocks():
+            f.write(mrec.column_bytes(typecode, [r[field] for r in records]))
+    for field in (5, 6):
+        for records in reader.iter_blocks():
+            f.write(mrec.column_bytes('i', [r[field] for r in records if r[1] == mrec.ACTION_SCROLL]))
+
+
+def finalize(part_path, output_path):
+    """Converte o segmento na gravação final e a publica com um rename atômico.
+
+    Funciona também com segmentos incompletos (processo interrompido); nesse
+    caso a duração total passa a ser o instante do último evento salvo.
+    Retorna (número de eventos, duração total, segmento estava completo).
+    """
+    reader = JournalReader(part_path)
+    scan = _scan(reader)
+    count = scan[0]
+    complete = reader.total_duration is not None
+    total_duration = reader.total_duration if complete else reader.last_time
+
+    tmp_path = output_path + '.tmp'
+    chunk_store = None
+    if output_path.lower().endswith(mrec.EXTENSION):
+        with open(tmp_path, 'wb') as f:
+            _write_mrec(f, reader, scan, total_duration)
+            f.flush()
+            os.fsync(f.fileno())
+    elif output_path.lower().endswith('.mref'):
+        import store  # só aqui: `mouse_rec.py stop` importa este módulo e deve abrir rápido
+        # Os blocos vão direto para o repositório de chunks; só o manifesto fica aqui
+        writer = store.ChunkWriter()
+        chunk_store = writer.store
+        for records in reader.iter_blocks():
+            writer.extend(records, reader.button_names)
+        entries = writer.finish(reader.button_names)
+        with open(tmp_path, 'wb') as f:
+            f.write(store.manifest_bytes(entries, total_duration, scan[2], reader.button_names))
+            f.flush()
+            os.fsync(f.fileno())
+    else:
+        with open(tmp_path, 'w') as f:
+            mrec.dump_json_stream(f, total_duration, reader.iter_events())
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_path, output_path)
+    if chunk_store is not None:
+        chunk_store.register([output_path])  # para o gc manter os chunks, esteja o manifesto onde estiver
+    os.remove(part_path)
+    return count, total_duration, complete
@@ -0,0 +1,257 @@
+"""Single-pass, streaming recording loader.
+
+JSON recordings are parsed incrementally: the file is read in chunks and each
+element of "events" is decoded on its own by the json scanner, so
+events are available (and normalized to the current schema, see
+mrec.normalize_event) before the rest of the file has been read. .mrec files
+are decoded straight into an EventTrack, and .mref manifests are assembled
+from the chunk store (store.py).
+
+The loader checks ordering while it appends and only sorts when the file is
+not already monotonic in time_offset.
+"""
+import json
+import re
+import threading
+from array import array
+
+import mrec
+import store
+from backends import OP_POSITION
+from event_track import EventTrack
+from scheduler import Retimer
+
+CHUNK_SIZE = 1 << 16
+STREAM_BATCH = 1024          # events parsed between wake-ups of the player
+STREAM_MIN_BYTES = 16 << 20  # JSON files at least this big are played while parsing
+
+_WHITESPACE = ' \t\n\r'
+_NUMBER_END = re.compile(r'[^0-9.eE+\-]')
+_SEPARATOR = re.compile(r'[ \t\n\r]*([,\]])[ \t\n\r]*')
+
+
+class _JsonReader:
+    """Tiny pull parser over a text file for the recording's top-level object."""
+
+    def __init__(self, f):
+        self.f = f
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        chunk = self.f.read(CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        if self.pos > CHUNK_SIZE:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        self.buf += chunk
+        return True
+
+    def peek(self):
+        """Next non-whitespace character ('' at end of file)."""
+        while True:
+            buf, pos = self.buf, self.pos
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            self.pos = pos
+            if pos < len(buf):
+                return buf[pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Invalid recording JSON: expected '{char}' at offset {self.pos}.")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A number at the very end of the buffer may continue in the next chunk.
+            if not self.eof and not _NUMBER_END.search(self.buf, end) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+class RecordingStream:
+    """Iterates the normalized events of a JSON recording while reading it.
+
+    `header` collects the other top-level keys (version, total_duration, ...)
+    as they are met; keys written after "events" are known once iteration ends.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.header = {}
+
+    def __iter__(self):
+        with open(self.path, 'r') as f:
+            reader = _JsonReader(f)
+            reader.expect('{')
+            if reader.peek() == '}':
+                return
+            while True:
+                key = reader.value()
+                reader.expect(':')
+                if key == 'events':
+                    mrec.check_schema_version(self.header.get('version'))
+                    yield from self._events(reader)
+                else:
+                    self.header[key] = reader.value()
+                char = reader.peek()
+                reader.pos += 1
+                if char == '}':
+                    break
+                if char != ',':
+                    raise ValueError(f"Invalid recording JSON: unexpected '{char}' at offset {reader.pos - 1}.")
+        mrec.check_schema_version(self.header.get('version'))
+
+    def _events(self, reader):
+        # Hot path: the C scanner decodes one event and a regex consumes the
+        # separator, so the per-event work stays inside the json extension.
+        normalize = mrec.normalize_event
+        scan = reader.decoder.scan_once
+        match_separator = _SEPARATOR.match
+        reader.expect('[')
+        if reader.peek() == ']':
+            reader.pos += 1
+            return
+        buf, pos = reader.buf, reader.pos
+        while True:
+            try:
+                event, end = scan(buf, pos)
+                match = match_separator(buf, end)
+            except (StopIteration, json.JSONDecodeError):
+                match = None
+            if match is None:
+                # Event or separator cut by the chunk boundary: read more and retry.
+                reader.pos = pos
+                if not reader._fill():
+                    raise ValueError("Invalid recording JSON: malformed or truncated event in \"events\".")
+                reader.peek()
+                buf, pos = reader.buf, reader.pos
+                continue
+            yield normalize(event)
+            pos = match.end()
+            if match.group(1) == ']':
+                reader.pos = pos
+                return
+
+
+def recording_format(path):
+    """'mrec', 'mref' or 'json'."""
+    if mrec.is_mrec(path):
+        return 'mrec'
+    if store.is_manifest(path):
+        return 'mref'
+    return 'json'
+
+
+def load_track(path):
+    """Load a recording as (EventTrack sorted by time_offset, total_duration)."""
+    if store.is_manifest(path):
+        return store.load_track(path)
+    if mrec.is_mrec(path):
+        with open(path, 'rb') as f:
+            track, total_duration, flags = mrec.decode_track(f.read())
+        if not flags & mrec.FLAG_SORTED:
+            track = track.sorted()
+        return track, total_duration
+
+    stream = RecordingStream(path)
+    track = EventTrack()
+    append_event = track.append_event
+    times = track.times
+    monotonic = True
+    last = float('-inf')
+    for event in stream:
+        append_event(event)
+        t = times[-1]
+        if t < last:
+            monotonic = False
+        last = t
+    if not monotonic:
+        track = track.sorted()
+    return track, stream.header.get('total_duration', 0.0)
+
+
+class TrackStream:
+    """Parses a JSON recording on a background thread, filling an EventTrack and
+    its playback deadlines so playback can start before parsing finishes.
+
+    Events are played in file order; an event that goes back in time simply
+    becomes due immediately. Opcodes are filled alongside (see plan.py), but
+    every click and scroll moves the pointer first and scrolls are not merged.
+    """
+
+    def __init__(self, path, speed=1.0, max_gap=None):
+        self.path = path
+        self.track = EventTrack()
+        self.deadlines = array('d')
+        self.ops = array('B')
+        self.total_duration = None
+        self.recorded_duration = None   # total_duration before retiming
+        self.available = 0
+        self.done = False
+        self.error = None
+        self._retimer = Retimer(speed, max_gap)
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='track-stream', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _publish(self):
+        with self._cond:
+            self.available = len(self.track)
+            self._cond.notify_all()
+
+    def _run(self):
+        stream = RecordingStream(self.path)
+        append_event = self.track.append_event
+        times, actions = self.track.times, self.track.actions
+        push = self._retimer.push
+        deadlines, ops = self.deadlines, self.ops
+        try:
+            for n, event in enumerate(stream, 1):
+                append_event(event)
+                deadlines.append(push(times[-1]))
+                action = actions[-1]
+                ops.append(action | OP_POSITION if action != mrec.ACTION_MOVE else action)
+                if n % STREAM_BATCH == 0:
+                    self._publish()
+            last_offset = times[-1] if len(times) else 0.0
+            self.recorded_duration = max(stream.header.get('total_duration', 0.0), last_offset)
+            self.total_duration = self._retimer.finish(self.recorded_duration)
+        except Exception as e:  # surfaced to the player through wait_for()
+            self.error = e
+        with self._cond:
+            self.available = len(self.track)
+            self.done = True
+            self._cond.notify_all()
+
+    def wait_for(self, index, timeout=None):
+        """Block until more than `index` events are parsed or parsing ended.
+
+        Returns the number of events available; raises the parser's error.
+        """
+        with self._cond:
+            while self.available <= index and not self.done:
+                if not self._cond.wait(timeout):
+                    break
+        if self.error is not None and self.available <= index:
+            raise self.error
+        return self.available
@@ -1,19 +1,25 @@
-import pynput.mouse
-import pynput.keyboard
 import time
-import json
 import argparse
+import math
 import threading
 import sys
 import os
 import signal
-import tkinter as tk
+
+# pynput e tkinter são importados só por start_recording_foreground, para que
+# stop e recover não paguem o custo (nem precisem de display).
+import journal
+from mrec import ACTION_MOVE, ACTION_PRESS, ACTION_RELEASE, ACTION_SCROLL
+from ring_buffer import EventRing, DEFAULT_CAPACITY
 
 # --- Configurações Globais ---
 RECORDER_PID_FILE = "recorder_v2.pid"
+STOP_TIMEOUT = 3.0        # segundos que o comando stop espera o gravador terminar
+STOP_POLL_INTERVAL = 0.01
 output_file_global = None
-recorded_events_global = []
-recording_start_time_global = None
+journal_writer_global = None
+capture_ring_global = None
+recording_start_time_global = None  # perf_counter_ns() do início da gravação
 stop_recording_event_global = threading.Event()
 mouse_listener_global = None
 keyboard_listener_global = None
@@ -21,32 +27,52 @@ keyboard_listener_global = None
 # Globais do cronômetro
 timer_window_global = None
 timer_label_global = None
-remaining_time_global = 0
-timer_thread_global = None
-timer_update_id_global = None
+# Pipe (leitura, escrita) não bloqueante que acorda a espera da gravação; ver request_stop
+wakeup_pipe_global = None
 
 # Controle de limpeza
 _cleanup_has_run = False
 _cleanup_lock = threading.Lock()
 
-# --- Funções do Cronômetro ---
-def update_timer_display():
-    """Atualiza o cronômetro na janela Tkinter."""
-    global timer_label_global, remaining_time_global, timer_window_global, stop_recording_event_global, timer_update_id_global
-    if timer_window_global and timer_label_global:
-        mins, secs = divmod(remaining_time_global, 60)
-        timer_label_global.config(text=f"Tempo: {mins:02d}:{secs:02d}")
-        if remaining_time_global > 0 and not stop_recording_event_global.is_set():
-            remaining_time_global -= 1
-            timer_update_id_global = timer_window_global.after(1000, update_timer_display)
-        elif not stop_recording_event_global.is_set():
-            timer_label_global.config(text="Tempo esgotado!")
+# --- Espera da Gravação ---
+# O thread principal dorme até o fim do prazo ou até um pedido de parada, sem
+# polling: no modo --headless num único select() com o tempo restante, com a
+# janela no mainloop do Tk, que só acorda uma vez por segundo para o mostrador.
+# Sinais, o Ctrl+C global e o comando stop acordam os dois pelo pipe.
+def request_stop():
+    """Pede o fim da gravação. Pode ser chamado de qualquer thread."""
+    stop_recording_event_global.set()
+    if wakeup_pipe_global is not None:
+        try:
+            os.write(wakeup_pipe_global[1], b'\0')
+        except OSError:
+            pass  # pipe cheio: já há um despertar pendente
+
+def _drain_wakeup_pipe():
+    try:
+        while os.read(wakeup_pipe_global[0], 512):
+            pass
+    except OSError:
+        pass  # vazio
+
+def wait_headless(deadline):
+    """Espera sem janela até `deadline` (time.monotonic()) ou um pedido de parada."""
+    import select
+    while not stop_recording_event_global.is_set():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
             print("DEBUG: Tempo esgotado.", file=sys.stderr, flush=True)
-            stop_recording_event_global.set()
+            return
+        select.select([wakeup_pipe_global[0]], [], [], remaining)
+        _drain_wakeup_pipe()
+
+def run_timer_window(deadline):
+    """Mostra o cronômetro no thread principal até `deadline` ou um pedido de parada.
 
-def create_timer_window():
-    """Cria a janela do cronômetro de forma segura."""
+    Levanta tkinter.TclError (ou ImportError) se não houver display ou Tk.
+    """
     global timer_window_global, timer_label_global
+    import tkinter as tk
     timer_window_global = tk.Tk()
     timer_window_global.title("Cronômetro do Gravador")
     timer_window_global.geometry("150x50+100+100")
@@ -55,38 +81,77 @@ def create_timer_window():
     timer_label_global = tk.Label(timer_window_global, text="Iniciando...", font=("Arial", 14))
     timer_label_global.pack(expand=True, fill=tk.BOTH)
     print("DEBUG: Janela Tkinter criada.", file=sys.stderr, flush=True)
+
+    def update_timer_display():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        shown = math.ceil(remaining)
+        mins, secs = divmod(shown, 60)
+        timer_label_global.config(text=f"Tempo: {mins:02d}:{secs:02d}")
+        # Próximo despertar quando o valor mostrado mudar
+        timer_window_global.after(int((remaining - shown + 1) * 1000) + 1, update_timer_display)
+
+    def on_deadline():
+        timer_label_global.config(text="Tempo esgotado!")
+        print("DEBUG: Tempo esgotado.", file=sys.stderr, flush=True)
+        stop_recording_event_global.set()
+        timer_window_global.quit()
+
+    def on_wakeup(fd, mask):
+        _drain_wakeup_pipe()
+        if stop_recording_event_global.is_set():
+            timer_window_global.quit()
+
+    timer_window_global.tk.createfilehandler(wakeup_pipe_global[0], tk.READABLE, on_wakeup)
+    timer_window_global.after(max(0, int((deadline - time.monotonic()) * 1000)), on_deadline)
     update_timer_display()
-    while not stop_recording_event_global.is_set():
-        try:
-            timer_window_global.update()
-            time.sleep(0.01)
-        except tk.TclError:
-            print("DEBUG: Janela Tkinter fechada ou erro.", file=sys.stderr, flush=True)
-            break
+    try:
+        if not stop_recording_event_global.is_set():
+            timer_window_global.mainloop()
+    finally:
+        timer_window_global.tk.deletefilehandler(wakeup_pipe_global[0])
+        timer_window_global.destroy()
+        timer_window_global = None
+        timer_label_global = None
     print("DEBUG: Loop Tkinter finalizado.", file=sys.stderr, flush=True)
 
+def wait_for_recording_end(deadline, headless):
+    if not headless:
+        try:
+            run_timer_window(deadline)
+            return
+        except Exception as e:  # sem display ou sem Tk: segue sem janela
+            print(f"Aviso: cronômetro indisponível ({e}); continuando sem janela.", file=sys.stderr, flush=True)
+    wait_headless(deadline)
+
+def on_signal(signal_num, frame):
+    print(f"Sinal {signal_num} recebido. Parando gravação...", flush=True)
+    request_stop()
+
 # --- Callbacks do Mouse ---
+# Rodam no thread do listener: só gravam no buffer circular pré-alocado, com o
+# relógio monotônico. A conversão e a escrita ficam com o thread do segmento.
+_now_ns = time.perf_counter_ns
+
 def on_move(x, y):
-    if recording_start_time_global and not stop_recording_event_global.is_set():
-        elapsed = time.time() - recording_start_time_global
-        recorded_events_global.append({'type': 'mouse', 'action': 'move', 'x': x, 'y': y, 'time_offset': elapsed})
+    ring = capture_ring_global
+    if ring is not None:
+        ring.push(_now_ns(), ACTION_MOVE, None, x, y)
 
 def on_click(x, y, button, pressed):
-    if recording_start_time_global and not stop_recording_event_global.is_set():
-        elapsed = time.time() - recording_start_time_global
-        recorded_events_global.append({
-            'type': 'mouse', 'action': 'press' if pressed else 'release',
-            'button': str(button), 'x': x, 'y': y, 'time_offset': elapsed
-        })
+    ring = capture_ring_global
+    if ring is not None:
+        ring.push(_now_ns(), ACTION_PRESS if pressed else ACTION_RELEASE, str(button), x, y)
 
 def on_scroll(x, y, dx, dy):
-    if recording_start_time_global and not stop_recording_event_global.is_set():
-        elapsed = time.time() - recording_start_time_global
-        recorded_events_global.append({
-            'type': 'mouse', 'action': 'scroll', 'x': x, 'y': y, 'dx': dx, 'dy': dy, 'time_offset': elapsed
-        })
+    ring = capture_ring_global
+    if ring is not None:
+        ring.push(_now_ns(), ACTION_SCROLL, None, x, y, dx, dy)
 
 # --- Callbacks do Teclado ---
+_ctrl_keys = ()  # teclas Ctrl do pynput, preenchidas ao iniciar a gravação
+
 def on_key_press(key):
     """Captura Ctrl+C globalmente para parar a gravação."""
     try:
@@ -96,9 +161,9 @@ def on_key_press(key):
             # Vamos usar uma variável global para rastrear o estado do Ctrl
             if hasattr(on_key_press, 'ctrl_pressed') and on_key_press.ctrl_pressed:
                 print("\nCtrl+C detectado! Parando gravação...", flush=True)
-                stop_recording_event_global.set()
+                request_stop()
         # Verifica se é a tecla Ctrl
-        elif key == pynput.keyboard.Key.ctrl or key == pynput.keyboard.Key.ctrl_l or key == pynput.keyboard.Key.ctrl_r:
+        elif key in _ctrl_keys:
             on_key_press.ctrl_pressed = True
     except AttributeError:
         pass
@@ -107,7 +172,7 @@ def on_key_release(key):
     """Callback para liberação de teclas."""
     try:
         # Reseta o estado do Ctrl quando liberado
-        if key == pynput.keyboard.Key.ctrl or key == pynput.keyboard.Key.ctrl_l or key == pynput.keyboard.Key.ctrl_r:
+        if key in _ctrl_keys:
             on_key_press.ctrl_pressed = False
     except AttributeError:
         pass
@@ -115,9 +180,32 @@ def on_key_release(key):
 # Inicializa o estado do Ctrl
 on_key_press.ctrl_pressed = False
 
+# --- Arquivo de saída ---
+def resolve_output_path(output_f):
+    """Caminho final da gravação, sempre na pasta mouse_app/mouse_files."""
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    output_dir = os.path.join(base_dir, 'mouse_files')
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    return os.path.join(output_dir, os.path.basename(output_f))
+
+def finalize_recording(part_path, output_path):
+    """Publica o segmento como gravação final e mostra o resumo."""
+    count, total_duration, complete = journal.finalize(part_path, output_path)
+    print(f"Gravação salva em {output_path} ({count} eventos)")
+    print(f"Duração total: {total_duration // 60:.0f}m {total_duration % 60:.2f}s")
+    # Atualiza o catálogo usado por `mouse_executor.py list`; uma falha aqui não afeta a gravação
+    import sqlite3
+    import catalog
+    try:
+        catalog.index_recording(output_path)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Aviso: gravação não indexada no catálogo: {e}", file=sys.stderr, flush=True)
+    return complete
+
 # --- Limpeza ---
 def save_and_cleanup(signal_num=None, frame=None):
-    global mouse_listener_global, keyboard_listener_global, _cleanup_has_run, timer_window_global, timer_thread_global, timer_update_id_global
+    global mouse_listener_global, keyboard_listener_global, _cleanup_has_run, journal_writer_global, capture_ring_global, wakeup_pipe_global
     print("DEBUG: Iniciando save_and_cleanup.", file=sys.stderr, flush=True)
     
     with _cleanup_lock:
@@ -131,6 +219,7 @@ def save_and_cleanup(signal_num=None, frame=None):
         print(f"Sinal {signal_num} recebido. Parando gravação...", flush=True)
 
     stop_recording_event_global.set()
+    capture_ring_global = None
     print("DEBUG: stop_recording_event_global definido.", file=sys.stderr, flush=True)
 
     # Para o listener do teclado primeiro
@@ -157,41 +246,28 @@ def save_and_cleanup(signal_num=None, frame=None):
         print("DEBUG: Thread do listener do mouse finalizado.", file=sys.stderr, flush=True)
         mouse_listener_global = None
 
-    # Junta o thread do cronômetro (a janela Tkinter será destruída automaticamente)
-    if timer_thread_global and timer_thread_global.is_alive():
-        print("DEBUG: Juntando thread do cronômetro.", file=sys.stderr, flush=True)
-        timer_thread_global.join(timeout=2.0)
-        if timer_thread_global.is_alive():
-            print("DEBUG: Thread do cronômetro não terminou a tempo.", file=sys.stderr, flush=True)
-        else:
-            print("DEBUG: Thread do cronômetro finalizado.", file=sys.stderr, flush=True)
-        timer_thread_global = None
-
-    # Limpa as variáveis globais do Tkinter
-    timer_window_global = None
-    timer_label_global = None
-    timer_update_id_global = None
-
-    # Salva os eventos, mesmo que a lista esteja vazia
-    if output_file_global:
-        # --- NOVO: Salvar na pasta mouse_app/mouse_files ---
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        output_dir = os.path.join(base_dir, 'mouse_files')
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-        output_filename = os.path.basename(output_file_global)
-        output_path = os.path.join(output_dir, output_filename)
+    # O cronômetro já terminou: a limpeza roda no thread principal depois da espera
+    if wakeup_pipe_global is not None:
+        pipe, wakeup_pipe_global = wakeup_pipe_global, None
+        signal.set_wakeup_fd(-1)
+        for fd in pipe:
+            os.close(fd)
+
+    # Fecha o segmento e publica a gravação, mesmo que esteja vazia
+    if output_file_global and journal_writer_global:
+        output_path = resolve_output_path(output_file_global)
         print(f"DEBUG: Salvando gravação em {output_path}.", file=sys.stderr, flush=True)
-        total_duration = (time.time() - recording_start_time_global) if recording_start_time_global else 0
+        total_duration = (_now_ns() - recording_start_time_global) / 1e9 if recording_start_time_global else 0
         total_duration = max(0, total_duration)
-        data = {'total_duration': total_duration, 'events': recorded_events_global}
         try:
-            with open(output_path, 'w') as f:
-                json.dump(data, f, indent=4)
-            print(f"Gravação salva em {output_path}")
-            print(f"Duração total: {total_duration // 60:.0f}m {total_duration % 60:.2f}s")
-        except IOError as e:
-            print(f"Erro ao salvar arquivo JSON: {e}", file=sys.stderr, flush=True)
+            journal_writer_global.close(total_duration)
+            if journal_writer_global.ring.dropped:
+                print(f"Aviso: {journal_writer_global.ring.dropped} eventos descartados (buffer circular cheio).", file=sys.stderr, flush=True)
+            finalize_recording(journal_writer_global.path, output_path)
+        except (IOError, ValueError) as e:
+            print(f"Erro ao salvar gravação: {e}", file=sys.stderr, flush=True)
+            print(f"Os eventos continuam em {journal_writer_global.path}; use o comando 'recover'.", file=sys.stderr, flush=True)
+        journal_writer_global = None
     else:
         print("DEBUG: output_file_global não definido, não salvando arquivo.", file=sys.stderr, flush=True)
 
@@ -211,25 +287,41 @@ def save_and_cleanup(signal_num=None, frame=None):
     print("Limpeza concluída.", flush=True)
 
 # --- Gravação ---
-def start_recording_foreground(output_f, duration_seconds):
-    global output_file_global, recording_start_time_global, recorded_events_global, mouse_listener_global, keyboard_listener_global, remaining_time_global, timer_thread_global
+def start_recording_foreground(output_f, duration_seconds, ring_size=DEFAULT_CAPACITY, headless=False):
+    global output_file_global, recording_start_time_global, journal_writer_global, capture_ring_global, mouse_listener_global, keyboard_listener_global, wakeup_pipe_global, _ctrl_keys
     print("DEBUG: Iniciando start_recording_foreground.", file=sys.stderr, flush=True)
+    import pynput.keyboard
+    import pynput.mouse
+    _ctrl_keys = (pynput.keyboard.Key.ctrl, pynput.keyboard.Key.ctrl_l, pynput.keyboard.Key.ctrl_r)
     
     # Valida o arquivo de saída
     if not output_f:
         print("Erro: Nome do arquivo de saída não fornecido.", file=sys.stderr, flush=True)
         sys.exit(1)
     output_file_global = output_f
-    remaining_time_global = duration_seconds
-    recorded_events_global = []
-    recording_start_time_global = time.time()
+    part_path = resolve_output_path(output_f) + journal.PART_SUFFIX
+    recording_start_time_global = _now_ns()
+    try:
+        ring = EventRing(ring_size, recording_start_time_global)
+        journal_writer_global = journal.JournalWriter(part_path, ring)
+    except ValueError as e:
+        print(f"Erro: {e}", file=sys.stderr, flush=True)
+        sys.exit(1)
+    except IOError as e:
+        print(f"Erro ao criar segmento de gravação {part_path}: {e}", file=sys.stderr, flush=True)
+        sys.exit(1)
+    capture_ring_global = ring
     stop_recording_event_global.clear()
     global _cleanup_has_run
     _cleanup_has_run = False
 
-    # Configura sinais
-    signal.signal(signal.SIGINT, save_and_cleanup)
-    signal.signal(signal.SIGTERM, save_and_cleanup)
+    # Configura sinais; o byte escrito no pipe acorda a espera mesmo dentro do mainloop do Tk
+    wakeup_pipe_global = os.pipe()
+    for fd in wakeup_pipe_global:
+        os.set_blocking(fd, False)
+    signal.set_wakeup_fd(wakeup_pipe_global[1])
+    signal.signal(signal.SIGINT, on_signal)
+    signal.signal(signal.SIGTERM, on_signal)
     print("DEBUG: Manipuladores de sinais configurados.", file=sys.stderr, flush=True)
 
     # Cria arquivo PID
@@ -243,12 +335,6 @@ def start_recording_foreground(output_f, duration_seconds):
         print(f"Erro ao criar arquivo PID: {e}", file=sys.stderr, flush=True)
         sys.exit(1)
 
-    # Inicia cronômetro
-    timer_thread_global = threading.Thread(target=create_timer_window, daemon=True)
-    timer_thread_global.start()
-    print("DEBUG: Thread do cronômetro iniciado.", file=sys.stderr, flush=True)
-    time.sleep(0.5)
-
     # Inicia listener do teclado para capturar Ctrl+C globalmente
     try:
         keyboard_listener_global = pynput.keyboard.Listener(on_press=on_key_press, on_release=on_key_release)
@@ -270,13 +356,8 @@ def start_recording_foreground(output_f, duration_seconds):
         sys.exit(1)
 
     try:
-        print("DEBUG: Entrando no loop principal de gravação.", file=sys.stderr, flush=True)
-        while not stop_recording_event_global.is_set():
-            if remaining_time_global <= 0:
-                print("DEBUG: Duração atingida. Parando gravação.", file=sys.stderr, flush=True)
-                stop_recording_event_global.set()
-                break
-            stop_recording_event_global.wait(timeout=0.25)
+        print("DEBUG: Aguardando o fim da gravação.", file=sys.stderr, flush=True)
+        wait_for_recording_end(time.monotonic() + duration_seconds, headless)
     except Exception as e:
         print(f"Erro inesperado no loop de gravação: {e}", file=sys.stderr, flush=True)
     finally:
@@ -295,7 +376,10 @@ def stop_recording_command():
             pid = int(f.read().strip())
         print(f"Enviando SIGTERM para o processo {pid}...", flush=True)
         os.kill(pid, signal.SIGTERM)
-        time.sleep(1.5)
+        # O gravador remove o arquivo PID ao terminar a limpeza
+        deadline = time.monotonic() + STOP_TIMEOUT
+        while os.path.exists(RECORDER_PID_FILE) and time.monotonic() < deadline:
+            time.sleep(STOP_POLL_INTERVAL)
         if not os.path.exists(RECORDER_PID_FILE):
             print(f"Processo {pid} parado.")
         else:
@@ -312,14 +396,41 @@ def stop_recording_command():
         print(f"Erro ao enviar SIGTERM: {e}", file=sys.stderr, flush=True)
         sys.exit(1)
 
+# --- Comando Recover ---
+def recover_command(part_path, output_f=None):
+    """Reconstrói uma gravação a partir de um segmento deixado por um processo interrompido."""
+    if not os.path.exists(part_path):
+        print(f"Segmento não encontrado: {part_path}", file=sys.stderr, flush=True)
+        sys.exit(1)
+    if output_f:
+        output_path = output_f
+    elif part_path.endswith(journal.PART_SUFFIX):
+        output_path = part_path[:-len(journal.PART_SUFFIX)]
+    else:
+        output_path = part_path + '.json'
+    try:
+        complete = finalize_recording(part_path, output_path)
+    except (IOError, ValueError) as e:
+        print(f"Erro ao recuperar gravação: {e}", file=sys.stderr, flush=True)
+        sys.exit(1)
+    if not complete:
+        print("Aviso: segmento incompleto; eventos após o último bloco salvo foram perdidos.", flush=True)
+
 # --- Principal ---
 def main():
     parser = argparse.ArgumentParser(description="Gravador de Mouse")
     subparsers = parser.add_subparsers(dest="command", required=True)
     start_parser = subparsers.add_parser("start", help="Inicia gravação.")
-    start_parser.add_argument("--output", "-o", type=str, required=True, help="Arquivo de saída JSON.")
+    start_parser.add_argument("--output", "-o", type=str, required=True, help="Arquivo de saída (.json, .mrec ou .mref).")
     start_parser.add_argument("--duration", "-d", type=int, default=600, help="Duração em segundos (padrão: 600).")
+    start_parser.add_argument("--ring-size", type=int, default=DEFAULT_CAPACITY,
+                              help=f"Capacidade do buffer circular de captura, potência de 2 (padrão: {DEFAULT_CAPACITY}).")
+    start_parser.add_argument("--headless", action="store_true",
+                              help="Grava sem a janela do cronômetro (sem Tk nem display).")
     subparsers.add_parser("stop", help="Para gravação ativa.")
+    recover_parser = subparsers.add_parser("recover", help="Recupera uma gravação interrompida a partir do segmento .part.")
+    recover_parser.add_argument("segment", type=str, help="Arquivo de segmento (.part).")
+    recover_parser.add_argument("--output", "-o", type=str, help="Arquivo de saída (padrão: nome do segmento sem .part).")
     args = parser.parse_args()
 
     if args.command == "start":
@@ -336,9 +447,11 @@ def main():
                     os.remove(RECORDER_PID_FILE)
                 except OSError as e:
                     print(f"Erro ao remover arquivo PID: {e}", file=sys.stderr, flush=True)
-        start_recording_foreground(args.output, args.duration)
+        start_recording_foreground(args.output, args.duration, args.ring_size, args.headless)
     elif args.command == "stop":
         stop_recording_command()
+    elif args.command == "recover":
+        recover_command(args.segment, args.output)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
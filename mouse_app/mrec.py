@@ -0,0 +1,273 @@
+"""Formato binário compacto (.mrec) para gravações do mouse.
+
+Layout (little-endian), versão 1:
+
+    cabeçalho   magic 'MREC', versão u16, flags u16, n_eventos u32,
+                n_scroll u32, total_duration f64
+    botões      n_botoes u16 + (tamanho u8, nome utf-8) por botão
+    colunas     time_offset f64[n], x i32[n], y i32[n], ação u8[n],
+                botão u8[n] (0 = nenhum, i = botoes[i - 1]),
+                dx i32[n_scroll], dy i32[n_scroll]
+
+As colunas de scroll só guardam os eventos de scroll, na ordem em que aparecem.
+A conversão JSON <-> .mrec é sem perdas para o layout gravado por mouse_rec.py.
+O JSON gerado é sempre do esquema atual (começa com "version": 2): um arquivo
+sem versão (anterior ao esquema versionado) volta com essa linha a mais e os
+mesmos eventos e total_duration; a partir daí a ida e volta é idêntica byte a
+byte.
+"""
+import json
+import struct
+import sys
+from array import array
+
+import event_track
+
+MAGIC = b'MREC'
+VERSION = 1
+EXTENSION = '.mrec'
+
+# Códigos de ação (coluna u8)
+ACTIONS = ('move', 'press', 'release', 'scroll')
+ACTION_CODES = {name: code for code, name in enumerate(ACTIONS)}
+ACTION_MOVE, ACTION_PRESS, ACTION_RELEASE, ACTION_SCROLL = range(len(ACTIONS))
+
+# Versão do esquema JSON das gravações:
+#   1  layout antigo do executor: 'type' = 'move' | 'click' (com 'pressed') | 'scroll'
+#   2  layout do gravador: 'type' = 'mouse', 'action' = 'move' | 'press' | 'release' | 'scroll'
+# Arquivos sem o campo 'version' são normalizados evento a evento.
+SCHEMA_VERSION = 2
+
+# Flags do cabeçalho
+FLAG_SORTED = 0x1  # time_offset já está em ordem não decrescente
+
+# Tipos das colunas, na ordem em que aparecem no arquivo:
+# time_offset, x, y, ação, botão, dx, dy
+COLUMN_TYPES = ('d', 'i', 'i', 'B', 'B', 'i', 'i')
+
+_HEADER = struct.Struct('<4sHHIId')
+_NEEDS_SWAP = sys.byteorder != 'little'
+
+
+def is_mrec(path):
+    """Indica se o arquivo é .mrec (pela extensão ou pelo magic)."""
+    if path.lower().endswith(EXTENSION):
+        return True
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def pack_header(flags, count, n_scroll, total_duration, button_names):
+    """Monta o cabeçalho e a tabela de botões; as colunas vêm logo em seguida."""
+    return _HEADER.pack(MAGIC, VERSION, flags, count, n_scroll, total_duration) + pack_buttons(button_names)
+
+
+def pack_buttons(button_names):
+    """Tabela de botões: n_botoes u16 + (tamanho u8, nome utf-8) por botão."""
+    parts = [struct.pack('<H', len(button_names))]
+    for name in button_names:
+        raw = name.encode('utf-8')
+        parts.append(struct.pack('<B', len(raw)) + raw)
+    return b''.join(parts)
+
+
+def unpack_buttons(buf, offset):
+    """Lê a tabela de botões; devolve ([None] + nomes, offset seguinte)."""
+    (n_buttons,) = struct.unpack_from('<H', buf, offset)
+    offset += 2
+    button_names = [None]
+    for _ in range(n_buttons):
+        size = buf[offset]
+        button_names.append(bytes(buf[offset + 1:offset + 1 + size]).decode('utf-8'))
+        offset += 1 + size
+    return button_names, offset
+
+
+def column_bytes(typecode, values=()):
+    col = array(typecode, values)
+    if _NEEDS_SWAP:
+        col.byteswap()
+    return col.tobytes()
+
+
+def read_column(buf, offset, typecode, count):
+    col = array(typecode)
+    size = col.itemsize * count
+    col.frombytes(buf[offset:offset + size])
+    if _NEEDS_SWAP:
+        col.byteswap()
+    return col, offset + size
+
+
+def encode_track(track, total_duration):
+    """Codifica uma EventTrack em bytes .mrec."""
+    start, stop = track.bounds()
+    times = track.times[start:stop]
+    actions = track.actions[start:stop]
+    flags = FLAG_SORTED if all(times[i] <= times[i + 1] for i in range(len(times) - 1)) else 0
+    scroll = [i for i in range(start, stop) if track.actions[i] == ACTION_SCROLL]
+    dxs = array('i', (track.dxs[i] for i in scroll))
+    dys = array('i', (track.dys[i] for i in scroll))
+    columns = (times, track.xs[start:stop], track.ys[start:stop], actions, track.buttons[start:stop], dxs, dys)
+    parts = [pack_header(flags, len(times), len(scroll), float(total_duration), track.button_names[1:])]
+    for typecode, col in zip(COLUMN_TYPES, columns):
+        parts.append(column_bytes(typecode, col))
+    return b''.join(parts)
+
+
+def decode_track(buf):
+    """Decodifica bytes .mrec em (EventTrack, total_duration, flags) sem criar dicionários."""
+    buf = memoryview(buf)
+    if len(buf) < _HEADER.size:
+        raise ValueError("Arquivo .mrec truncado (cabeçalho incompleto).")
+    magic, version, flags, count, n_scroll, total_duration = _HEADER.unpack_from(buf, 0)
+    if magic != MAGIC:
+        raise ValueError("Arquivo não é .mrec (magic inválido).")
+    if version > VERSION:
+        raise ValueError(f"Versão .mrec {version} não suportada (máxima: {VERSION}).")
+    button_names, offset = unpack_buttons(buf, _HEADER.size)
+
+    times, offset = read_column(buf, offset, 'd', count)
+    xs, offset = read_column(buf, offset, 'i', count)
+    ys, offset = read_column(buf, offset, 'i', count)
+    actions, offset = read_column(buf, offset, 'B', count)
+    buttons, offset = read_column(buf, offset, 'B', count)
+    scroll_dxs, offset = read_column(buf, offset, 'i', n_scroll)
+    scroll_dys, offset = read_column(buf, offset, 'i', n_scroll)
+    if len(scroll_dys) != n_scroll:
+        raise ValueError("Arquivo .mrec truncado (colunas incompletas).")
+
+    # Na trilha dx/dy são densos; só as posições de scroll recebem valores.
+    dxs = array('i', bytes(4 * count))
+    dys = array('i', bytes(4 * count))
+    if n_scroll:
+        scroll = [i for i in range(count) if actions[i] == ACTION_SCROLL]
+        for j, i in enumerate(scroll):
+            dxs[i] = scroll_dxs[j]
+            dys[i] = scroll_dys[j]
+    track = event_track.EventTrack.from_columns(times, xs, ys, actions, buttons, dxs, dys, button_names)
+    return track, total_duration, flags
+
+
+def encode(data):
+    """Codifica um dicionário {'total_duration', 'events'} em bytes .mrec."""
+    track = event_track.EventTrack.from_events(data.get('events', []))
+    return encode_track(track, data.get('total_duration', 0.0))
+
+
+def decode(buf):
+    """Decodifica bytes .mrec no mesmo dicionário que o JSON do gravador produziria."""
+    track, total_duration, _ = decode_track(buf)
+    return {'total_duration': total_duration, 'events': track.to_events()}
+
+
+def write(path, data):
+    with open(path, 'wb') as f:
+        f.write(encode(data))
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return decode(f.read())
+
+
+# --- Esquema JSON ---
+def check_schema_version(version):
+    if version is not None and (type(version) is not int or version > SCHEMA_VERSION):
+        raise ValueError(f"Versão de esquema {version!r} não suportada (máxima: {SCHEMA_VERSION}).")
+
+
+def event_dict(action, button, x, y, dx, dy, time_offset):
+    """Evento no layout de dicionário do gravador; `button` é o nome do botão (ou None).
+
+    Único lugar que monta esse layout: usado por EventTrack.event_dict e
+    pelo leitor de segmentos (journal.JournalReader.iter_events)."""
+    name = ACTIONS[action]
+    if action == ACTION_MOVE:
+        return {'type': 'mouse', 'action': name, 'x': x, 'y': y, 'time_offset': time_offset}
+    if action == ACTION_SCROLL:
+        return {'type': 'mouse', 'action': name, 'x': x, 'y': y, 'dx': dx, 'dy': dy, 'time_offset': time_offset}
+    event = {'type': 'mouse', 'action': name}
+    if button:
+        event['button'] = button
+    event.update({'x': x, 'y': y, 'time_offset': time_offset})
+    return event
+
+
+def normalize_event(event):
+    """Evento no layout atual (versão 2), aceitando também o layout antigo do executor."""
+    if not isinstance(event, dict):
+        raise ValueError(f"Evento inválido (esperado um objeto): {event!r}")
+    action = event.get('action')
+    if action is not None:
+        if action not in ACTION_CODES:
+            raise ValueError(f"Ação desconhecida no evento: {event!r}")
+        return event
+    try:
+        return _normalize_legacy(event)
+    except KeyError as e:
+        raise ValueError(f"Evento sem o campo {e}: {event!r}") from None
+
+
+def _normalize_legacy(event):
+    kind = event.get('type')
+    if kind == 'move':
+        return {'type': 'mouse', 'action': 'move', 'x': event['x'], 'y': event['y'], 'time_offset': event['time_offset']}
+    if kind == 'click':
+        return {'type': 'mouse', 'action': 'press' if event['pressed'] else 'release', 'button': event['button'],
+                'x': event['x'], 'y': event['y'], 'time_offset': event['time_offset']}
+    if kind == 'scroll':
+        return {'type': 'mouse', 'action': 'scroll', 'x': event['x'], 'y': event['y'],
+                'dx': event['dx'], 'dy': event['dy'], 'time_offset': event['time_offset']}
+    raise ValueError(f"Evento em layout desconhecido: {event!r}")
+
+
+# --- Funções usadas pelas duas ferramentas ---
+def load_recording(path):
+    """Lê uma gravação em JSON, .mrec ou .mref e devolve {'version', 'total_duration', 'events'}."""
+    import store  # store importa este módulo
+    if is_mrec(path):
+        data = read(path)
+    elif store.is_manifest(path):
+        track, total_duration = store.load_track(path)
+        data = {'total_duration': total_duration, 'events': track.to_events()}
+    else:
+        with open(path, 'r') as f:
+            data = json.load(f)
+        check_schema_version(data.get('version'))
+        data['events'] = [normalize_event(event) for event in data.get('events', [])]
+    return {'version': SCHEMA_VERSION, 'total_duration': data.get('total_duration', 0.0), 'events': data['events']}
+
+
+def save_recording(path, data):
+    """Salva a gravação no formato indicado pela extensão do arquivo."""
+    import store
+    if path.lower().endswith(EXTENSION):
+        write(path, data)
+    elif path.lower().endswith(store.EXTENSION):
+        track = event_track.EventTrack.from_events(data.get('events', []))
+        store.save_track(path, track, data.get('total_duration', 0.0))
+    else:
+        with open(path, 'w') as f:
+            dump_json_stream(f, data.get('total_duration', 0.0), data.get('events', []))
+
+
+def dump_json_stream(f, total_duration, events):
+    """Escreve o JSON da gravação evento a evento (mesma saída de json.dump(indent=4))."""
+    f.write('{\n    "version": %d,\n    "total_duration": %s,\n    "events": [' % (SCHEMA_VERSION, json.dumps(total_duration)))
+    first = True
+    for event in events:
+        body = json.dumps(event, indent=4).replace('\n', '\n        ')
+        f.write(('\n        ' if first else ',\n        ') + body)
+        first = False
+    f.write(']\n}' if first else '\n    ]\n}')
+
+
+def convert(src, dst):
+    """Converte entre JSON, .mrec e .mref (o formato de destino é dado pela extensão)."""
+    data = load_recording(src)
+    save_recording(dst, data)
+    return len(data.get('events', []))
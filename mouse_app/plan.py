@@ -0,0 +1,159 @@
+"""Compiled playback plans and their on-disk cache.
+
+compile_plan() reduces a recording to what the playback loop needs:
+
+    - events sorted by time_offset, i.e. absolute deadlines before --speed and
+      --max-gap retiming
+    - one integer opcode per event (backends.OP_*). OP_POSITION is set on a
+      click or scroll that must move the pointer first; one at the position
+      of the previous event skips that move (unless the player dropped the
+      previous move, see MouseExecutor._play)
+    - consecutive scrolls at the same position less than SCROLL_MERGE_WINDOW
+      apart merged into one call with the summed deltas
+    - a button-state table: after every press or release, the plan index and
+      the set of buttons then held (a bitmask over button codes 1..63), so
+      the buttons held at any point are one bisect away (see segment.py)
+
+Button names stay in the track's table and are resolved once per backend by
+the executor.
+
+load_plan() keeps compiled plans in PLAN_CACHE_DIR, one file per recording
+path. A cached plan is used only while the recording's mtime and size match
+the ones it was compiled from; otherwise it is compiled again and replaced.
+Plan file layout: header (magic 'MPLN', version u16, mtime_ns i64, size i64,
+n_ops u32, n_states u32), opcodes u8[n_ops], button-state indexes u32[n_states]
+and masks u64[n_states], then the plan's track as .mrec bytes.
+"""
+import hashlib
+import os
+import struct
+from array import array
+
+import loader
+import mrec
+from backends import OP_POSITION, OP_SCROLL
+
+PLAN_MAGIC = b'MPLN'
+PLAN_VERSION = 2
+PLAN_CACHE_DIR = os.environ.get('MOUSE_PLAN_CACHE') or os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'mouse_app', 'plans')
+SCROLL_MERGE_WINDOW = 0.015  # seconds; scrolls closer than this are sent as one
+MAX_TRACKED_BUTTON = 63      # highest button code kept in the button-state masks
+
+_PLAN_HEADER = struct.Struct('<4sHqqII')
+
+
+class PlaybackPlan:
+    __slots__ = ('track', 'ops', 'total_duration', 'state_indexes', 'state_masks')
+
+    def __init__(self, track, ops, total_duration, state_indexes=None, state_masks=None):
+        self.track = track
+        self.ops = ops
+        self.total_duration = total_duration
+        # Button-state table: held buttons (mask) after the press/release at each index
+        self.state_indexes = array('I') if state_indexes is None else state_indexes
+        self.state_masks = array('Q') if state_masks is None else state_masks
+
+    def __len__(self):
+        return len(self.ops)
+
+
+def compile_plan(track, total_duration, presorted=False):
+    """PlaybackPlan for an EventTrack (see the module docstring)."""
+    if not presorted and not track.is_sorted():
+        track = track.sorted()
+    start, stop = track.bounds()
+    times, xs, ys, actions, codes, dxs, dys = (
+        track.times, track.xs, track.ys, track.actions, track.buttons, track.dxs, track.dys)
+    out = track.empty_like()
+    out_times, out_xs, out_ys, out_dxs, out_dys = out.times, out.xs, out.ys, out.dxs, out.dys
+    append = out.append
+    ops = array('B')
+    state_indexes, state_masks = array('I'), array('Q')
+    held = 0
+    last_x = last_y = None
+    for i in range(start, stop):
+        action = actions[i]
+        x, y, t = xs[i], ys[i], times[i]
+        if action == mrec.ACTION_SCROLL and ops:
+            j = len(ops) - 1
+            if (ops[j] & ~OP_POSITION == OP_SCROLL and out_xs[j] == x and out_ys[j] == y
+                    and t - out_times[j] < SCROLL_MERGE_WINDOW):
+                out_dxs[j] += dxs[i]
+                out_dys[j] += dys[i]
+                continue
+        op = action
+        if action != mrec.ACTION_MOVE:
+            if x != last_x or y != last_y:
+                op |= OP_POSITION
+            code = codes[i]
+            if action != mrec.ACTION_SCROLL and 0 < code <= MAX_TRACKED_BUTTON:
+                held = held | (1 << code) if action == mrec.ACTION_PRESS else held & ~(1 << code)
+                state_indexes.append(len(ops))
+                state_masks.append(held)
+        ops.append(op)
+        append(t, action, codes[i], x, y, dxs[i], dys[i])
+        last_x, last_y = x, y
+    return PlaybackPlan(out, ops, max(total_duration, out_times[-1] if ops else 0.0), state_indexes, state_masks)
+
+
+def cache_path(path, cache_dir=None):
+    key = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir or PLAN_CACHE_DIR, key + '.plan')
+
+
+def encode_plan(plan, stat):
+    header = _PLAN_HEADER.pack(PLAN_MAGIC, PLAN_VERSION, stat.st_mtime_ns, stat.st_size, len(plan.ops),
+                               len(plan.state_indexes))
+    return b''.join((header, mrec.column_bytes('B', plan.ops), mrec.column_bytes('I', plan.state_indexes),
+                     mrec.column_bytes('Q', plan.state_masks), mrec.encode_track(plan.track, plan.total_duration)))
+
+
+def decode_plan(buf, stat):
+    """PlaybackPlan from plan bytes, or None if they were compiled from another version of the file."""
+    buf = memoryview(buf)
+    if len(buf) < _PLAN_HEADER.size:
+        return None
+    magic, version, mtime_ns, size, count, n_states = _PLAN_HEADER.unpack_from(buf, 0)
+    if (magic, version, mtime_ns, size) != (PLAN_MAGIC, PLAN_VERSION, stat.st_mtime_ns, stat.st_size):
+        return None
+    ops, offset = mrec.read_column(buf, _PLAN_HEADER.size, 'B', count)
+    state_indexes, offset = mrec.read_column(buf, offset, 'I', n_states)
+    state_masks, offset = mrec.read_column(buf, offset, 'Q', n_states)
+    track, total_duration, _ = mrec.decode_track(buf[offset:])
+    if len(ops) != count or len(track) != count or len(state_masks) != n_states:
+        return None
+    return PlaybackPlan(track, ops, total_duration, state_indexes, state_masks)
+
+
+def cached_plan(path, stat, cache_dir=None):
+    """The cached plan of `path` if it was compiled from the file described by `stat`, else None."""
+    try:
+        with open(cache_path(path, cache_dir), 'rb') as f:
+            return decode_plan(f.read(), stat)
+    except (OSError, ValueError, struct.error):
+        return None  # missing or damaged: compiled again
+
+
+def store_plan(path, stat, plan, cache_dir=None):
+    cache_file = cache_path(path, cache_dir)
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'wb') as f:
+            f.write(encode_plan(plan, stat))
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        pass  # an unwritable cache only costs compiling again next time
+
+
+def load_plan(path, cache_dir=None):
+    """Compiled plan of a recording, from the cache when it is still valid."""
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    plan = cached_plan(path, stat, cache_dir)
+    if plan is None:
+        track, total_duration = loader.load_track(path)
+        plan = compile_plan(track, total_duration, presorted=True)
+        store_plan(path, stat, plan, cache_dir)
+    return plan
@@ -0,0 +1,198 @@
+"""Per-event playback instrumentation and its exports.
+
+PlaybackTrace keeps, for every dispatched event, its scheduled time, the time
+the player started injecting it and the time the backend call returned, in
+columns preallocated for `capacity` events. Recording is a few array stores
+per event; once the buffer is full further events are only counted in
+`dropped`. With no trace the player skips all of it.
+
+After the run:
+
+    summary()             lateness and injection-time percentiles, a lateness
+                          histogram, throughput and stall spans (runs of events
+                          dispatched later than `stall_threshold`)
+    write_chrome_trace()  Chrome trace-event JSON (chrome://tracing, Perfetto):
+                          one slice per injection, a lateness counter and the
+                          stall spans on their own track
+
+Times are perf_counter() seconds; exports are relative to the trace start.
+"""
+import json
+from array import array
+
+from backends import OP_POSITION
+import mrec
+
+DEFAULT_CAPACITY = 1 << 20   # events traced when the run's size is not known up front
+STALL_THRESHOLD = 0.005      # seconds late from which an event counts as stalled
+MAX_STALLS = 1000            # stall spans kept in the summary
+# Upper edges of the lateness histogram buckets, in milliseconds
+HISTOGRAM_EDGES_MS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 50.0, 100.0)
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, int(round(p / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def _distribution_ms(values):
+    values = sorted(values)
+    return {
+        'p50': percentile(values, 50) * 1e3,
+        'p90': percentile(values, 90) * 1e3,
+        'p99': percentile(values, 99) * 1e3,
+        'max': values[-1] * 1e3 if values else 0.0,
+        'mean': sum(values) / len(values) * 1e3 if values else 0.0,
+    }
+
+
+class PlaybackTrace:
+    def __init__(self, capacity=DEFAULT_CAPACITY, stall_threshold=STALL_THRESHOLD):
+        self.capacity = capacity
+        self.stall_threshold = stall_threshold
+        zeros_d = bytes(8 * capacity)
+        self.scheduled = array('d', zeros_d)
+        self.dispatched = array('d', zeros_d)
+        self.returned = array('d', zeros_d)
+        self.indexes = array('q', zeros_d)   # event index within its recording
+        self.ops = array('B', bytes(capacity))
+        self.files = []     # recording paths, in order of first use
+        self.segments = []  # (first traced event, index into files), one per begin()
+        self.count = 0
+        self.dropped = 0
+        self.origin = None  # perf_counter() of the first scheduler start
+
+    def begin(self, recording_file, origin):
+        """Events recorded from now on belong to `recording_file`."""
+        if self.origin is None:
+            self.origin = origin
+        if recording_file not in self.files:
+            self.files.append(recording_file)
+        self.segments.append((self.count, self.files.index(recording_file)))
+
+    def record(self, index, op, scheduled, dispatched, returned):
+        n = self.count
+        if n >= self.capacity:
+            self.dropped += 1
+            return
+        self.scheduled[n] = scheduled
+        self.dispatched[n] = dispatched
+        self.returned[n] = returned
+        self.indexes[n] = index
+        self.ops[n] = op
+        self.count = n + 1
+
+    def recordings(self):
+        """Index into `files` of every traced event."""
+        column = array('H')
+        bounds = self.segments[1:] + [(self.count, None)]
+        for (first, file_index), (stop, _) in zip(self.segments, bounds):
+            column.extend(array('H', [file_index]) * (stop - first))
+        return column
+
+    # --- Analysis ---
+    def lateness(self):
+        n = self.count
+        return [d - s for d, s in zip(self.dispatched[:n], self.scheduled[:n])]
+
+    def stalls(self, lateness=None):
+        """Spans of consecutive events at least stall_threshold late:
+        [{'start_s', 'end_s', 'events', 'first_event', 'file', 'max_lateness_ms'}]."""
+        lateness = self.lateness() if lateness is None else lateness
+        recordings = self.recordings()
+        threshold = self.stall_threshold
+        spans = []
+        first = None
+        for i, late in enumerate(lateness):
+            if late >= threshold:
+                if first is None:
+                    first = i
+            elif first is not None:
+                spans.append(self._span(first, i, lateness, recordings))
+                first = None
+        if first is not None:
+            spans.append(self._span(first, len(lateness), lateness, recordings))
+        return spans
+
+    def _span(self, first, stop, lateness, recordings):
+        origin = self.origin
+        return {
+            'start_s': self.scheduled[first] - origin,
+            'end_s': self.returned[stop - 1] - origin,
+            'events': stop - first,
+            'first_event': self.indexes[first],
+            'file': self.files[recordings[first]],
+            'max_lateness_ms': max(lateness[first:stop]) * 1e3,
+        }
+
+    def summary(self):
+        n = self.count
+        lateness = self.lateness()
+        injection = [r - d for r, d in zip(self.returned[:n], self.dispatched[:n])]
+        histogram = [0] * (len(HISTOGRAM_EDGES_MS) + 1)
+        edges = [edge / 1e3 for edge in HISTOGRAM_EDGES_MS]
+        for late in lateness:
+            bucket = 0
+            while bucket < len(edges) and late >= edges[bucket]:
+                bucket += 1
+            histogram[bucket] += 1
+        labels = [f"<{edge}ms" for edge in HISTOGRAM_EDGES_MS] + [f">={HISTOGRAM_EDGES_MS[-1]}ms"]
+        span = self.returned[n - 1] - self.dispatched[0] if n else 0.0
+        stalls = self.stalls(lateness)
+        return {
+            'events': n,
+            'dropped': self.dropped,
+            'files': self.files,
+            'duration_s': span,
+            'events_per_s': n / span if span > 0 else 0.0,
+            'lateness_ms': _distribution_ms(lateness),
+            'lateness_histogram': dict(zip(labels, histogram)),
+            'injection_ms': _distribution_ms(injection),
+            'stall_threshold_ms': self.stall_threshold * 1e3,
+            'stall_count': len(stalls),
+            'stalled_events': sum(stall['events'] for stall in stalls),
+            'stalls': sorted(stalls, key=lambda s: s['max_lateness_ms'], reverse=True)[:MAX_STALLS],
+        }
+
+    # --- Exports ---
+    def write_summary(self, path):
+        summary = self.summary()
+        with open(path, 'w') as f:
+            json.dump(summary, f, indent=4)
+        return summary
+
+    def write_chrome_trace(self, path):
+        """Chrome trace-event file; events are written one by one, not built in memory."""
+        origin = self.origin or 0.0
+        recordings = self.recordings()
+        with open(path, 'w') as f:
+            f.write('{"displayTimeUnit": "ms", "traceEvents": [\n')
+            f.write(json.dumps({'ph': 'M', 'pid': 1, 'tid': 1, 'name': 'thread_name', 'args': {'name': 'injection'}}))
+            f.write(',\n' + json.dumps({'ph': 'M', 'pid': 1, 'tid': 2, 'name': 'thread_name', 'args': {'name': 'stalls'}}))
+            for i in range(self.count):
+                op = self.ops[i]
+                name = mrec.ACTIONS[op & ~OP_POSITION]
+                ts = (self.dispatched[i] - origin) * 1e6
+                late_ms = (self.dispatched[i] - self.scheduled[i]) * 1e3
+                f.write(',\n{"ph":"X","pid":1,"tid":1,"name":"%s","ts":%.3f,"dur":%.3f,'
+                        '"args":{"event":%d,"file":%d,"lateness_ms":%.4f,"positioned":%s}}'
+                        % (name, ts, (self.returned[i] - self.dispatched[i]) * 1e6, self.indexes[i],
+                           recordings[i], late_ms, 'true' if op & OP_POSITION else 'false'))
+                f.write(',\n{"ph":"C","pid":1,"name":"lateness_ms","ts":%.3f,"args":{"lateness_ms":%.4f}}'
+                        % (ts, late_ms))
+            for stall in self.stalls():
+                f.write(',\n' + json.dumps({
+                    'ph': 'X', 'pid': 1, 'tid': 2, 'name': 'stall', 'ts': stall['start_s'] * 1e6,
+                    'dur': (stall['end_s'] - stall['start_s']) * 1e6,
+                    'args': {'events': stall['events'], 'first_event': stall['first_event'],
+                             'max_lateness_ms': stall['max_lateness_ms']}}))
+            f.write('\n], "otherData": %s}\n' % json.dumps({'files': self.files}))
+
+    def export(self, prefix):
+        """Write `<prefix>.metrics.json` and `<prefix>.trace.json`; returns (summary, paths)."""
+        paths = prefix + '.metrics.json', prefix + '.trace.json'
+        summary = self.write_summary(paths[0])
+        self.write_chrome_trace(paths[1])
+        return summary, paths
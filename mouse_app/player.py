@@ -0,0 +1,562 @@
+"""Playback: MouseExecutor, playlists and the long-lived playback daemon.
+
+Kept apart from the mouse_executor.py command line so that commands which
+only talk to a running daemon (stop, pause, status, ...) start without
+importing the loaders, plans and output backends.
+"""
+import itertools
+import json
+import os
+import signal
+import threading
+import time
+
+import loader
+from backends import DEFAULT_BACKEND, OP_MOVE, OP_POSITION, OP_PRESS, OP_SCROLL, create_backend
+from control import PAUSED, PLAYING, STOPPED, PlaybackControl
+from control_server import ControlServer
+from plan import cached_plan, compile_plan, load_plan, store_plan
+from scheduler import DeadlineScheduler, DEFAULT_POLICY, POLICIES, retime
+from segment import SegmentError, resolve_segment
+from playback_trace import DEFAULT_CAPACITY as DEFAULT_TRACE_CAPACITY, PlaybackTrace
+
+EXECUTOR_PID_FILE = "executor.pid"
+
+
+class MouseExecutor:
+    def __init__(self, recording_file, lag_policy=DEFAULT_POLICY, speed=1.0, max_gap=None, backend=DEFAULT_BACKEND,
+                 control=None, start=None, end=None):
+        self.recording_file = recording_file
+        self.lag_policy = lag_policy
+        self.speed = speed
+        self.max_gap = max_gap
+        # --start/--end: recorded seconds or marker names (see segment.py); None plays it all
+        self.start = start
+        self.end = end
+        self.segment = None
+        self.track = None
+        self.ops = []        # plan opcodes (backends.OP_*), one per event of self.track
+        self.buttons = []
+        self.deadlines = []
+        self.total_duration = 0.0
+        # Either a backend name from backends.BACKENDS or a ready OutputBackend instance
+        self.backend = create_backend(backend) if isinstance(backend, str) else backend
+        self.scheduler = None
+        self.trace = None    # playback_trace.PlaybackTrace filled while playing, if instrumentation is on
+        self.trace_prefix = None  # when set, a trace is recorded and exported to <prefix>.*.json
+        self.stream = None   # loader.TrackStream while a large JSON file is still being parsed
+        self._stream_stat = None
+        # Stop/pause requests from another thread (see control.PlaybackControl)
+        self.control = control if control is not None else PlaybackControl()
+
+    def load(self):
+        """Load the recording; returns False if it has no events.
+
+        Raises FileNotFoundError or ValueError (see load_error_message).
+        """
+        # Compiled once per version of the file and cached on disk (see plan.py).
+        path = os.path.abspath(self.recording_file)
+        stat = os.stat(path)
+        plan = cached_plan(path, stat)
+        if plan is None:
+            seeking = self.start is not None or self.end is not None
+            if loader.recording_format(path) == 'json' and stat.st_size >= loader.STREAM_MIN_BYTES and not seeking:
+                # Large JSON seen for the first time: start playing while the rest
+                # of the file is parsed; the plan is compiled once playback ends.
+                self._stream_stat = stat
+                self.stream = loader.TrackStream(self.recording_file, self.speed, self.max_gap).start()
+                self.track = self.stream.track
+                self.ops = self.stream.ops
+                self.deadlines = self.stream.deadlines
+                self.buttons = []
+                return True
+            track, total_duration = loader.load_track(path)
+            plan = compile_plan(track, total_duration, presorted=True)
+            store_plan(path, stat, plan)
+        return self.prepare_plan(plan)
+
+    def prepare_track(self, track, total_duration, presorted=False):
+        """Get an EventTrack ready to play; returns False if it has no events."""
+        return self.prepare_plan(compile_plan(track, total_duration, presorted))
+
+    def prepare_plan(self, plan):
+        """Get a compiled plan ready to play; returns False if it has no events."""
+        track = self.track = plan.track
+        self.ops = plan.ops
+        self.buttons = self._resolve_buttons(track.button_names)
+        # Speed and idle-gap clamping are applied once here, so the playback
+        # loop only reads precomputed deadlines.
+        self.deadlines, self.total_duration = retime(track.times, plan.total_duration, self.speed, self.max_gap)
+        if self.start is not None or self.end is not None:
+            # Raises SegmentError (a ValueError) for an unknown marker or an empty range
+            segment = self.segment = resolve_segment(self.recording_file, plan, self.deadlines, self.start, self.end,
+                                                     self.speed, self.max_gap)
+            self.total_duration = segment.duration
+        return len(track) > 0
+
+    def _resolve_buttons(self, button_names):
+        """Map the track's button codes to backend buttons once, before playback."""
+        buttons = []
+        for name in button_names:
+            button = None
+            if name is not None:
+                button = self.backend.resolve_button(name)
+                if button is None:
+                    print(f"Warning: Unknown button type {name} in recording. Its clicks will be skipped.")
+            buttons.append(button)
+        return buttons
+
+    def _available(self, start):
+        """Number of playable events; while streaming, waits for events past `start`."""
+        stream = self.stream
+        if stream is None:
+            return len(self.track)
+        available = stream.wait_for(start)
+        names = self.track.button_names
+        if len(self.buttons) < len(names):
+            self.buttons.extend(self._resolve_buttons(names[len(self.buttons):]))
+        if stream.done and stream.total_duration is not None:
+            self.total_duration = stream.total_duration
+        return available
+
+    def _wait_through_pause(self, offset):
+        """Called when the scheduler gave up on a wait: keeps waiting for `offset`
+        across pauses. False means the event is dropped (skip policy or stop)."""
+        control, scheduler = self.control, self.scheduler
+        while control.state == PAUSED:
+            scheduler.postpone(control.wait_while_paused())
+            if control.state == PLAYING and scheduler.wait(offset, cancelled=control.interrupted):
+                return True
+        return False
+
+    def _execute_events(self):
+        control = self.control
+        try:
+            if self.track is None and not self.load():
+                print(f"No events found in {self.recording_file}")
+                return
+            end = self._available(0)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"Error: {load_error_message(self.recording_file, e)}")
+            return
+        if not end:
+            print(f"No events found in {self.recording_file}")
+            return
+
+        segment = self.segment
+        span = f" from {segment.start:.3f}s to {segment.end:.3f}s" if segment is not None else ""
+        print(f"Starting execution of {self.recording_file}{span}...")
+
+        # Each event fires at an absolute deadline (playback start + time_offset)
+        # on a monotonic clock, so injection overhead never accumulates as drift.
+        if self.trace_prefix:
+            self.trace = PlaybackTrace(end if self.stream is None else DEFAULT_TRACE_CAPACITY)
+        scheduler = self.scheduler = DeadlineScheduler(self.lag_policy, wakeup=control.wakeup)
+        scheduler.start()
+        self._play(end)
+        # Hold until the recording's own end so the run lasts total_duration.
+        self._hold(self.total_duration)
+        stream = self.stream
+        if stream is not None and stream.done and stream.error is None:
+            store_plan(os.path.abspath(self.recording_file), self._stream_stat,
+                       compile_plan(self.track, stream.recorded_duration))
+        if control.state != STOPPED:
+            print(f"Execution finished in {scheduler.elapsed():.3f}s (scheduled: {self.total_duration:.3f}s, "
+                  f"max lateness: {scheduler.max_lateness * 1000:.2f}ms, skipped moves: {scheduler.skipped}).")
+        else:
+            print("Execution stopped by user.")
+        if self.trace_prefix:
+            export_trace(self.trace, self.trace_prefix)
+
+    def _hold(self, offset):
+        """Wait, through pauses, for `offset` on the timeline unless stopped."""
+        control = self.control
+        if control.state != STOPPED and not self.scheduler.wait(offset, cancelled=control.interrupted):
+            self._wait_through_pause(offset)
+
+    def _enter_segment(self, segment):
+        """Put the pointer and buttons where the recording has them at the segment start."""
+        backend, buttons = self.backend, self.buttons
+        if segment.position is not None:
+            backend.move(*segment.position)
+        for code in segment.held:
+            if buttons[code] is not None:
+                backend.press(buttons[code])
+
+    def _leave_segment(self, segment):
+        """Release the buttons the recording still holds where the segment ends."""
+        for code in segment.held_at_end:
+            if self.buttons[code] is not None:
+                self.backend.release(self.buttons[code])
+        self.backend.flush()
+
+    def _play(self, end):
+        """Play the loaded events on the already started self.scheduler."""
+        control = self.control
+        scheduler = self.scheduler
+        interrupted = control.interrupted
+        track = self.track
+        xs, ys, codes, dxs, dys = track.xs, track.ys, track.buttons, track.dxs, track.dys
+        ops = self.ops
+        buttons = self.buttons
+        deadlines = self.deadlines
+        backend = self.backend
+        move, press, release, scroll = backend.move, backend.press, backend.release, backend.scroll
+        # A batching backend gets every event due within one tick of the first
+        # as one batch: only that first event is waited for, and the batch is
+        # flushed before the next wait
+        idle = backend.flush if backend.batched else None
+        tick = backend.tick if backend.batched else 0.0
+        tick_end = float('-inf')
+        # False once the skip policy drops a move: the pointer is not where the
+        # plan expects, so the next click or scroll moves it first
+        pointer_in_place = True
+        trace = self.trace
+        tracing = trace is not None
+        if tracing:
+            trace.begin(self.recording_file, scheduler.origin)
+            record, clock = trace.record, scheduler.clock
+
+        # Plays [start, end) and then asks for more; only a streamed recording
+        # has more than one batch.
+        start = 0
+        segment = self.segment
+        if segment is not None:
+            # The segment's timeline starts at its own start, not the recording's
+            start, end = segment.first, segment.stop
+            scheduler.advance(-segment.base)
+            self._enter_segment(segment)
+        while start < end and control.state != STOPPED:
+            last_index = end - 1
+            for i in range(start, end):
+                if control.state != PLAYING:
+                    if control.state == PAUSED:
+                        scheduler.postpone(control.wait_while_paused())
+                    if control.state == STOPPED:
+                        break
+
+                op = ops[i]
+                is_move = op == OP_MOVE
+                next_offset = deadlines[i + 1] if i < last_index else None
+                if tracing:
+                    scheduled = scheduler.origin + scheduler.shift + deadlines[i]
+                if deadlines[i] > tick_end:
+                    if not scheduler.wait(deadlines[i], next_offset, is_move, interrupted, idle):
+                        if not self._wait_through_pause(deadlines[i]):
+                            if is_move:
+                                pointer_in_place = False
+                            continue
+                        if tracing:  # resumed after a pause: measure against the postponed deadline
+                            scheduled = scheduler.origin + scheduler.shift + deadlines[i]
+                    if tick:
+                        tick_end = deadlines[i] + tick
+                if tracing:
+                    dispatched = clock()
+
+                if is_move:
+                    move(xs[i], ys[i])
+                else:
+                    action = op
+                    if action & OP_POSITION or not pointer_in_place:
+                        # Clicks and scrolls away from the pointer move it first, so they happen at the recorded location
+                        move(xs[i], ys[i])
+                        action &= ~OP_POSITION
+                        pointer_in_place = True
+                    if action == OP_SCROLL:
+                        scroll(dxs[i], dys[i])
+                    else:
+                        button = buttons[codes[i]]
+                        if button is None:
+                            continue
+                        if action == OP_PRESS:
+                            press(button)
+                        else:
+                            release(button)
+                if tracing:
+                    record(i, op, scheduled, dispatched, clock())
+            backend.flush()
+            start = end
+            if segment is not None:
+                break
+            try:
+                end = self._available(start)
+            except ValueError as e:
+                print(f"Error: Invalid recording file {self.recording_file}: {e}")
+                control.stop()
+        if segment is not None:
+            scheduler.advance(segment.base)
+            if control.state != STOPPED:
+                # Waits for the segment end, so the release happens when it would in the recording
+                self._hold(segment.duration)
+                self._leave_segment(segment)
+
+
+class Playlist:
+    """Several recordings played back to back, `repeat` times, on one timeline.
+
+    Each entry is a MouseExecutor whose recording was decoded and timed once
+    up front, so repeating costs no parsing. All entries share one scheduler:
+    a run starts exactly `delay` seconds after the previous one's
+    total_duration, so runs chain without drift or gaps between them.
+    """
+
+    def __init__(self, executors, repeat=1, delay=0.0):
+        self.executors = executors
+        self.repeat = repeat   # 0 repeats until stopped
+        self.delay = delay
+        self.control = executors[0].control
+        self.current = executors[0]
+        self.run = 0
+        self.scheduler = None
+        self.trace_prefix = None  # see MouseExecutor.trace_prefix; one trace covers the whole playlist
+
+    @property
+    def recording_file(self):
+        return self.current.recording_file
+
+    @property
+    def total_duration(self):
+        return self.current.total_duration
+
+    def _execute_events(self):
+        control = self.control
+        runs = itertools.count() if self.repeat == 0 else range(self.repeat)
+        names = ', '.join(executor.recording_file for executor in self.executors)
+        print(f"Starting playlist of {len(self.executors)} recording(s), "
+              f"{'until stopped' if self.repeat == 0 else f'{self.repeat} time(s)'}: {names}")
+
+        trace = None
+        if self.trace_prefix:
+            events = sum(len(executor.track) for executor in self.executors)
+            capacity = DEFAULT_TRACE_CAPACITY if self.repeat == 0 else min(events * self.repeat, DEFAULT_TRACE_CAPACITY)
+            trace = PlaybackTrace(capacity)
+        for executor in self.executors:
+            executor.trace = trace
+        scheduler = self.scheduler = DeadlineScheduler(self.current.lag_policy, wakeup=control.wakeup)
+        scheduler.start()
+        started = scheduler.origin
+        scheduled = 0.0
+        previous = None
+        for self.run in runs:
+            for executor in self.executors:
+                if control.state == STOPPED:
+                    break
+                if previous is not None:
+                    # The next run's offsets count from the end of this one.
+                    scheduler.advance(previous.total_duration + self.delay)
+                    scheduled += previous.total_duration + self.delay
+                executor.scheduler = scheduler
+                self.current = previous = executor
+                executor._play(len(executor.track))
+            if control.state == STOPPED:
+                break
+        if previous is not None:  # None when stopped before the first recording started
+            previous._hold(previous.total_duration)
+        if control.state != STOPPED:
+            scheduled += previous.total_duration
+            print(f"Playlist finished: {self.run + 1} run(s) in {scheduler.clock() - started:.3f}s "
+                  f"(scheduled: {scheduled:.3f}s, max lateness: {scheduler.max_lateness * 1000:.2f}ms, "
+                  f"skipped moves: {scheduler.skipped}).")
+        else:
+            print("Execution stopped by user.")
+        if trace is not None:
+            export_trace(trace, self.trace_prefix)
+
+
+def export_trace(trace, prefix):
+    """Write the trace's metrics and Chrome trace files next to `prefix` and report them."""
+    try:
+        summary, (metrics_path, chrome_path) = trace.export(prefix)
+    except OSError as e:
+        print(f"Error: Could not write playback trace {prefix}: {e}")
+        return
+    lateness = summary['lateness_ms']
+    dropped = f", {trace.dropped} not traced (buffer full)" if trace.dropped else ""
+    print(f"Trace: {trace.count} events, lateness p50 {lateness['p50']:.3f}ms / p99 {lateness['p99']:.3f}ms / "
+          f"max {lateness['max']:.3f}ms{dropped}; written to {metrics_path} and {chrome_path}.")
+
+
+def load_error_message(recording_file, error):
+    if isinstance(error, FileNotFoundError):
+        return f"Recording file {recording_file} not found."
+    if isinstance(error, json.JSONDecodeError):
+        return f"Could not decode JSON from {recording_file}."
+    if isinstance(error, SegmentError):
+        return f"{recording_file}: {error}"
+    return f"Invalid recording file {recording_file}: {error}"
+
+
+class PlaybackDaemon:
+    """Long-lived player driven over the control socket (see control.py).
+
+    Output backends are created once and recordings are decoded once and kept
+    until their file changes, so a play request starts right away. Stop, pause
+    and resume reach the player thread directly through its PlaybackControl.
+    """
+
+    def __init__(self, backend=DEFAULT_BACKEND):
+        self.default_backend = backend
+        self.backends = {}
+        self.recordings = {}   # absolute path -> (mtime_ns, size, compiled plan)
+        self.executor = None
+        self.thread = None
+        self.server = None
+        self._lock = threading.Lock()
+
+    def backend(self, name):
+        backend = self.backends.get(name)
+        if backend is None:
+            backend = self.backends[name] = create_backend(name)
+        return backend
+
+    def preload(self, path):
+        """Compiled plan of a recording, kept in memory until the file changes."""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        cached = self.recordings.get(path)
+        if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+        plan = load_plan(path)
+        self.recordings[path] = (stat.st_mtime_ns, stat.st_size, plan)
+        return plan
+
+    def is_playing(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def dispatch(self, request):
+        command = self.COMMANDS.get(request.get('cmd'))
+        if command is None:
+            return {'ok': False, 'error': f"Unknown command {request.get('cmd')!r}."}
+        with self._lock:
+            return command(self, request)
+
+    # --- Commands ---
+    def play(self, request):
+        if self.is_playing():
+            return {'ok': False, 'error': f"Already playing {self.executor.recording_file}; stop it first."}
+        files = request.get('files') or [request['file']]
+        repeat, delay = int(request.get('repeat', 1)), float(request.get('delay', 0.0))
+        lag_policy = request.get('lag_policy', DEFAULT_POLICY)
+        if lag_policy not in POLICIES:
+            return {'ok': False, 'error': f"Unknown lag policy '{lag_policy}'."}
+        speed, max_gap = float(request.get('speed', 1.0)), request.get('max_gap')
+        if speed <= 0 or (max_gap is not None and max_gap < 0) or repeat < 0 or delay < 0:
+            return {'ok': False, 'error': "speed must be greater than zero; max_gap, repeat and delay not negative."}
+        backend = self.backend(request.get('backend') or self.default_backend)
+        start, end = request.get('start'), request.get('end')
+        control = PlaybackControl()
+        single = len(files) == 1 and repeat == 1
+        executors = []
+        for path in files:
+            executor = MouseExecutor(path, lag_policy, speed, max_gap, backend, control, start, end)
+            try:
+                if (not single or start is not None or end is not None or loader.recording_format(path) != 'json'
+                        or os.path.getsize(path) < loader.STREAM_MIN_BYTES):
+                    has_events = executor.prepare_plan(self.preload(path))
+                else:
+                    has_events = executor.load()  # streamed while playing, not cached
+            except (FileNotFoundError, ValueError) as e:
+                return {'ok': False, 'error': load_error_message(path, e)}
+            if not has_events:
+                return {'ok': False, 'error': f"No events found in {path}"}
+            executors.append(executor)
+        executor = self.executor = executors[0] if single else Playlist(executors, repeat, delay)
+        executor.trace_prefix = request.get('trace')
+        self.thread = threading.Thread(target=executor._execute_events, name='player', daemon=True)
+        self.thread.start()
+        return self.status(request)
+
+    def stop(self, request):
+        if not self.is_playing():
+            return {'ok': False, 'error': "No active execution."}
+        started = time.perf_counter()
+        self.executor.control.stop()
+        self.thread.join()
+        reply = self.status(request)
+        reply['stop_ms'] = (time.perf_counter() - started) * 1000
+        return reply
+
+    def pause(self, request):
+        if not self.is_playing() or not self.executor.control.pause():
+            return {'ok': False, 'error': "Nothing is playing."}
+        return self.status(request)
+
+    def resume(self, request):
+        if not self.is_playing() or not self.executor.control.resume():
+            return {'ok': False, 'error': "Playback is not paused."}
+        return self.status(request)
+
+    def status(self, request=None):
+        reply = {'ok': True, 'pid': os.getpid(), 'preloaded': len(self.recordings)}
+        executor = self.executor
+        if executor is None:
+            reply['state'] = 'idle'
+            return reply
+        if self.is_playing():
+            reply['state'] = executor.control.state
+        else:
+            reply['state'] = STOPPED if executor.control.state == STOPPED else 'finished'
+        reply['file'] = executor.recording_file
+        reply['duration'] = executor.total_duration
+        if isinstance(executor, Playlist):
+            reply['run'] = executor.run + 1
+            reply['repeat'] = executor.repeat
+        scheduler = executor.scheduler
+        if scheduler is not None and scheduler.origin is not None:
+            # Position on the playback timeline: time spent paused does not count.
+            stretched = scheduler.shift - scheduler.postponed
+            reply['position'] = scheduler.elapsed() - stretched - executor.control.paused_time()
+            reply['max_lateness_ms'] = scheduler.max_lateness * 1000
+            reply['skipped'] = scheduler.skipped
+        return reply
+
+    def preload_command(self, request):
+        try:
+            plan = self.preload(request['file'])
+        except (FileNotFoundError, ValueError) as e:
+            return {'ok': False, 'error': load_error_message(request['file'], e)}
+        reply = self.status(request)
+        reply['events'] = len(plan)
+        return reply
+
+    def shutdown(self, request):
+        if self.is_playing():
+            self.executor.control.stop()
+            self.thread.join()
+        reply = self.status(request)
+        reply['shutdown'] = True   # the control server stops once this reply is sent
+        return reply
+
+    COMMANDS = {
+        'play': play,
+        'stop': stop,
+        'pause': pause,
+        'resume': resume,
+        'status': status,
+        'preload': preload_command,
+        'shutdown': shutdown,
+    }
+
+    def serve(self, socket_path, preload=()):
+        for path in preload:
+            print(f"Preloaded {path} ({len(self.preload(path))} events).")
+        self.server = ControlServer(socket_path, self.dispatch)
+        with open(EXECUTOR_PID_FILE, 'w') as f:
+            f.write(str(os.getpid()))
+        # shutdown() must not run on the thread inside serve_forever()
+        signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=self.server.shutdown).start())
+        print(f"Playback daemon listening on {socket_path} (PID: {os.getpid()}).")
+        try:
+            self.server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if self.is_playing():
+                self.executor.control.stop()
+                self.thread.join()
+            self.server.server_close()
+            for backend in self.backends.values():
+                backend.close()
+            if os.path.exists(EXECUTOR_PID_FILE):
+                os.remove(EXECUTOR_PID_FILE)
+            print("Playback daemon stopped.")
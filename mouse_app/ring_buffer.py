@@ -0,0 +1,87 @@
+"""Buffer circular pré-alocado para a captura nos callbacks do pynput.
+
+Um único produtor (o thread do listener) escreve e um único consumidor (o
+thread escritor do segmento) esvazia, sem locks: o produtor só avança `head`
+depois de escrever o slot, e o consumidor só avança `tail` depois de copiar.
+Os callbacks não alocam nada além dos inteiros do evento; o timestamp é o
+perf_counter_ns() bruto, convertido para segundos apenas no consumidor.
+
+Se o consumidor atrasar e o buffer encher, eventos novos são descartados e
+contados em `dropped`.
+"""
+from array import array
+
+from event_track import EventTrack
+
+DEFAULT_CAPACITY = 1 << 16  # ~65 s a 1000 Hz entre descargas
+
+
+class EventRing:
+    def __init__(self, capacity=DEFAULT_CAPACITY, origin_ns=0):
+        if capacity <= 0 or capacity & (capacity - 1):
+            raise ValueError("A capacidade do buffer circular deve ser uma potência de 2.")
+        self.capacity = capacity
+        self.mask = capacity - 1
+        self.origin_ns = origin_ns
+        self.high_water = capacity // 2
+        self.on_high_water = None   # chamado pelo produtor quando o buffer passa da metade
+        self.head = 0               # só o produtor escreve
+        self.tail = 0               # só o consumidor escreve
+        self.dropped = 0
+        self.times = array('q', bytes(8 * capacity))
+        self.xs = array('i', bytes(4 * capacity))
+        self.ys = array('i', bytes(4 * capacity))
+        self.actions = array('B', bytes(capacity))
+        self.buttons = array('B', bytes(capacity))
+        self.dxs = array('i', bytes(4 * capacity))
+        self.dys = array('i', bytes(4 * capacity))
+        self.button_names = [None]
+        self._button_codes = {None: 0}
+
+    # --- Produtor (thread do listener) ---
+    def push(self, t_ns, action, button, x, y, dx=0, dy=0):
+        """Grava um evento; `button` é o nome do botão ou None."""
+        head = self.head
+        if head - self.tail >= self.capacity:
+            self.dropped += 1
+            return False
+        code = self._button_codes.get(button)
+        if code is None:
+            code = len(self.button_names)
+            self.button_names.append(button)
+            self._button_codes[button] = code
+        i = head & self.mask
+        self.times[i] = t_ns
+        self.xs[i] = x
+        self.ys[i] = y
+        self.actions[i] = action
+        self.buttons[i] = code
+        self.dxs[i] = dx
+        self.dys[i] = dy
+        self.head = head + 1
+        if head - self.tail == self.high_water and self.on_high_water is not None:
+            self.on_high_water()
+        return True
+
+    # --- Consumidor (thread escritor) ---
+    def __len__(self):
+        return self.head - self.tail
+
+    def drain(self, track=None):
+        """Move os eventos disponíveis para uma EventTrack (time_offset em segundos)."""
+        if track is None:
+            track = EventTrack()
+        track.button_names = self.button_names
+        track._button_codes = self._button_codes
+        tail = self.tail
+        head = self.head
+        mask = self.mask
+        origin = self.origin_ns
+        times, xs, ys = self.times, self.xs, self.ys
+        actions, buttons, dxs, dys = self.actions, self.buttons, self.dxs, self.dys
+        append = track.append
+        for n in range(tail, head):
+            i = n & mask
+            append((times[i] - origin) / 1e9, actions[i], buttons[i], xs[i], ys[i], dxs[i], dys[i])
+        self.tail = head
+        return track
@@ -0,0 +1,152 @@
+"""Absolute-deadline scheduling for playback on a monotonic clock.
+
+Every event has a fixed deadline (playback start + time_offset), so the time
+spent injecting one event never accumulates as drift in the following ones.
+Waiting sleeps until shortly before the deadline and spins for the rest,
+which keeps dispatch accurate to well under a millisecond.
+
+Policies for when playback falls behind:
+    catchup   fire late events immediately and return to the original timeline
+    skip      drop late moves whose successor is already due
+    stretch   shift the remaining timeline by the lateness, keeping intervals
+"""
+import time
+from array import array
+
+POLICIES = ('catchup', 'skip', 'stretch')
+DEFAULT_POLICY = 'catchup'
+
+SPIN_THRESHOLD = 0.002  # seconds before a deadline spent busy-waiting
+MAX_SLEEP = 0.05        # longest single sleep, so a stop request is noticed quickly
+                        # (without a wakeup event to interrupt the sleep)
+
+
+class Retimer:
+    """Incremental form of retime(), for timelines that arrive while playing."""
+
+    def __init__(self, speed=1.0, max_gap=None):
+        if speed <= 0:
+            raise ValueError("speed must be greater than zero.")
+        self.scale = 1.0 / speed
+        self.max_gap = max_gap
+        self.identity = speed == 1.0 and max_gap is None
+        self.prev_src = 0.0
+        self.prev_dst = 0.0
+
+    def push(self, t):
+        """Playback deadline for the next recorded offset `t`."""
+        if self.identity:
+            self.prev_src = self.prev_dst = t
+            return t
+        gap = (t - self.prev_src) * self.scale
+        if self.max_gap is not None and gap > self.max_gap:
+            gap = self.max_gap
+        self.prev_dst += gap
+        self.prev_src = t
+        return self.prev_dst
+
+    def finish(self, total_duration):
+        """Playback duration for a recording of `total_duration` seconds."""
+        if self.identity:
+            return total_duration
+        tail = max(total_duration - self.prev_src, 0.0) * self.scale
+        if self.max_gap is not None and tail > self.max_gap:
+            tail = self.max_gap
+        return self.prev_dst + tail
+
+
+def retime(offsets, total_duration, speed=1.0, max_gap=None):
+    """Map recorded offsets onto the playback timeline in a single pass.
+
+    Every interval (including the lead-in before the first event and the tail
+    after the last one) is divided by `speed` and then clamped to `max_gap`
+    seconds. Returns (new offsets as array('d'), new total duration).
+    """
+    retimer = Retimer(speed, max_gap)
+    if retimer.identity:
+        return array('d', offsets), total_duration
+    push = retimer.push
+    retimed = array('d', (push(t) for t in offsets))
+    return retimed, retimer.finish(total_duration)
+
+
+class DeadlineScheduler:
+    def __init__(self, policy=DEFAULT_POLICY, spin_threshold=SPIN_THRESHOLD, clock=time.perf_counter, wakeup=None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown lag policy '{policy}' (expected one of: {', '.join(POLICIES)}).")
+        self.policy = policy
+        self.spin_threshold = spin_threshold
+        self.clock = clock
+        # A threading.Event set by whoever cancels the wait: sleeps end as soon
+        # as it is set instead of after up to MAX_SLEEP.
+        self._sleep = time.sleep if wakeup is None else wakeup.wait
+        self.origin = None
+        self.shift = 0.0      # accumulated timeline shift (stretch policy and postpone())
+        self.postponed = 0.0  # the part of `shift` that came from postpone()
+        self.skipped = 0
+        self.max_lateness = 0.0
+
+    def start(self):
+        self.origin = self.clock()
+        self.shift = 0.0
+        self.postponed = 0.0
+        self.skipped = 0
+        self.max_lateness = 0.0
+
+    def deadline(self, offset):
+        return self.origin + self.shift + offset
+
+    def elapsed(self):
+        return self.clock() - self.origin
+
+    def advance(self, seconds):
+        """Move the timeline origin forward, e.g. to the end of a chained run."""
+        self.origin += seconds
+
+    def postpone(self, seconds):
+        """Shift the remaining timeline, e.g. by the time spent paused."""
+        self.shift += seconds
+        self.postponed += seconds
+
+    def wait(self, offset, next_offset=None, skippable=False, cancelled=None, idle=None):
+        """Wait for the deadline of the event at `offset`.
+
+        `idle()` is called once before returning or sleeping: every event due
+        so far has been dispatched, so that is where a batching backend
+        flushes the current tick. It is called when playback runs late too,
+        so a late stream is still flushed once per tick instead of piling up
+        in the backend's buffer.
+
+        Returns False when the event should be dropped (skip policy) or the
+        wait was interrupted by `cancelled()`; the caller checks for a stop.
+        """
+        clock = self.clock
+        deadline = self.origin + self.shift + offset
+        now = clock()
+        lateness = now - deadline
+        if lateness >= 0:
+            if idle is not None:
+                idle()
+            if lateness > self.max_lateness:
+                self.max_lateness = lateness
+            if self.policy == 'stretch':
+                self.shift += lateness
+            elif (self.policy == 'skip' and skippable and next_offset is not None
+                    and now >= self.origin + self.shift + next_offset):
+                self.skipped += 1
+                return False
+            return True
+
+        if idle is not None:
+            idle()
+            now = clock()
+        spin_from = deadline - self.spin_threshold
+        sleep = self._sleep
+        while now < spin_from:
+            sleep(min(spin_from - now, MAX_SLEEP))
+            if cancelled is not None and cancelled():
+                return False
+            now = clock()
+        while clock() < deadline:
+            pass
+        return True
@@ -0,0 +1,130 @@
+"""Segment playback: --start/--end offsets and named markers.
+
+A segment is resolved against the compiled plan (plan.py) without walking
+the events before it:
+
+    - the plan's event times are sorted, so the first and last events of the
+      segment are found by bisection, O(log n)
+    - the buttons held when the segment starts (and still held when it ends)
+      come from the plan's button-state table, also by bisection
+    - the pointer position is that of the event just before the segment
+
+Playback then moves the pointer there, presses the held buttons, plays the
+segment's events on a timeline that starts at the segment start, and
+releases whatever the recording still holds at the segment end.
+
+Offsets are recorded seconds. A negative offset counts from the end of the
+recording (--start -60 plays the last minute). Markers are named offsets
+kept next to the recording in `<recording>.markers.json` ({"name": seconds}).
+"""
+import json
+import os
+from bisect import bisect_left, bisect_right
+
+from plan import MAX_TRACKED_BUTTON
+
+MARKERS_SUFFIX = '.markers.json'
+
+
+class SegmentError(ValueError):
+    """A --start/--end that does not name a valid point of the recording."""
+
+
+# --- Markers ---
+def markers_path(recording_file):
+    return recording_file + MARKERS_SUFFIX
+
+
+def load_markers(recording_file):
+    """{name: offset} of the recording; empty if it has no markers file."""
+    try:
+        with open(markers_path(recording_file)) as f:
+            markers = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        raise SegmentError(f"Could not read markers file {markers_path(recording_file)}: {e}") from None
+    if not isinstance(markers, dict) or not all(isinstance(v, (int, float)) for v in markers.values()):
+        raise SegmentError(f"Markers file {markers_path(recording_file)} must map names to seconds.")
+    return markers
+
+
+def save_markers(recording_file, markers):
+    """Write the markers file atomically; an empty dict removes it."""
+    path = markers_path(recording_file)
+    if not markers:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(dict(sorted(markers.items(), key=lambda item: item[1])), f, indent=4)
+    os.replace(tmp_path, path)
+
+
+def parse_offset(value, markers, total_duration):
+    """Recorded offset for a --start/--end value: seconds (negative counts from
+    the end) or a marker name. Clamped to [0, total_duration]."""
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            if value not in markers:
+                known = ', '.join(sorted(markers)) or 'none'
+                raise SegmentError(f"Unknown marker '{value}' (markers: {known}).") from None
+            value = markers[value]
+    if value < 0:
+        value += total_duration
+    return min(max(float(value), 0.0), total_duration)
+
+
+# --- Resolution ---
+def held_buttons(plan, index):
+    """Button codes held just before plan event `index`."""
+    j = bisect_left(plan.state_indexes, index)
+    mask = plan.state_masks[j - 1] if j else 0
+    return [code for code in range(1, MAX_TRACKED_BUTTON + 1) if mask >> code & 1]
+
+
+def retimed_offset(times, deadlines, t, speed=1.0, max_gap=None):
+    """Playback-timeline offset of recorded offset `t`, consistent with scheduler.retime()."""
+    j = bisect_right(times, t)
+    src, dst = (times[j - 1], deadlines[j - 1]) if j else (0.0, 0.0)
+    gap = (t - src) / speed
+    if max_gap is not None and gap > max_gap:
+        gap = max_gap
+    return dst + gap
+
+
+class Segment:
+    """Plan events [first, stop) played on a timeline starting at `base`
+    (the retimed segment start) and lasting `duration` seconds."""
+    __slots__ = ('start', 'end', 'first', 'stop', 'base', 'duration', 'position', 'held', 'held_at_end')
+
+    def __len__(self):
+        return self.stop - self.first
+
+
+def resolve_segment(recording_file, plan, deadlines, start=None, end=None, speed=1.0, max_gap=None):
+    """Segment of `plan` between `start` and `end` (see parse_offset; None is
+    the beginning / end of the recording). `deadlines` are the plan's retimed
+    event offsets. Raises SegmentError."""
+    total = plan.total_duration
+    markers = load_markers(recording_file) if isinstance(start, str) or isinstance(end, str) else {}
+    segment = Segment()
+    segment.start = 0.0 if start is None else parse_offset(start, markers, total)
+    segment.end = total if end is None else parse_offset(end, markers, total)
+    if segment.end < segment.start:
+        raise SegmentError(f"--end ({segment.end:.3f}s) is before --start ({segment.start:.3f}s).")
+    times, track = plan.track.times, plan.track
+    segment.first = bisect_left(times, segment.start)
+    # Events exactly at --end are left out, unless the segment runs to the end of the recording
+    segment.stop = bisect_left(times, segment.end) if segment.end < total else len(times)
+    segment.base = retimed_offset(times, deadlines, segment.start, speed, max_gap)
+    playback_end = retimed_offset(times, deadlines, segment.end, speed, max_gap)
+    segment.duration = playback_end - segment.base
+    first = segment.first
+    segment.position = (track.xs[first - 1], track.ys[first - 1]) if first else None
+    segment.held = held_buttons(plan, first)
+    segment.held_at_end = held_buttons(plan, segment.stop) if segment.stop < len(times) else []
+    return segment
@@ -0,0 +1,109 @@
+"""Move-stream simplification for recordings (requires NumPy).
+
+Runs of consecutive `move` events are reduced in three steps:
+    1. consecutive moves to an identical position are dropped
+    2. an optional sample-rate cap drops moves closer in time than 1/max_rate
+    3. Ramer-Douglas-Peucker removes points within `tolerance` pixels of the
+       simplified path (the distance computation is vectorized with NumPy)
+
+Press, release and scroll events are anchors: they are always kept with their
+original timing, and the first and last distinct positions of every run of
+moves survive as well.
+"""
+import numpy as np
+
+DEFAULT_TOLERANCE = 1.0
+
+
+def _is_move(event):
+    return event['action'] == 'move'
+
+
+def rdp_mask(points, tolerance):
+    """Boolean mask of the points kept by Ramer-Douglas-Peucker.
+
+    `points` is an (n, 2) float array; the endpoints are always kept.
+    """
+    n = len(points)
+    keep = np.zeros(n, dtype=bool)
+    if n == 0:
+        return keep
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        a = points[start]
+        chord = points[end] - a
+        rel = points[start + 1:end] - a
+        length = np.hypot(chord[0], chord[1])
+        if length == 0.0:
+            dist = np.hypot(rel[:, 0], rel[:, 1])
+        else:
+            dist = np.abs(chord[0] * rel[:, 1] - chord[1] * rel[:, 0]) / length
+        i = int(np.argmax(dist))
+        if dist[i] > tolerance:
+            mid = start + 1 + i
+            keep[mid] = True
+            stack.append((start, mid))
+            stack.append((mid, end))
+    return keep
+
+
+def _simplify_run(run, last_pos, tolerance, min_interval):
+    """Simplify one run of consecutive moves; returns the kept events."""
+    # 1. dedupe consecutive identical positions (also against the previous anchor)
+    deduped = []
+    for event in run:
+        pos = (event['x'], event['y'])
+        if pos != last_pos:
+            deduped.append(event)
+            last_pos = pos
+    if len(deduped) <= 2:
+        return deduped
+
+    # 2. sample-rate cap, always keeping the last move of the run
+    if min_interval > 0:
+        capped = [deduped[0]]
+        last_time = deduped[0]['time_offset']
+        for event in deduped[1:-1]:
+            if event['time_offset'] - last_time >= min_interval:
+                capped.append(event)
+                last_time = event['time_offset']
+        capped.append(deduped[-1])
+        deduped = capped
+
+    # 3. Ramer-Douglas-Peucker on the spatial path
+    if tolerance <= 0 or len(deduped) <= 2:
+        return deduped
+    points = np.array([(e['x'], e['y']) for e in deduped], dtype=np.float64)
+    keep = rdp_mask(points, tolerance)
+    return [event for event, kept in zip(deduped, keep) if kept]
+
+
+def simplify_events(events, tolerance=DEFAULT_TOLERANCE, max_rate=None):
+    """Return a new event list with redundant moves removed."""
+    min_interval = 1.0 / max_rate if max_rate else 0.0
+    result = []
+    run = []
+    last_pos = None
+    for event in events:
+        if _is_move(event):
+            run.append(event)
+            continue
+        if run:
+            result.extend(_simplify_run(run, last_pos, tolerance, min_interval))
+            run = []
+        result.append(event)
+        last_pos = (event['x'], event['y'])
+    if run:
+        result.extend(_simplify_run(run, last_pos, tolerance, min_interval))
+    return result
+
+
+def simplify_recording(data, tolerance=DEFAULT_TOLERANCE, max_rate=None):
+    """Simplified copy of a {'total_duration', 'events'} recording."""
+    simplified = dict(data)
+    simplified['events'] = simplify_events(data.get('events', []), tolerance, max_rate)
+    return simplified
@@ -0,0 +1,513 @@
+"""Content-addressed recording store: deduplicated chunks plus one manifest per recording.
+
+A recording saved as `<name>.mref` is a small manifest. Its events live in a
+chunk store shared by all recordings (STORE_DIR), where every chunk is kept
+once under the hash of its contents, so recordings that share long runs of
+events (copies, renamed files, takes that start the same way) share their
+chunks on disk.
+
+Chunking is content-defined: a gear hash rolls over the events (each event
+feeds it one byte of a fingerprint of its time delta, position and action)
+and a chunk ends where the top CUT_BITS bits of the hash are zero, once it
+has MIN_CHUNK_EVENTS events, or at MAX_CHUNK_EVENTS. The hash only remembers
+the last 64 events, so an edit moves the boundaries next to it and the rest
+of the stream is cut where it was before.
+
+Chunk payload (little-endian, before zlib): n_events u32, n_scroll u32,
+flags u16, the chunk's own button table (as in .mrec), then the columns time
+delta i64 (ns since the previous event of the recording), x i32, y i32,
+action u8, button u8, dx and dy i32 of the scroll events and, with
+CHUNK_RESIDUALS, a residual f64 per event. With time deltas and chunk-local
+button codes, equal runs of events give equal chunks in any recording.
+
+Times are stored as whole nanoseconds, which is what the recorder produces.
+Recordings with finer times (older ones, from time.time()) also get the
+residual time_offset - ns / 1e9, which restores them exactly, so every
+conversion stays lossless.
+
+Chunk files are STORE_DIR/chunks/<first 2 hex digits>/<rest of the digest>,
+zlib-compressed. The digest (blake2b, DIGEST_SIZE bytes) is that of the
+uncompressed payload and is checked on every read.
+
+Manifest: magic 'MREF', version u16, flags u16 (mrec.FLAG_*), n_events u64,
+n_chunks u32, total_duration f64, button table, then digest + n_events u32
+per chunk.
+
+Every manifest the tools write (save_track(), journal.finalize()) is also
+listed in the store's registry (STORE_DIR/manifests, one absolute path per line), so gc keeps the
+chunks of recordings saved anywhere, not only under the folders it is given.
+
+Decoded chunks are kept in an in-process LRU of CACHE_BYTES, so the daemon
+reads and decompresses the chunks that several recordings share only once.
+"""
+import contextlib
+import fcntl
+import hashlib
+import os
+import struct
+import threading
+import time
+import zlib
+from array import array
+from collections import OrderedDict
+from itertools import accumulate, islice, repeat
+from operator import add, truediv
+
+import event_track
+import mrec
+
+MAGIC = b'MREF'
+VERSION = 1
+EXTENSION = '.mref'
+
+STORE_DIR = os.environ.get('MOUSE_STORE') or os.path.join(
+    os.environ.get('XDG_DATA_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'share'), 'mouse_app', 'store')
+
+MIN_CHUNK_EVENTS = 128
+CUT_BITS = 9                # chunks end on average 2**CUT_BITS events after MIN_CHUNK_EVENTS
+MAX_CHUNK_EVENTS = 4096
+DIGEST_SIZE = 16
+CHUNK_RESIDUALS = 0x1       # chunk flag: the residual column is present
+COMPRESS_LEVEL = 6
+CACHE_BYTES = 64 << 20      # decoded chunks kept in memory
+GC_GRACE_SECONDS = 3600     # gc keeps unreferenced chunks this recent (a save may be in progress)
+REGISTRY_FILE = 'manifests'
+
+_MASK64 = (1 << 64) - 1
+_CUT_MASK = ((1 << CUT_BITS) - 1) << (64 - CUT_BITS)
+# Fixed pseudo-random table: the boundaries must not change between runs or versions
+_GEAR = tuple(int.from_bytes(hashlib.blake2b(bytes([i]), digest_size=8).digest(), 'little') for i in range(256))
+_HEADER = struct.Struct('<4sHHQId')
+_ENTRY = struct.Struct('<%dsI' % DIGEST_SIZE)
+_CHUNK_HEADER = struct.Struct('<IIH')
+
+_cache = OrderedDict()      # digest -> decoded chunk
+_cache_bytes = 0
+_cache_lock = threading.Lock()
+
+
+class StoreError(ValueError):
+    """A manifest or chunk that cannot be read (missing, corrupted, newer version)."""
+
+
+def is_manifest(path):
+    """Whether the file is a .mref manifest (by extension or magic)."""
+    if path.lower().endswith(EXTENSION):
+        return True
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def _digest(payload):
+    return hashlib.blake2b(payload, digest_size=DIGEST_SIZE).digest()
+
+
+# --- Chunks ---
+def _decode_chunk(payload):
+    """(time deltas, xs, ys, actions, local button codes, button names, scroll indexes, dxs, dys,
+    residuals or None)."""
+    buf = memoryview(payload)
+    count, n_scroll, flags = _CHUNK_HEADER.unpack_from(buf, 0)
+    names, offset = mrec.unpack_buttons(buf, _CHUNK_HEADER.size)
+    dts, offset = mrec.read_column(buf, offset, 'q', count)
+    xs, offset = mrec.read_column(buf, offset, 'i', count)
+    ys, offset = mrec.read_column(buf, offset, 'i', count)
+    actions, offset = mrec.read_column(buf, offset, 'B', count)
+    codes = bytes(buf[offset:offset + count])
+    offset += count
+    dxs, offset = mrec.read_column(buf, offset, 'i', n_scroll)
+    dys, offset = mrec.read_column(buf, offset, 'i', n_scroll)
+    residuals = None
+    if flags & CHUNK_RESIDUALS:
+        residuals, offset = mrec.read_column(buf, offset, 'd', count)
+    scroll = [i for i in range(count) if actions[i] == mrec.ACTION_SCROLL] if n_scroll else []
+    if len(codes) != count or len(scroll) != n_scroll or len(dys) != n_scroll or len(residuals or dts) != count:
+        raise StoreError("Chunk payload is truncated.")
+    return dts, xs, ys, actions, codes, names, scroll, dxs, dys, residuals
+
+
+def _remember(digest, chunk):
+    global _cache_bytes
+    size = len(chunk[0]) * (26 if chunk[9] else 18) + 8 * len(chunk[6])
+    with _cache_lock:
+        if digest in _cache:
+            return
+        _cache[digest] = chunk
+        _cache_bytes += size
+        while _cache_bytes > CACHE_BYTES and len(_cache) > 1:
+            _, old = _cache.popitem(last=False)
+            _cache_bytes -= len(old[0]) * (26 if old[9] else 18) + 8 * len(old[6])
+
+
+def clear_cache():
+    """Forget the decoded chunks, so the next loads read them from disk."""
+    global _cache_bytes
+    with _cache_lock:
+        _cache.clear()
+        _cache_bytes = 0
+
+
+class ChunkStore:
+    """The chunk files under `root`, one per unique chunk."""
+
+    def __init__(self, root=None):
+        self.root = root or STORE_DIR
+
+    def chunk_path(self, digest):
+        name = digest.hex()
+        return os.path.join(self.root, 'chunks', name[:2], name[2:])
+
+    def put(self, digest, payload):
+        """Store a chunk unless it is already there; returns the bytes written (0 if it was)."""
+        path = self.chunk_path(digest)
+        try:
+            # A reused chunk counts as new for gc's grace period until the
+            # manifest that points to it is published
+            os.utime(path)
+            return 0
+        except FileNotFoundError:
+            pass
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = zlib.compress(payload, COMPRESS_LEVEL)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())  # the manifest that points here is published after this
+        os.replace(tmp_path, path)
+        return len(data)
+
+    def get(self, digest):
+        """Decoded chunk, from the in-process cache when another load already read it."""
+        with _cache_lock:
+            chunk = _cache.get(digest)
+            if chunk is not None:
+                _cache.move_to_end(digest)
+                return chunk
+        path = self.chunk_path(digest)
+        try:
+            with open(path, 'rb') as f:
+                payload = zlib.decompress(f.read())
+        except FileNotFoundError:
+            raise StoreError(f"Chunk {digest.hex()} is missing from the store {self.root}.") from None
+        except zlib.error as e:
+            raise StoreError(f"Chunk {path} is corrupted: {e}") from None
+        if _digest(payload) != digest:
+            raise StoreError(f"Chunk {path} is corrupted (its contents do not match its hash).")
+        chunk = _decode_chunk(payload)
+        _remember(digest, chunk)
+        return chunk
+
+    def chunks(self):
+        """(digest, path) of every chunk file in the store."""
+        chunks_dir = os.path.join(self.root, 'chunks')
+        try:
+            prefixes = sorted(os.listdir(chunks_dir))
+        except FileNotFoundError:
+            return
+        for prefix in prefixes:
+            folder = os.path.join(chunks_dir, prefix)
+            for name in sorted(os.listdir(folder)):
+                if name.endswith('.tmp'):
+                    continue
+                try:
+                    digest = bytes.fromhex(prefix + name)
+                except ValueError:
+                    continue
+                yield digest, os.path.join(folder, name)
+
+    @contextlib.contextmanager
+    def _registry(self):
+        """Path of the registry, locked against other processes for the block."""
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, REGISTRY_FILE)
+        # A separate lock file: pruning replaces the registry itself
+        with open(path + '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield path
+
+    def register(self, paths):
+        """Add the manifests `paths` to the registry (after they are written)."""
+        lines = ''.join(os.path.abspath(path) + '\n' for path in paths)
+        if not lines:
+            return
+        with self._registry() as registry:
+            with open(registry, 'a') as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def registered(self, prune=False):
+        """Registered manifests that still exist; with prune=True the registry
+        is rewritten without the others (and without duplicates)."""
+        with self._registry() as registry:
+            try:
+                with open(registry) as f:
+                    listed = list(dict.fromkeys(line.rstrip('\n') for line in f if line.strip()))
+            except FileNotFoundError:
+                return []
+            existing = [path for path in listed if os.path.isfile(path)]
+            if prune and len(existing) != len(listed):
+                tmp_path = f"{registry}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w') as f:
+                    f.write(''.join(path + '\n' for path in existing))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, registry)
+        return existing
+
+
+class ChunkWriter:
+    """Cuts a stream of events into chunks and stores the ones the store lacks.
+
+    extend() takes rows (time_offset, action, button code, x, y, dx, dy) whose
+    codes index `button_names`, e.g. the records of a journal.JournalReader.
+    finish() returns the manifest entries [(digest, n_events)].
+    """
+
+    def __init__(self, store=None):
+        self.store = store or ChunkStore()
+        self.entries = []
+        self.count = 0
+        self.new_chunks = 0
+        self.new_bytes = 0
+        self._hash = 0
+        self._last_ns = 0
+        self._columns = self._empty()
+
+    @staticmethod
+    def _empty():
+        return array('q'), array('i'), array('i'), array('B'), array('B'), array('i'), array('i'), array('d')
+
+    def extend(self, rows, button_names):
+        gear, cut_mask = _GEAR, _CUT_MASK
+        h, last = self._hash, self._last_ns
+        dts, xs, ys, actions, codes, dxs, dys, residuals = self._columns
+        n = len(dts)
+        for t, action, code, x, y, dx, dy in rows:
+            ns = round(t * 1e9)
+            dt = ns - last
+            last = ns
+            dts.append(dt)
+            residuals.append(t - ns / 1e9)
+            xs.append(x)
+            ys.append(y)
+            actions.append(action)
+            codes.append(code)
+            if action == mrec.ACTION_SCROLL:
+                dxs.append(dx)
+                dys.append(dy)
+            h = ((h << 1) + gear[(dt ^ x * 0x9E3779B1 ^ y * 0x85EBCA77 ^ action) & 0xFF]) & _MASK64
+            n += 1
+            if n >= MIN_CHUNK_EVENTS and not h & cut_mask or n >= MAX_CHUNK_EVENTS:
+                self._cut(button_names)
+                dts, xs, ys, actions, codes, dxs, dys, residuals = self._columns
+                n = 0
+        self._hash, self._last_ns = h, last
+
+    def finish(self, button_names):
+        if self._columns[0]:
+            self._cut(button_names)
+        return self.entries
+
+    def _cut(self, button_names):
+        dts, xs, ys, actions, codes, dxs, dys, residuals = self._columns
+        flags = CHUNK_RESIDUALS if any(residuals) else 0
+        # Chunk-local button codes, numbered in order of first use
+        local = [None]
+        table = bytearray(256)
+        for code in dict.fromkeys(codes):
+            if code:
+                table[code] = len(local)
+                local.append(button_names[code])
+        payload = b''.join((
+            _CHUNK_HEADER.pack(len(dts), len(dxs), flags),
+            mrec.pack_buttons(local[1:]),
+            mrec.column_bytes('q', dts),
+            mrec.column_bytes('i', xs),
+            mrec.column_bytes('i', ys),
+            actions.tobytes(),
+            codes.tobytes().translate(table),
+            mrec.column_bytes('i', dxs),
+            mrec.column_bytes('i', dys),
+            mrec.column_bytes('d', residuals) if flags else b'',
+        ))
+        digest = _digest(payload)
+        written = self.store.put(digest, payload)
+        if written:
+            self.new_chunks += 1
+            self.new_bytes += written
+        self.entries.append((digest, len(dts)))
+        self.count += len(dts)
+        self._columns = self._empty()
+
+
+# --- Manifests ---
+def manifest_bytes(entries, total_duration, flags, button_names):
+    """Manifest for the chunks `entries`; `button_names` is [None, name, ...]."""
+    parts = [_HEADER.pack(MAGIC, VERSION, flags, sum(n for _, n in entries), len(entries), float(total_duration)),
+             mrec.pack_buttons(button_names[1:])]
+    parts.extend(_ENTRY.pack(digest, n) for digest, n in entries)
+    return b''.join(parts)
+
+
+def read_manifest(path):
+    """(flags, total_duration, button_names, [(digest, n_events)]) of a manifest."""
+    with open(path, 'rb') as f:
+        buf = memoryview(f.read())
+    if len(buf) < _HEADER.size:
+        raise StoreError(f"Manifest {path} is truncated (incomplete header).")
+    magic, version, flags, count, n_chunks, total_duration = _HEADER.unpack_from(buf, 0)
+    if magic != MAGIC:
+        raise StoreError(f"{path} is not a {EXTENSION} manifest (bad magic).")
+    if version > VERSION:
+        raise StoreError(f"Manifest version {version} is not supported (newest: {VERSION}).")
+    button_names, offset = mrec.unpack_buttons(buf, _HEADER.size)
+    if len(buf) < offset + n_chunks * _ENTRY.size:
+        raise StoreError(f"Manifest {path} is truncated (incomplete chunk list).")
+    entries = [_ENTRY.unpack_from(buf, offset + i * _ENTRY.size) for i in range(n_chunks)]
+    if sum(n for _, n in entries) != count:
+        raise StoreError(f"Manifest {path} is inconsistent (chunk sizes do not add up to {count} events).")
+    return flags, total_duration, button_names, entries
+
+
+def save_track(path, track, total_duration, store=None):
+    """Store the events of `track` and write the manifest `path` atomically; returns the ChunkWriter."""
+    start, stop = track.bounds()
+    writer = ChunkWriter(store)
+    rows = zip(track.times, track.actions, track.buttons, track.xs, track.ys, track.dxs, track.dys)
+    writer.extend(islice(rows, start, stop), track.button_names)
+    flags = mrec.FLAG_SORTED if track.is_sorted() else 0
+    data = manifest_bytes(writer.finish(track.button_names), total_duration, flags, track.button_names)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    writer.store.register([path])
+    return writer
+
+
+def load_track(path, store=None):
+    """Load a manifest as (EventTrack sorted by time_offset, total_duration). Raises StoreError."""
+    flags, total_duration, button_names, entries = read_manifest(path)
+    store = store or ChunkStore()
+    track = event_track.EventTrack(button_names)
+    times, xs, ys, actions, buttons, dxs, dys = (getattr(track, name) for name in event_track.COLUMNS)
+    ns = 0
+    for digest, count in entries:
+        c_dts, c_xs, c_ys, c_actions, c_codes, names, scroll, c_dxs, c_dys, residuals = store.get(digest)
+        if len(c_dts) != count:
+            raise StoreError(f"Chunk {digest.hex()} has {len(c_dts)} events, the manifest {path} expects {count}.")
+        base = len(times)
+        stamps = map(truediv, islice(accumulate(c_dts, initial=ns), 1, None), repeat(1e9))
+        times.extend(map(add, stamps, residuals) if residuals else stamps)
+        ns += sum(c_dts)
+        xs.extend(c_xs)
+        ys.extend(c_ys)
+        actions.extend(c_actions)
+        table = bytes([0] + [track.button_code(name) for name in names[1:]]).ljust(256, b'\0')
+        buttons.frombytes(c_codes.translate(table))
+        dxs.frombytes(bytes(4 * count))
+        dys.frombytes(bytes(4 * count))
+        for j, i in enumerate(scroll):
+            dxs[base + i] = c_dxs[j]
+            dys[base + i] = c_dys[j]
+    if not flags & mrec.FLAG_SORTED:
+        track = track.sorted()
+    return track, total_duration
+
+
+# --- Maintenance ---
+def find_manifests(roots):
+    """Absolute paths of the manifests under `roots` (files or folders, walked recursively)."""
+    for root in roots:
+        root = os.path.abspath(root)
+        if os.path.isfile(root):
+            if root.lower().endswith(EXTENSION):
+                yield root
+            continue
+        for folder, _, names in os.walk(root):
+            for name in sorted(names):
+                if name.lower().endswith(EXTENSION):
+                    yield os.path.join(folder, name)
+
+
+def known_manifests(roots, store):
+    """The manifests under `roots` plus every one in the registry of `store`, each once."""
+    return list(dict.fromkeys([*find_manifests(roots), *store.registered()]))
+
+
+def stats(roots, store=None):
+    """Logical size of the manifests under `roots` and in the registry against what the store holds."""
+    store = store or ChunkStore()
+    referenced = {}
+    manifests = events = references = 0
+    errors = []
+    for path in known_manifests(roots, store):
+        try:
+            _, _, _, entries = read_manifest(path)
+        except (OSError, StoreError) as e:
+            errors.append(f"{path}: {e}")
+            continue
+        manifests += 1
+        references += len(entries)
+        for digest, n in entries:
+            events += n
+            referenced[digest] = n
+    stored_chunks = stored_bytes = unreferenced = 0
+    for digest, chunk_path in store.chunks():
+        stored_chunks += 1
+        stored_bytes += os.path.getsize(chunk_path)
+        unreferenced += digest not in referenced
+    return {
+        'store': store.root,
+        'manifests': manifests,
+        'events': events,
+        'unique_events': sum(referenced.values()),
+        'chunk_references': references,
+        'unique_chunks': len(referenced),
+        'stored_chunks': stored_chunks,
+        'stored_bytes': stored_bytes,
+        'unreferenced_chunks': unreferenced,
+        'errors': errors,
+    }
+
+
+def collect_garbage(roots, store=None, dry_run=False, grace=GC_GRACE_SECONDS):
+    """Delete the chunks that no manifest references; returns (chunks, bytes).
+
+    The manifests are those in the registry (every one the tools saved)
+    plus those under `roots`, which are registered from then on, so
+    that manifests copied in by other means are kept too. Chunks newer than
+    `grace` seconds are kept: a recording being saved writes (or, if they
+    already exist, touches) its chunks before its manifest. Refuses to run
+    if a manifest cannot be read."""
+    store = store or ChunkStore()
+    found = list(find_manifests(roots))
+    if not dry_run:
+        registered = set(store.registered(prune=True))
+        store.register([path for path in found if path not in registered])
+    referenced = set()
+    for path in dict.fromkeys([*found, *store.registered()]):
+        try:
+            referenced.update(digest for digest, _ in read_manifest(path)[3])
+        except (OSError, StoreError) as e:
+            raise StoreError(f"Not collecting garbage, could not read {path}: {e}") from None
+    cutoff = time.time() - grace
+    removed = freed = 0
+    for digest, chunk_path in store.chunks():
+        if digest in referenced:
+            continue
+        stat = os.stat(chunk_path)
+        if stat.st_mtime > cutoff:
+            continue
+        if not dry_run:
+            os.remove(chunk_path)
+        removed += 1
+        freed += stat.st_size
+    return removed, freed
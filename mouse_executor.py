@@ -1,188 +1,546 @@
 import argparse
 import json
 import os
-import signal
 import sys
 import time
-from multiprocessing import Process, Value
-from pynput.mouse import Controller, Button
 
-EXECUTOR_PID_FILE = "executor.pid"
-is_executing_shared = Value('b', False) # Shared flag to signal execution stop
-
-class MouseExecutor:
-    def __init__(self, recording_file):
-        self.recording_file = recording_file
-        self.events = []
-        self.mouse = Controller()
-        self.execution_process = None
-
-    def _load_events(self):
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mouse_app'))
+# Only what every subcommand needs is imported here; playback (player), the
+# recording formats (mrec) and subprocess are imported by the commands that
+# use them, so stop/pause/status start in a few milliseconds.
+from backends import BACKENDS, DEFAULT_BACKEND
+from control import ControlClient, send_command
+from scheduler import DEFAULT_POLICY, POLICIES
+
+EXECUTOR_SOCKET = "executor.sock"   # control socket of the playback daemon
+EXECUTOR_LOG_FILE = "executor.log"  # output of a daemon started by `play`
+DAEMON_START_TIMEOUT = 5.0
+
+def read_playlist(path):
+    """Recording paths listed in a playlist file: one per line, '#' starts a
+    comment, relative paths are relative to the playlist."""
+    base = os.path.dirname(os.path.abspath(path))
+    files = []
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if line:
+                files.append(os.path.join(base, line))
+    return files
+
+def connect_daemon(socket_path, backend=DEFAULT_BACKEND, start=False):
+    """ControlClient for the daemon on `socket_path`; with start=True one is
+    launched in the background if none is running."""
+    try:
+        return ControlClient(socket_path)
+    except OSError:
+        if not start:
+            raise
+    import subprocess
+    with open(EXECUTOR_LOG_FILE, 'a') as log:
+        process = subprocess.Popen(
+            [sys.executable, '-u', os.path.abspath(__file__), '--socket', socket_path, 'serve', '--backend', backend],
+            stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+    deadline = time.monotonic() + DAEMON_START_TIMEOUT
+    while time.monotonic() < deadline:
         try:
-            with open(self.recording_file, 'r') as f:
-                data = json.load(f)
-                self.events = data.get('events', [])
-                # Events should be sorted by time_offset if not already
-                self.events.sort(key=lambda e: e['time_offset'])
-            if not self.events:
-                print(f"No events found in {self.recording_file}")
-                return False
-            return True
-        except FileNotFoundError:
-            print(f"Error: Recording file {self.recording_file} not found.")
-            sys.exit(1)
-        except json.JSONDecodeError:
-            print(f"Error: Could not decode JSON from {self.recording_file}.")
-            sys.exit(1)
-
-    def _execute_events(self):
-        if not self._load_events():
-            is_executing_shared.value = False
-            return
-
-        is_executing_shared.value = True
-        print(f"Starting execution of {self.recording_file}...")
-        start_playback_time = time.time()
-
-        # Get the timestamp of the first event to calculate initial delay
-        # This assumes the first event's time_offset is the "wait time" before the first action
-        first_event_offset = self.events[0]['time_offset'] if self.events else 0
-
-        # Correctly handle the time relative to the start of playback
-        # The time_offset in the file is relative to the original recording start.
-        # We need to make sure playback respects these relative timings.
-
-        last_event_time_offset = 0.0
-
-        for event in self.events:
-            if not is_executing_shared.value:
-                print("Execution stopped by user.")
-                break
-
-            current_event_time_offset = event['time_offset']
-
-            # Wait for the time difference between this event and the last event
-            delay = current_event_time_offset - last_event_time_offset
-            if delay > 0:
-                time.sleep(delay)
-
-            if not is_executing_shared.value: # Check again after sleep
-                print("Execution stopped by user during sleep.")
+            return ControlClient(socket_path)
+        except OSError:
+            if process.poll() is not None:
                 break
-
-            # Update mouse position for click/scroll events to ensure they happen at correct location
-            if event['type'] != 'move': # For click and scroll, ensure position is set first
-                 self.mouse.position = (event['x'], event['y'])
-                 time.sleep(0.01) # Small delay to ensure position is set before action
-
-            if event['type'] == 'move':
-                self.mouse.position = (event['x'], event['y'])
-            elif event['type'] == 'click':
-                button_map = {
-                    'Button.left': Button.left,
-                    'Button.right': Button.right,
-                    'Button.middle': Button.middle,
-                }
-                # Handle potential new button types from pynput if any, or stick to known ones
-                pynput_button = button_map.get(event['button'])
-                if pynput_button:
-                    if event['pressed']:
-                        self.mouse.press(pynput_button)
-                    else:
-                        self.mouse.release(pynput_button)
-                else:
-                    print(f"Warning: Unknown button type {event['button']} in recording. Skipping.")
-            elif event['type'] == 'scroll':
-                self.mouse.scroll(event['dx'], event['dy'])
-
-            last_event_time_offset = current_event_time_offset
-
-        if is_executing_shared.value: # If not stopped by user
-            print("Execution finished.")
-        is_executing_shared.value = False # Ensure it's set to false at the end
-
-        # Clean up PID file if this process was the one that created it
-        # This check is important if stop_execution might be called by another process
-        # For simplicity, the stop_execution will handle PID removal.
-        # if os.path.exists(EXECUTOR_PID_FILE):
-        #    with open(EXECUTOR_PID_FILE, 'r') as f:
-        #        if int(f.read().strip()) == os.getpid():
-        #            os.remove(EXECUTOR_PID_FILE)
-
-
-    def start_execution_daemon(self):
-        if os.path.exists(EXECUTOR_PID_FILE):
+            time.sleep(0.01)
+    raise OSError(f"The playback daemon did not start (see {EXECUTOR_LOG_FILE}).")
+
+def describe_status(reply):
+    state = reply['state']
+    if 'file' not in reply:
+        return f"Daemon (PID: {reply['pid']}) is {state}; {reply['preloaded']} recording(s) preloaded."
+    line = f"{state}: {reply['file']}"
+    if 'run' in reply:
+        of = f" of {reply['repeat']}" if reply['repeat'] else ""
+        line += f" [run {reply['run']}{of}]"
+    if 'position' in reply:
+        line += f" ({min(reply['position'], reply['duration']):.3f}s of {reply['duration']:.3f}s)"
+    return line
+
+def control_command(socket_path, command, **args):
+    try:
+        reply = send_command(socket_path, command, **args)
+    except OSError:
+        print(f"Error: No playback daemon is running (socket {socket_path}).")
+        sys.exit(1)
+    if not reply.get('ok'):
+        print(f"Error: {reply.get('error')}")
+        sys.exit(1)
+    return reply
+
+def convert_recording(src, dst):
+    import mrec
+    try:
+        count = mrec.convert(src, dst)
+    except FileNotFoundError:
+        print(f"Error: Recording file {src} not found.")
+        sys.exit(1)
+    except (json.JSONDecodeError, ValueError) as e:
+        print(f"Error: Could not convert {src}: {e}")
+        sys.exit(1)
+    src_size = os.path.getsize(src)
+    dst_size = os.path.getsize(dst)
+    print(f"Converted {count} events: {src} ({src_size} bytes) -> {dst} ({dst_size} bytes)")
+
+def optimize_recording(src, dst, tolerance, max_rate):
+    import mrec
+    try:
+        from simplify import simplify_recording
+    except ImportError:
+        print("Error: the optimize command requires NumPy (pip install numpy).")
+        sys.exit(1)
+    try:
+        data = mrec.load_recording(src)
+        optimized = simplify_recording(data, tolerance, max_rate)
+        mrec.save_recording(dst, optimized)
+    except FileNotFoundError:
+        print(f"Error: Recording file {src} not found.")
+        sys.exit(1)
+    except (json.JSONDecodeError, ValueError) as e:
+        print(f"Error: Could not optimize {src}: {e}")
+        sys.exit(1)
+    before = len(data.get('events', []))
+    after = len(optimized['events'])
+    print(f"Optimized {src}: {before} -> {after} events, "
+          f"{os.path.getsize(src)} -> {os.path.getsize(dst)} bytes. Saved to {dst}")
+
+def format_duration(seconds):
+    minutes, seconds = divmod(seconds or 0.0, 60)
+    return f"{minutes:.0f}m {seconds:05.2f}s"
+
+def list_recordings(paths, match, min_duration, max_duration, min_events, sort, as_json):
+    import sqlite3
+    import catalog
+    roots = paths or catalog.DEFAULT_ROOTS
+    try:
+        with catalog.Catalog() as db:
+            db.refresh(roots)
+            rows = db.query(roots, match, min_duration, max_duration, min_events, sort)
+    except sqlite3.Error as e:
+        print(f"Error: Could not read the recording catalog {catalog.CATALOG_PATH}: {e}")
+        sys.exit(1)
+    if as_json:
+        print(json.dumps(rows, indent=4))
+        return
+    print(f"{'duration':>10} {'events':>8} {'clicks':>6} {'bounds':>11}  file")
+    for row in rows:
+        path = os.path.relpath(row['path'])
+        if row['error']:
+            print(f"{'-':>10} {'-':>8} {'-':>6} {'-':>11}  {path}  (unreadable: {row['error']})")
+            continue
+        bounds = f"{row['max_x'] - row['min_x']}x{row['max_y'] - row['min_y']}" if row['events'] else '-'
+        print(f"{format_duration(row['total_duration']):>10} {row['events']:>8} {row['presses']:>6} {bounds:>11}  {path}")
+    print(f"{len(rows)} recording(s).")
+
+def recording_info(path, as_json):
+    import sqlite3
+    import catalog
+    try:
+        with catalog.Catalog() as db:
+            row = db.update(path)
+    except FileNotFoundError:
+        print(f"Error: Recording file {path} not found.")
+        sys.exit(1)
+    except sqlite3.Error as e:
+        print(f"Error: Could not read the recording catalog {catalog.CATALOG_PATH}: {e}")
+        sys.exit(1)
+    if as_json:
+        print(json.dumps(row, indent=4))
+        return
+    print(f"File:      {row['path']}")
+    print(f"Format:    {row['format']}, {row['size']} bytes")
+    if row['error']:
+        print(f"Error:     {row['error']}")
+        sys.exit(1)
+    print(f"Duration:  {format_duration(row['total_duration'])}")
+    print(f"Events:    {row['events']} ({row['moves']} moves, {row['presses']} presses, "
+          f"{row['releases']} releases, {row['scrolls']} scrolls)")
+    if row['events']:
+        print(f"Span:      {row['first_offset']:.3f}s - {row['last_offset']:.3f}s")
+        print(f"Bounds:    ({row['min_x']}, {row['min_y']}) - ({row['max_x']}, {row['max_y']})")
+    print(f"Buttons:   {row['buttons'] or '-'}")
+    from segment import SegmentError, load_markers
+    try:
+        markers = load_markers(path)
+    except SegmentError as e:
+        print(f"Markers:   {e}")
+    else:
+        listed = ', '.join(f"{name} ({seconds:.3f}s)" for name, seconds in sorted(markers.items(), key=lambda item: item[1]))
+        print(f"Markers:   {listed or '-'}")
+
+def edit_markers(path, set_markers, remove):
+    from segment import SegmentError, load_markers, save_markers
+    if not os.path.exists(path):
+        print(f"Error: Recording file {path} not found.")
+        sys.exit(1)
+    try:
+        markers = load_markers(path)
+        for item in set_markers:
+            name, _, seconds = item.partition('=')
             try:
-                with open(EXECUTOR_PID_FILE, 'r') as f:
-                    pid = int(f.read().strip())
-                os.kill(pid, 0)
-                print(f"Error: Execution is already in progress (PID: {pid}).")
+                seconds = float(seconds)
+            except ValueError:
+                print(f"Error: Expected NAME=SECONDS, got '{item}'.")
                 sys.exit(1)
-            except (OSError, ValueError):
-                os.remove(EXECUTOR_PID_FILE)
-
-        self.execution_process = Process(target=self._execute_events)
-        self.execution_process.daemon = True
-        self.execution_process.start()
-
-        with open(EXECUTOR_PID_FILE, 'w') as f:
-            f.write(str(self.execution_process.pid))
-
-        print(f"Execution started in background (PID: {self.execution_process.pid}). File: {self.recording_file}")
-        sys.exit(0)
-
-    @staticmethod
-    def stop_execution_daemon():
-        if not os.path.exists(EXECUTOR_PID_FILE):
-            print("Error: No active execution found (PID file missing).")
-            sys.exit(1)
-
-        try:
-            with open(EXECUTOR_PID_FILE, 'r') as f:
-                pid = int(f.read().strip())
-        except ValueError:
-            print("Error: Invalid PID file.")
-            if os.path.exists(EXECUTOR_PID_FILE):
-                os.remove(EXECUTOR_PID_FILE)
-            sys.exit(1)
-
-        print(f"Attempting to stop execution process PID: {pid}...")
-        is_executing_shared.value = False # Signal the execution process to stop
-
-        # Give it a moment to stop gracefully
-        time.sleep(1) # Adjust as necessary
-
-        try:
-            os.kill(pid, 0) # Check if process still exists
-            # If still running, it might be stuck or didn't check the flag in time.
-            # For critical stops, a SIGTERM or SIGKILL could be used, but that's riskier.
-            print(f"Process {pid} is still running. It should stop shortly.")
-            # Consider a timeout and then os.kill(pid, signal.SIGTERM) if it doesn't stop
-        except OSError:
-            print(f"Execution process (PID: {pid}) successfully stopped or was not found.")
-        finally:
-            if os.path.exists(EXECUTOR_PID_FILE):
-                os.remove(EXECUTOR_PID_FILE)
-            # print("Execution stop command processed.") # Avoid double "stopped" messages
+            try:
+                float(name)
+            except ValueError:
+                markers[name] = seconds
+            else:
+                print(f"Error: Marker name '{name}' would be read as an offset; use a name that is not a number.")
+                sys.exit(1)
+        for name in remove:
+            if markers.pop(name, None) is None:
+                print(f"Warning: No marker named '{name}'.")
+        if set_markers or remove:
+            save_markers(path, markers)
+    except (SegmentError, OSError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    for name, seconds in sorted(markers.items(), key=lambda item: item[1]):
+        print(f"{format_duration(seconds):>10}  {name}")
+    print(f"{len(markers)} marker(s).")
+
+def analyze_replay(original, capture, resolution_ms, band_ms, click_tolerance_ms, thresholds, as_json, report_path):
+    try:
+        import fidelity
+    except ImportError:
+        print("Error: the analyze command requires NumPy (pip install numpy).")
+        sys.exit(1)
+    try:
+        report = fidelity.analyze(original, capture, resolution_ms / 1e3, band_ms / 1e3, click_tolerance_ms / 1e3)
+    except FileNotFoundError as e:
+        print(f"Error: Recording file {e.filename} not found.")
+        sys.exit(1)
+    except (json.JSONDecodeError, ValueError) as e:
+        print(f"Error: Could not analyze {original} against {capture}: {e}")
+        sys.exit(1)
+    report['failures'] = fidelity.failures(report, *thresholds)
+    if report_path:
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=4)
+    if as_json:
+        print(json.dumps(report, indent=4))
+    else:
+        spatial, timing, clicks = report['spatial'], report['timing'], report['clicks']
+        error, skew = spatial['error_px'], timing['skew_ms']
+        print(f"Original:  {original} ({report['events']['original']} events)")
+        print(f"Capture:   {capture} ({report['events']['capture']} events), playback starts at {report['offset_s']:.3f}s")
+        print(f"Position:  {spatial['exact_fraction'] * 100:.2f}% exact, error p50 {error['p50']:.2f}px / "
+              f"p99 {error['p99']:.2f}px / max {error['max']:.2f}px")
+        print(f"Timing:    skew p50 {skew['p50']:.2f}ms / p99 {skew['p99']:.2f}ms / max {skew['max']:.2f}ms, "
+              f"drift {timing['drift_ms_per_min']:.2f}ms/min")
+        print(f"Clicks:    {clicks['matched']} of {clicks['original']} matched, {clicks['missing']} missing, "
+              f"{clicks['extra']} extra")
+        for label, listed in (('missing', clicks['missing_list']), ('extra', clicks['extra_list'])):
+            for click in listed:
+                print(f"           {label} {click['action']} {click['button']} at {click['time_s']:.3f}s "
+                      f"({click['x']}, {click['y']})")
+        print(f"Analyzed in {report['elapsed_s']['total']:.2f}s.")
+        for failure in report['failures']:
+            print(f"FAIL: {failure}")
+    if report['failures']:
+        sys.exit(1)
+
+def store_command(action, paths, replace, dry_run):
+    import catalog
+    import loader
+    import store
+    from segment import markers_path
+    if action == 'add':
+        for path in paths:
+            if store.is_manifest(path):
+                print(f"Skipped {path}: already a {store.EXTENSION} manifest.")
+                continue
+            dest = os.path.splitext(path)[0] + store.EXTENSION
+            try:
+                track, total_duration = loader.load_track(path)
+                writer = store.save_track(dest, track, total_duration)
+            except FileNotFoundError:
+                print(f"Error: Recording file {path} not found.")
+                sys.exit(1)
+            except (json.JSONDecodeError, ValueError, OSError) as e:
+                print(f"Error: Could not add {path} to the store: {e}")
+                sys.exit(1)
+            size = os.path.getsize(path)
+            print(f"{path} ({size} bytes) -> {dest}: {writer.count} events in {len(writer.entries)} chunk(s), "
+                  f"{writer.new_chunks} new ({writer.new_bytes} bytes written)")
+            if replace:
+                if os.path.exists(markers_path(path)):
+                    os.replace(markers_path(path), markers_path(dest))
+                os.remove(path)
+        return
+    roots = paths or catalog.DEFAULT_ROOTS
+    try:
+        if action == 'stats':
+            s = store.stats(roots)
+        else:
+            removed, freed = store.collect_garbage(roots, dry_run=dry_run)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    if action == 'gc':
+        print(f"{'Would remove' if dry_run else 'Removed'} {removed} unreferenced chunk(s), {freed} bytes.")
+        return
+    print(f"Store:      {s['store']}")
+    print(f"Manifests:  {s['manifests']} ({s['events']} events, {s['chunk_references']} chunk references)")
+    print(f"Unique:     {s['unique_chunks']} chunk(s), {s['unique_events']} events")
+    print(f"On disk:    {s['stored_chunks']} chunk(s), {s['stored_bytes']} bytes "
+          f"({s['unreferenced_chunks']} not referenced by these manifests)")
+    for error in s['errors']:
+        print(f"Warning: {error}")
+
+def batch_command(operation, paths, jobs, chunk_size, to, out_dir, report):
+    import batch
+    catalog_roots = None
+    if not paths:
+        import catalog
+        catalog_roots = catalog.DEFAULT_ROOTS
+    files = batch.find_recordings(paths or catalog_roots)
+    options = {'to': to, 'out_dir': os.path.abspath(out_dir) if out_dir else None}
+    try:
+        results, summary = batch.timed_batch(operation, files, jobs, chunk_size, options)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    status = ', '.join(f"{count} {name}" for name, count in sorted(summary['status'].items()))
+    print(f"{operation}: {summary['files']} file(s) in {summary['seconds']:.2f}s ({status or 'nothing to do'})")
+    totals = summary.get('totals')
+    if totals:
+        print(f"  events:   {totals['events']} ({totals['moves']} moves, {totals['presses']} presses, "
+              f"{totals['releases']} releases, {totals['scrolls']} scrolls)")
+        print(f"  duration: {format_duration(totals['total_duration'])} in total, "
+              f"{format_duration(totals['shortest'])} to {format_duration(totals['longest'])} per file")
+        if 'bounds' in totals:
+            print(f"  bounds:   ({totals['bounds'][0]}, {totals['bounds'][1]}) - ({totals['bounds'][2]}, {totals['bounds'][3]})")
+    if 'written' in summary:
+        print(f"  written:  {summary['written']} file(s)")
+    for problem in summary['problems']:
+        print(f"  {problem['status']:<8} {os.path.relpath(problem['path'])}: {problem['message']}")
+    if report:
+        with open(report, 'w') as f:
+            json.dump({'summary': summary, 'files': results}, f, indent=4)
+    if summary['status'].get('error'):
+        sys.exit(1)
 
 def main():
     parser = argparse.ArgumentParser(description="Mouse Executor CLI")
+    parser.add_argument("--socket", type=str, default=EXECUTOR_SOCKET,
+                        help=f"Control socket of the playback daemon (default: {EXECUTOR_SOCKET}).")
     subparsers = parser.add_subparsers(dest="command", required=True)
 
-    play_parser = subparsers.add_parser("play", help="Play a recorded mouse event file.")
-    play_parser.add_argument("--file", "-f", type=str, required=True, help="Recording file name to play (e.g., recording.mrec).")
-
-    stop_parser = subparsers.add_parser("stop", help="Stop the active mouse execution.")
+    serve_parser = subparsers.add_parser("serve", help="Run the playback daemon in the foreground.")
+    serve_parser.add_argument("--backend", choices=sorted(BACKENDS), default=DEFAULT_BACKEND,
+                              help="Default output backend (default: pynput).")
+    serve_parser.add_argument("--preload", type=str, nargs="+", default=[], metavar="FILE",
+                              help="Recordings to decode before accepting commands.")
+
+    play_parser = subparsers.add_parser("play", help="Play a recorded mouse event file (starts the daemon if needed).")
+    play_parser.add_argument("--file", "-f", type=str, action="append", default=[],
+                             help="Recording file name to play (e.g., recording.mrec); repeat to play several in a row.")
+    play_parser.add_argument("--playlist", type=str, default=None,
+                             help="Text file listing recordings to play in order, one per line (after any --file).")
+    play_parser.add_argument("--repeat", type=int, default=1,
+                             help="Play the recordings this many times back to back (0: until stopped; default: 1).")
+    play_parser.add_argument("--delay", type=float, default=0.0,
+                             help="Seconds to wait between consecutive recordings (default: 0).")
+    play_parser.add_argument("--lag-policy", choices=POLICIES, default=DEFAULT_POLICY,
+                             help="What to do when playback falls behind: fire late events at once (catchup), "
+                                  "drop stale moves (skip) or shift the rest of the timeline (stretch).")
+    play_parser.add_argument("--backend", choices=sorted(BACKENDS), default=DEFAULT_BACKEND,
+                             help="Output backend used to inject events (default: pynput; xtest talks to the X "
+                                  "server directly and sends the events of each 1 ms tick together).")
+    play_parser.add_argument("--speed", type=float, default=1.0,
+                             help="Playback speed multiplier (e.g. 2 plays twice as fast; default: 1).")
+    play_parser.add_argument("--max-gap", type=float, default=None,
+                             help="Clamp every idle interval to at most this many seconds of playback time.")
+    play_parser.add_argument("--start", type=str, default=None,
+                             help="Start at this offset in seconds (negative: from the end) or at a named marker.")
+    play_parser.add_argument("--end", type=str, default=None,
+                             help="Stop at this offset in seconds (negative: from the end) or at a named marker.")
+    play_parser.add_argument("--trace", type=str, default=None, metavar="PREFIX",
+                             help="Record per-event lateness and write PREFIX.metrics.json and PREFIX.trace.json "
+                                  "(Chrome trace format) when playback ends.")
+
+    subparsers.add_parser("stop", help="Stop the active mouse execution.")
+    subparsers.add_parser("pause", help="Pause the active mouse execution.")
+    subparsers.add_parser("resume", help="Resume a paused mouse execution.")
+    subparsers.add_parser("status", help="Show what the playback daemon is doing.")
+    subparsers.add_parser("shutdown", help="Stop any execution and exit the playback daemon.")
+
+    convert_parser = subparsers.add_parser("convert", help="Convert a recording between JSON, binary .mrec and "
+                                                           "a .mref store manifest (lossless; JSON is written as "
+                                                           "schema version 2).")
+    convert_parser.add_argument("input", type=str, help="Source recording (.json, .mrec or .mref).")
+    convert_parser.add_argument("output", type=str, help="Destination file; the extension selects the format.")
+
+    optimize_parser = subparsers.add_parser("optimize", help="Drop redundant move events (dedupe, rate cap, Ramer-Douglas-Peucker).")
+    optimize_parser.add_argument("input", type=str, help="Source recording (.json or .mrec).")
+    optimize_parser.add_argument("output", type=str, help="Destination file; the extension selects the format.")
+    optimize_parser.add_argument("--tolerance", "-t", type=float, default=1.0,
+                                 help="Maximum path deviation in pixels (default: 1.0; 0 disables path simplification).")
+    optimize_parser.add_argument("--max-rate", type=float, default=None,
+                                 help="Cap move events to this many per second (default: no cap).")
+
+    list_parser = subparsers.add_parser("list", help="List recordings with their metadata (from the recording catalog).")
+    list_parser.add_argument("paths", type=str, nargs="*",
+                             help="Recordings or folders to list (default: eventos.json, json_files/ and mouse_app/mouse_files/).")
+    list_parser.add_argument("--match", type=str, default=None, help="Only file names matching this glob (e.g. 'test*').")
+    list_parser.add_argument("--min-duration", type=float, default=None, help="Only recordings at least this many seconds long.")
+    list_parser.add_argument("--max-duration", type=float, default=None, help="Only recordings at most this many seconds long.")
+    list_parser.add_argument("--min-events", type=int, default=None, help="Only recordings with at least this many events.")
+    list_parser.add_argument("--sort", choices=("name", "duration", "events", "mtime"), default="name",
+                             help="Sort order (default: name; the others list the largest or newest first).")
+    list_parser.add_argument("--json", action="store_true", help="Print the catalog rows as JSON.")
+
+    info_parser = subparsers.add_parser("info", help="Show the metadata of one recording.")
+    info_parser.add_argument("file", type=str, help="Recording (.json or .mrec).")
+    info_parser.add_argument("--json", action="store_true", help="Print the catalog row as JSON.")
+
+    markers_parser = subparsers.add_parser("markers", help="List, set or remove the named markers of a recording.")
+    markers_parser.add_argument("file", type=str, help="Recording (.json or .mrec).")
+    markers_parser.add_argument("--set", type=str, action="append", default=[], metavar="NAME=SECONDS",
+                                help="Add or move a marker (repeatable); play --start/--end accept its name.")
+    markers_parser.add_argument("--remove", type=str, action="append", default=[], metavar="NAME",
+                                help="Remove a marker (repeatable).")
+
+    analyze_parser = subparsers.add_parser("analyze", help="Compare a recording with a capture of its playback "
+                                                           "(spatial error, timing skew, missing/extra clicks).")
+    analyze_parser.add_argument("original", type=str, help="Recording that was played.")
+    analyze_parser.add_argument("capture", type=str, help="Recording made by mouse_rec.py while it played.")
+    analyze_parser.add_argument("--resolution-ms", type=float, default=10.0,
+                                help="Time step of the path alignment (default: 10).")
+    analyze_parser.add_argument("--band-ms", type=float, default=500.0,
+                                help="Skew the fine alignment may add around the coarse one (default: 500).")
+    analyze_parser.add_argument("--click-tolerance-ms", type=float, default=100.0,
+                                help="Furthest a replayed click may be from its original (default: 100).")
+    analyze_parser.add_argument("--max-error-px", type=float, default=None,
+                                help="Fail (exit 1) if the p99 spatial error is above this.")
+    analyze_parser.add_argument("--max-skew-ms", type=float, default=None,
+                                help="Fail (exit 1) if the p99 absolute timing skew is above this.")
+    analyze_parser.add_argument("--max-click-errors", type=int, default=None,
+                                help="Fail (exit 1) if there are more missing plus extra clicks than this.")
+    analyze_parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    analyze_parser.add_argument("--report", type=str, default=None, help="Also write the report as JSON to this file.")
+
+    # Options shared by every batch operation; each operation is its own sub-command
+    # so options and paths can be mixed (`batch convert --to mref DIR`)
+    batch_options = argparse.ArgumentParser(add_help=False)
+    batch_options.add_argument("paths", type=str, nargs="*",
+                               help="Recordings or folders (default: eventos.json, json_files/ and mouse_app/mouse_files/).")
+    batch_options.add_argument("--jobs", "-j", type=int, default=None, help="Worker processes (default: one per CPU).")
+    batch_options.add_argument("--chunk-size", type=int, default=16, help="Files sent to a worker at a time (default: 16).")
+    batch_options.add_argument("--to", choices=("mrec", "mref", "json"), default="mrec",
+                               help="Target format of convert (default: mrec; mref stores the events in the chunk store).")
+    batch_options.add_argument("--out-dir", type=str, default=None,
+                               help="Write migrated or converted files here instead of next to their source.")
+    batch_options.add_argument("--report", type=str, default=None, help="Also write the per-file results and summary as JSON.")
+    batch_parser = subparsers.add_parser("batch", help="Validate, migrate, convert or summarize many recordings in parallel.")
+    batch_operations = batch_parser.add_subparsers(dest="operation", required=True)
+    batch_operations.add_parser("validate", parents=[batch_options], help="Report unreadable, empty and unbalanced files.")
+    batch_operations.add_parser("migrate", parents=[batch_options], help="Rewrite old JSON schemas as version 2.")
+    batch_operations.add_parser("convert", parents=[batch_options], help="Write .mrec, .mref or JSON (--to).")
+    batch_operations.add_parser("stats", parents=[batch_options], help="Merged totals.")
+
+    store_parser = subparsers.add_parser("store", help="Deduplicated recording store: add recordings as .mref manifests, "
+                                                       "show disk usage or remove unreferenced chunks.")
+    store_actions = store_parser.add_subparsers(dest="action", required=True)
+    store_add = store_actions.add_parser("add", help="Write FILE.mref next to each recording.")
+    store_add.add_argument("paths", type=str, nargs="+", help="Recordings to add.")
+    store_add.add_argument("--replace", action="store_true",
+                           help="Delete each recording once its manifest is written (markers follow it).")
+    manifests_help = ("Files or folders with manifests, besides every manifest in the store's registry "
+                      "(default: eventos.json, json_files/ and mouse_app/mouse_files/).")
+    store_stats = store_actions.add_parser("stats", help="Logical size of the manifests against the store.")
+    store_stats.add_argument("paths", type=str, nargs="*", help=manifests_help)
+    store_gc = store_actions.add_parser("gc", help="Delete the chunks no manifest uses.")
+    store_gc.add_argument("paths", type=str, nargs="*", help=manifests_help)
+    store_gc.add_argument("--dry-run", action="store_true", help="Only report what would be deleted.")
+    store_parser.set_defaults(replace=False, dry_run=False)
 
     args = parser.parse_args()
 
-    # Pass the recording file path only if the command is 'play'
-    executor = MouseExecutor(args.file if args.command == "play" else None)
+    if args.command == "store":
+        store_command(args.action, args.paths, args.replace, args.dry_run)
+        return
+    if args.command == "batch":
+        if (args.jobs is not None and args.jobs < 1) or args.chunk_size < 1:
+            parser.error("--jobs and --chunk-size must be at least 1.")
+        batch_command(args.operation, args.paths, args.jobs, args.chunk_size, args.to, args.out_dir, args.report)
+        return
+    if args.command == "list":
+        list_recordings(args.paths, args.match, args.min_duration, args.max_duration, args.min_events, args.sort, args.json)
+        return
+    if args.command == "info":
+        recording_info(args.file, args.json)
+        return
+    if args.command == "analyze":
+        if args.resolution_ms <= 0 or args.band_ms <= 0 or args.click_tolerance_ms < 0:
+            parser.error("--resolution-ms and --band-ms must be positive, --click-tolerance-ms not negative.")
+        analyze_replay(args.original, args.capture, args.resolution_ms, args.band_ms, args.click_tolerance_ms,
+                       (args.max_error_px, args.max_skew_ms, args.max_click_errors), args.json, args.report)
+        return
+    if args.command == "markers":
+        edit_markers(args.file, args.set, args.remove)
+        return
+    if args.command == "convert":
+        convert_recording(args.input, args.output)
+        return
+    if args.command == "optimize":
+        optimize_recording(args.input, args.output, args.tolerance, args.max_rate)
+        return
 
     if args.command == "play":
-        executor.start_execution_daemon()
+        if args.speed <= 0:
+            parser.error("--speed must be greater than zero.")
+        if args.max_gap is not None and args.max_gap < 0:
+            parser.error("--max-gap must not be negative.")
+        if args.repeat < 0 or args.delay < 0:
+            parser.error("--repeat and --delay must not be negative.")
+        files = [os.path.abspath(path) for path in args.file]
+        if args.playlist:
+            try:
+                files += read_playlist(args.playlist)
+            except OSError as e:
+                print(f"Error: Could not read playlist {args.playlist}: {e}")
+                sys.exit(1)
+        if not files:
+            parser.error("give at least one --file or a --playlist.")
+        try:
+            client = connect_daemon(args.socket, args.backend, start=True)
+        except OSError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        with client:
+            reply = client.request("play", files=files, repeat=args.repeat, delay=args.delay, lag_policy=args.lag_policy,
+                                   backend=args.backend, speed=args.speed, max_gap=args.max_gap,
+                                   start=args.start, end=args.end, trace=os.path.abspath(args.trace) if args.trace else None)
+        if not reply.get('ok'):
+            print(f"Error: {reply.get('error')}")
+            sys.exit(1)
+        sources = args.file + ([args.playlist] if args.playlist else [])
+        print(f"Execution started in background (PID: {reply['pid']}). File: {', '.join(sources)}")
+    elif args.command == "serve":
+        from player import PlaybackDaemon
+        try:
+            PlaybackDaemon(args.backend).serve(args.socket, args.preload)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}")
+            sys.exit(1)
     elif args.command == "stop":
-        MouseExecutor.stop_execution_daemon()
+        reply = control_command(args.socket, "stop")
+        print(f"Execution stopped in {reply['stop_ms']:.2f}ms. File: {reply['file']}")
+    elif args.command in ("pause", "resume", "status"):
+        print(describe_status(control_command(args.socket, args.command)))
+    elif args.command == "shutdown":
+        control_command(args.socket, "shutdown")
+        print("Playback daemon stopped.")
 
 if __name__ == "__main__":
     main()